@@ -0,0 +1,302 @@
+# backend/attack_pipeline.py
+"""
+Групповая запись атак (group commit).
+
+В режиме конвейера `/api/attack` не пишет в БД сам, а ставит атаку в очередь.
+Фоновая задача раз в несколько миллисекунд забирает накопившиеся атаки
+и записывает их одной транзакцией:
+  - один многострочный INSERT в raid_logs;
+  - один UPDATE HP рейда (строка рейда блокируется на время пачки);
+  - пакетный UPDATE XP пользователей (суммарно по каждому игроку);
+  - upsert статистики игроков (player_stats) и сумм рейтингов (leaderboard).
+Каждый вызывающий получает свой `AttackResult` после коммита своей пачки.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, insert, bindparam, func, Integer
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from auth import invalidate_user, invalidate_all_users
+from boss_factory import BossFactory
+from player_stats import record_attacks, AttackStat
+from leaderboard import leaderboards, record_damage, DamageEvent, BoardTotal
+from models import User, Raid, RaidLog
+from raid_service import (
+    calculate_attack, xp_for_attack, attack_message,
+    reward_raid_participants, raid_reward_pool, schedule_raid_rewards,
+)
+from raid_feed import raid_feed, make_log_entry
+from schemas import WorkoutData, AttackResult, LogDisplay
+from upgrade_effects import UpgradePipeline
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingAttack:
+    user_id: int
+    username: str
+    user_level: int
+    workout: WorkoutData
+    upgrades: UpgradePipeline
+    future: asyncio.Future
+
+
+@dataclass
+class BatchOutcome:
+    """Итог пачки; всё, кроме results, применяется к состоянию в памяти после коммита."""
+    results: List[AttackResult] = field(default_factory=list)
+    killed_raids: List[Tuple[int, int]] = field(default_factory=list)  # (raid_id, банк наград)
+    board_totals: List[BoardTotal] = field(default_factory=list)
+    feed: List[Tuple[int, LogDisplay]] = field(default_factory=list)   # (raid_id, запись ленты)
+
+
+class AttackPipelineTimeout(Exception):
+    """Атака не записана за submit_timeout (пачки не успевают или конвейер остановлен)."""
+
+
+class AttackPipeline:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        interval_ms: float = 5,
+        max_batch_size: int = 200,
+        on_commit: Optional[Callable[[], Awaitable[None]]] = None,
+        defer_rewards: bool = False,
+        submit_timeout: float = 30.0,
+    ):
+        self._session_factory = session_factory
+        self._interval = interval_ms / 1000
+        self._max_batch_size = max_batch_size
+        self._on_commit = on_commit
+        self._defer_rewards = defer_rewards
+        self._submit_timeout = submit_timeout
+        # Ограниченная очередь — естественное противодавление при пиках
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_batch_size * 10)
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"⚙️ Attack pipeline started (interval={self._interval * 1000:.0f}ms, "
+                f"batch<={self._max_batch_size})"
+            )
+
+    async def stop(self) -> None:
+        """Дописывает уже принятые атаки и останавливает фоновую задачу."""
+        if self._task is None:
+            return
+        self._stopping = True
+        await self._queue.put(None)
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def _ensure_running(self) -> None:
+        """Перезапускает фоновую задачу, если она неожиданно завершилась."""
+        if self._task is None or self._stopping or not self._task.done():
+            return
+        if not self._task.cancelled() and self._task.exception() is not None:
+            logger.error("❌ Attack pipeline task died, restarting", exc_info=self._task.exception())
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(
+        self, user_id: int, username: str, user_level: int, workout: WorkoutData, upgrades: UpgradePipeline
+    ) -> AttackResult:
+        """
+        Ставит атаку в очередь и ждёт её записи не дольше submit_timeout.
+        При таймауте атака, ещё не попавшая в пачку, отменяется и записана не будет.
+        """
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        item = PendingAttack(user_id, username, user_level, workout, upgrades, future)
+
+        async def enqueue_and_wait() -> AttackResult:
+            await self._queue.put(item)
+            return await future
+
+        try:
+            return await asyncio.wait_for(enqueue_and_wait(), timeout=self._submit_timeout)
+        except asyncio.TimeoutError:
+            raise AttackPipelineTimeout(f"Attack not written in {self._submit_timeout:.0f}s")
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+
+            # Окно накопления пачки
+            await asyncio.sleep(self._interval)
+            while len(batch) < self._max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                await self._write_batch(batch)
+            except Exception as e:
+                # Цикл не должен умирать: иначе все следующие submit() ждали бы вечно
+                logger.error(f"❌ Attack batch crashed: {e}", exc_info=True)
+            finally:
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(RuntimeError("Attack batch was not completed"))
+
+    async def _write_batch(self, batch: List[PendingAttack]) -> None:
+        # Атаки, чьи вызывающие уже ушли по таймауту, не пишем
+        batch = [item for item in batch if not item.future.done()]
+        if not batch:
+            return
+
+        async with self._session_factory() as db:
+            try:
+                outcome = await self._apply(db, batch)
+                await db.commit()
+            except Exception as e:
+                logger.error(f"❌ Attack batch error ({len(batch)} attacks): {e}", exc_info=True)
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                try:
+                    await db.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Attack batch rollback error: {rollback_error}")
+                return
+
+        # Пачка закоммичена: сбой обновления состояния в памяти не должен
+        # лишить вызывающих их результатов
+        try:
+            leaderboards.apply(outcome.board_totals)
+            for raid_id, entry in outcome.feed:
+                raid_feed.add(raid_id, entry)
+            if self._defer_rewards:
+                for raid_id, reward_pool in outcome.killed_raids:
+                    schedule_raid_rewards(
+                        self._session_factory, raid_id, reward_pool, on_paid=invalidate_all_users
+                    )
+            if outcome.killed_raids:
+                invalidate_all_users()
+            else:
+                for item in batch:
+                    invalidate_user(item.user_id)
+        except Exception as e:
+            logger.error(f"Attack batch post-commit error: {e}", exc_info=True)
+
+        for item, result in zip(batch, outcome.results):
+            if not item.future.done():
+                item.future.set_result(result)
+
+        if self._on_commit is not None:
+            try:
+                await self._on_commit()
+            except Exception as e:
+                logger.error(f"Attack batch on_commit error: {e}", exc_info=True)
+
+    async def _apply(
+        self, db: AsyncSession, batch: List[PendingAttack]
+    ) -> BatchOutcome:
+        raid = await self._lock_active_raid(db)
+        hp = raid.current_hp
+        outcome = BatchOutcome()
+        results = outcome.results
+
+        pending_logs: List[dict] = []
+        xp_by_user: Dict[int, int] = defaultdict(int)
+        stats: List[AttackStat] = []
+        damage_events: List[DamageEvent] = []
+
+        for item in batch:
+            calc_result = calculate_attack(item.workout, item.user_level, raid, item.upgrades)
+            damage = min(max(calc_result.damage, 0), hp)
+            hp -= damage
+            killed = hp <= 0
+            xp_gain = xp_for_attack(calc_result)
+            gold_gain = 0
+            xp_by_user[item.user_id] += xp_gain
+            stats.append((item.user_id, item.workout.sport_type, calc_result.damage))
+            damage_events.append((raid.id, item.user_id, item.workout.sport_type, damage))
+
+            pending_logs.append(dict(
+                raid_id=raid.id,
+                user_id=item.user_id,
+                damage=damage,
+                sport_type=item.workout.sport_type,
+                gold_earned=0,
+                xp_earned=xp_gain,
+                is_critical=calc_result.is_crit,
+                is_miss=calc_result.is_miss,
+            ))
+
+            results.append(AttackResult(
+                damage_dealt=damage,
+                xp_earned=xp_gain,
+                gold_earned=gold_gain,
+                is_critical=calc_result.is_crit,
+                new_boss_hp=hp,
+                message=attack_message(damage, calc_result.is_crit, calc_result.is_miss, killed),
+            ))
+            outcome.feed.append((raid.id, make_log_entry(
+                item.username, damage, item.workout.sport_type,
+                calc_result.is_crit, calc_result.is_miss, killed,
+            )))
+
+            if killed:
+                outcome.killed_raids.append((raid.id, raid_reward_pool(raid)))
+                # Босс убит посреди пачки: фиксируем его логи, раздаём награды,
+                # остальные атаки пачки идут по новому боссу
+                await db.execute(insert(RaidLog), pending_logs)
+                pending_logs = []
+                await db.execute(
+                    update(Raid).where(Raid.id == raid.id).values(current_hp=0, is_active=False)
+                )
+                if not self._defer_rewards:
+                    rewards = await reward_raid_participants(db, raid.id, raid_reward_pool(raid))
+                    results[-1].gold_earned += rewards.get(item.user_id, 0)
+
+                raid = await BossFactory.create_random_boss(db)
+                await db.flush()
+                hp = raid.current_hp
+
+        if pending_logs:
+            await db.execute(insert(RaidLog), pending_logs)
+        if hp != raid.current_hp:
+            await db.execute(update(Raid).where(Raid.id == raid.id).values(current_hp=hp))
+
+        await record_attacks(db, stats)
+        outcome.board_totals = await record_damage(db, damage_events)
+
+        users = User.__table__
+        gain = bindparam("gain", type_=Integer)
+        await db.execute(
+            update(users)
+            .where(users.c.id == bindparam("uid"))
+            .values(
+                xp=users.c.xp + gain,
+                level=func.greatest(users.c.level, (users.c.xp + gain) // 1000 + 1),
+            ),
+            [{"uid": user_id, "gain": xp} for user_id, xp in xp_by_user.items()],
+        )
+        return outcome
+
+    @staticmethod
+    async def _lock_active_raid(db: AsyncSession) -> Raid:
+        result = await db.execute(select(Raid).where(Raid.is_active == True).with_for_update())
+        raid = result.scalar_one_or_none()
+        if raid is None:
+            raid = await BossFactory.create_random_boss(db)
+            await db.flush()
+        return raid
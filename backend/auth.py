@@ -2,7 +2,16 @@
 """
 Аутентификация: хеширование паролей (bcrypt) и JWT-токены.
 user_id всегда извлекается из токена — никогда из тела запроса.
+
+Расшифрованные токены и профили пользователей кэшируются в памяти процесса
+(LRU + TTL), поэтому читающие эндпоинты не ходят в БД за пользователем.
+Любой код, меняющий пользователя (золото, XP, уровень), вызывает
+`invalidate_user` / `invalidate_all_users` после коммита.
 """
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -12,9 +21,14 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt import InvalidTokenError
 from sqlalchemy import select
+from sqlalchemy.orm import noload
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from config import SECRET_KEY
+from cache import TTLCache
+from config import (
+    SECRET_KEY, AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_MAX_SIZE,
+    BCRYPT_ROUNDS, BCRYPT_WORKERS, BCRYPT_MAX_PENDING,
+)
 from database import get_db
 from models import User
 
@@ -24,9 +38,41 @@ ACCESS_TOKEN_EXPIRE_DAYS = 7
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
+@dataclass(frozen=True)
+class CurrentUser:
+    """Неизменяемый снимок пользователя для читающих эндпоинтов (живёт в кэше)."""
+    id: int
+    username: str
+    level: int
+    xp: int
+    gold: int
+
+    @classmethod
+    def from_orm(cls, user: User) -> "CurrentUser":
+        return cls(id=user.id, username=user.username, level=user.level, xp=user.xp, gold=user.gold)
+
+
+# token -> user_id (не дольше срока жизни самого токена)
+_token_cache = TTLCache(max_size=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+# user_id -> CurrentUser
+_user_cache = TTLCache(max_size=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(user_id: int) -> None:
+    """Сбрасывает закэшированный профиль после изменения пользователя."""
+    _user_cache.pop(user_id)
+
+
+def invalidate_all_users() -> None:
+    """Сбрасывает все профили (массовые изменения, например награды за босса)."""
+    _user_cache.clear()
+
+
 def hash_password(password: str) -> str:
     """Возвращает bcrypt-хеш пароля."""
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    return bcrypt.hashpw(
+        password.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    ).decode("utf-8")
 
 
 def verify_password(plain: str, hashed: str) -> bool:
@@ -34,6 +80,43 @@ def verify_password(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
 
 
+# bcrypt занимает ~200 мс CPU: считаем его в отдельном пуле потоков,
+# чтобы не блокировать event loop (bcrypt отпускает GIL на время хеширования).
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_pending = 0
+
+
+async def _run_bcrypt(func, *args):
+    """
+    Выполняет bcrypt-операцию в пуле. Если в работе и очереди уже
+    BCRYPT_MAX_PENDING операций — сразу отвечает 503, а не копит очередь.
+    """
+    global _bcrypt_pending
+    if _bcrypt_pending >= BCRYPT_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервер перегружен, попробуйте войти чуть позже",
+            headers={"Retry-After": "1"},
+        )
+    _bcrypt_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_bcrypt_executor, func, *args)
+    finally:
+        _bcrypt_pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_bcrypt(hash_password, password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run_bcrypt(verify_password, plain, hashed)
+
+
+def shutdown_password_hashing() -> None:
+    _bcrypt_executor.shutdown(wait=False, cancel_futures=True)
+
+
 def create_access_token(user_id: int, username: str) -> str:
     """
     Генерирует JWT с payload:
@@ -49,32 +132,58 @@ def create_access_token(user_id: int, username: str) -> str:
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db),
-) -> User:
-    """
-    FastAPI-зависимость: извлекает и валидирует JWT из заголовка Authorization,
-    затем подгружает пользователя из БД.
-    """
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Не удалось проверить учётные данные",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def _decode_user_id(token: str) -> int:
+    """Возвращает user_id из JWT; результат кэшируется до истечения токена."""
+    user_id = _token_cache.get(token)
+    if user_id is not None:
+        return user_id
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id_str: Optional[str] = payload.get("sub")
         if user_id_str is None:
-            raise credentials_exception
+            raise _credentials_exception()
         user_id = int(user_id_str)
     except (InvalidTokenError, ValueError):
-        raise credentials_exception
+        raise _credentials_exception()
+
+    exp = payload.get("exp")
+    if exp is not None:
+        _token_cache.set(token, user_id, ttl=exp - time.time())
+    return user_id
 
-    result = await db.execute(select(User).where(User.id == user_id))
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> CurrentUser:
+    """
+    FastAPI-зависимость: извлекает и валидирует JWT из заголовка Authorization,
+    затем берёт пользователя из кэша (при промахе — из БД).
+    Возвращает неизменяемый снимок; изменения пользователя — атомарными
+    UPDATE с последующим `invalidate_user`.
+    """
+    user_id = _decode_user_id(token)
+
+    cached = _user_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    # Апгрейды (lazy="selectin") снимку не нужны — без второго запроса
+    result = await db.execute(select(User).options(noload(User.upgrades)).where(User.id == user_id))
     user = result.scalar_one_or_none()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    current = CurrentUser.from_orm(user)
+    _user_cache.set(user_id, current)
+    return current
 
-    return user
@@ -10,17 +10,35 @@ class BossFactory:
     
     PREFIXES = ["Titan", "Lord", "Giga", "Ancient", "Cyber"]
     NAMES = ["Sloth", "Gluttony", "Entropy", "Static", "Couch Potato"]
+
+    # (порог roll, тип, трейты, суффикс имени, множитель HP)
+    BOSS_TYPES = [
+        # 40% Обычный
+        (0.40, "normal", {}, "", 1.0),
+        # 15% Бронированный (Снижает урон на 50%, пока не пробьют)
+        (0.55, "armored", {"armor_reduction": 0.5}, "the Ironclad", 1.1),
+        # 15% Ловкий (20% шанс уворота)
+        (0.70, "agile", {"evasion_chance": 20}, "the Phantom", 1.0),
+        # 15% Радиоактивный (Реген 5% HP в сутки - реализуем при атаке или джобе)
+        (0.85, "radioactive", {"regen_daily_percent": 0.05}, "the Toxic", 1.0),
+        # 15% Рой/Мелкие (Мало HP, но это просто визуализация "стаи"):
+        # для механики просто -20% HP от нормы, но имя другое
+        (1.00, "swarm", {}, "Swarm", 0.8),
+    ]
     
+    # Средний урон за тренировку, пока в статистике нет данных
+    DEFAULT_AVG_DAMAGE_PER_WORKOUT = 350
+
     @staticmethod
-    def calculate_hp(total_players: int) -> int:
+    def calculate_hp(total_players: int, avg_damage_per_workout: float = DEFAULT_AVG_DAMAGE_PER_WORKOUT) -> int:
         """
-        Формула: (Все Игроки * 3 тренировки * 350 ср.урон) * 1.2 (коэффициент сложности)
+        Формула: (Активные игроки * 3 тренировки * ср.урон за тренировку) * 1.2 (коэффициент сложности)
+        Средний урон берётся из sport_daily_stats (по умолчанию 350).
         Минимум 1000 HP.
         """
         if total_players < 1:
             total_players = 1
             
-        avg_damage_per_workout = 350 # Переписать, на запрос среднего (возможно вычислять как то косвенно)
         workouts_per_week = 3
         difficulty_multiplier = 1.2
         
@@ -50,59 +68,27 @@ class BossFactory:
 
     @staticmethod
     async def create_random_boss(db) -> Raid:
-        from sqlalchemy import select, func
-        from models import User
+        from player_stats import get_boss_sizing_stats
         
-        # Получаем количество игроков для расчета HP
-        result = await db.execute(select(func.count(User.id)))
-        total_users = result.scalar() or 1
+        # Активные игроки и средний урон — из инкрементальной статистики
+        stats = await get_boss_sizing_stats(db)
+        avg_damage = stats.avg_damage_per_workout or BossFactory.DEFAULT_AVG_DAMAGE_PER_WORKOUT
         
-        new_raid = BossFactory.create_boss(total_users)
+        new_raid = BossFactory.create_boss(stats.active_players, avg_damage)
         db.add(new_raid)
         return new_raid
 
     @staticmethod
-    def create_boss(total_players: int) -> Raid:
+    def create_boss(total_players: int, avg_damage_per_workout: float = DEFAULT_AVG_DAMAGE_PER_WORKOUT) -> Raid:
         # 1. Определяем тип босса (шансы)
-        roll = random.random()
-        
-        boss_type = "normal"
-        traits = {}
-        name_suffix = ""
-        
-        if roll < 0.40: 
-            # 40% Обычный
-            boss_type = "normal"
-        elif roll < 0.55:
-            # 15% Бронированный (Снижает урон на 50%, пока не пробьют)
-            boss_type = "armored"
-            traits = {"armor_reduction": 0.5} 
-            name_suffix = "the Ironclad"
-        elif roll < 0.70:
-            # 15% Ловкий (20% шанс уворота)
-            boss_type = "agile"
-            traits = {"evasion_chance": 20}
-            name_suffix = "the Phantom"
-        elif roll < 0.85:
-            # 15% Радиоактивный (Реген 5% HP в сутки - реализуем при атаке или джобе)
-            boss_type = "radioactive"
-            traits = {"regen_daily_percent": 0.05}
-            name_suffix = "the Toxic"
-        else:
-            # 15% Рой/Мелкие (Мало HP, но это просто визуализация "стаи")
-            # Для механики сделаем просто -20% HP от нормы, но имя другое
-            boss_type = "swarm"
-            name_suffix = "Swarm"
+        boss_type, traits, name_suffix, hp_multiplier = BossFactory.roll_boss_type(random.random())
 
         # 2. Генерируем Имя
         base_name = f"{random.choice(BossFactory.PREFIXES)} of {random.choice(BossFactory.NAMES)}"
         final_name = f"{base_name} {name_suffix}".strip()
         
         # Передаем общее кол-во игроков
-        hp = BossFactory.calculate_hp(total_players)
-        
-        if boss_type == "swarm": hp = int(hp * 0.8)
-        if boss_type == "armored": hp = int(hp * 1.1)
+        hp = int(BossFactory.calculate_hp(total_players, avg_damage_per_workout) * hp_multiplier)
 
         return Raid(
             boss_name=final_name,
@@ -111,4 +97,13 @@ class BossFactory:
             current_hp=hp,
             traits=traits,
             active_debuffs={}
-        )
\ No newline at end of file
+        )
+
+    @staticmethod
+    def roll_boss_type(roll: float):
+        """По числу из [0, 1) возвращает (тип, трейты, суффикс имени, множитель HP)."""
+        for threshold, boss_type, traits, name_suffix, hp_multiplier in BossFactory.BOSS_TYPES:
+            if roll < threshold:
+                return boss_type, dict(traits), name_suffix, hp_multiplier
+        _, boss_type, traits, name_suffix, hp_multiplier = BossFactory.BOSS_TYPES[-1]
+        return boss_type, dict(traits), name_suffix, hp_multiplier
@@ -0,0 +1,82 @@
+# backend/broadcaster.py
+"""
+Рассылка состояния рейда открытым вкладкам (Server-Sent Events).
+
+Один брокер на процесс: состояние собирается из БД один раз после атаки
+и раздаётся всем подписчикам, поэтому нагрузка на БД не растёт с числом вкладок.
+"""
+import asyncio
+import json
+import logging
+from typing import Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Event = Tuple[str, dict]
+
+
+class RaidBroadcaster:
+    """
+    Хранит последнее отправленное состояние рейда и раздаёт подписчикам
+    только изменившиеся поля (событие "patch").
+    Если подписчик не успевает читать — его очередь сбрасывается
+    и он получает полный снимок (событие "snapshot").
+    """
+
+    def __init__(self, queue_size: int = 16):
+        self._queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._state: Optional[dict] = None
+
+    @property
+    def state(self) -> Optional[dict]:
+        return self._state
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        self._subscribers.add(queue)
+        logger.info(f"Raid stream: +1 подписчик (всего {len(self._subscribers)})")
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+        logger.info(f"Raid stream: -1 подписчик (всего {len(self._subscribers)})")
+
+    def reset(self) -> None:
+        """Забывает закэшированное состояние (оно больше не актуально)."""
+        self._state = None
+
+    def publish(self, state: dict) -> None:
+        """Запоминает новое состояние и рассылает подписчикам разницу с предыдущим."""
+        previous = self._state
+        self._state = state
+
+        if previous is None:
+            event: Event = ("snapshot", state)
+        else:
+            patch = {key: value for key, value in state.items() if previous.get(key) != value}
+            if not patch:
+                return
+            event = ("patch", patch)
+
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Медленный клиент: вместо накопленных патчей отдаём полный снимок
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("snapshot", state))
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Кодирует событие в формат text/event-stream."""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+raid_broadcaster = RaidBroadcaster()
@@ -20,6 +20,19 @@ DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTG
 # Секретный ключ для подписи JWT-токенов авторизации
 SECRET_KEY = os.getenv('SECRET_KEY')
 
+# Кэш расшифрованных JWT и профилей пользователей (секунды / число записей)
+AUTH_CACHE_TTL_SECONDS = float(os.getenv('AUTH_CACHE_TTL_SECONDS', "30"))
+AUTH_CACHE_MAX_SIZE = int(os.getenv('AUTH_CACHE_MAX_SIZE', "10000"))
+
+# Кэш скомпилированных апгрейдов игроков (сбрасывается при покупке)
+UPGRADE_CACHE_TTL_SECONDS = float(os.getenv('UPGRADE_CACHE_TTL_SECONDS', "600"))
+UPGRADE_CACHE_MAX_SIZE = int(os.getenv('UPGRADE_CACHE_MAX_SIZE', "10000"))
+
+# bcrypt: cost factor, размер пула потоков и предел операций в работе/очереди
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', "12"))
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', "2"))
+BCRYPT_MAX_PENDING = int(os.getenv('BCRYPT_MAX_PENDING', "32"))
+
 # API-ключ для OCR (OpenRouter)
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 # Vision-модель OpenRouter (бесплатный эндпоинт)
@@ -27,6 +40,75 @@ OPENROUTER_MODEL = os.getenv(
     'OPENROUTER_MODEL',
     'nvidia/nemotron-3-nano-omni-30b-a3b-reasoning:free',
 )
+# Базовый URL OpenRouter (можно указать локальную заглушку для тестов)
+OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
+
+# Общий HTTP-клиент OCR: таймаут, HTTP/2 и лимиты пула соединений
+OCR_HTTP_TIMEOUT_SECONDS = float(os.getenv('OCR_HTTP_TIMEOUT_SECONDS', "60"))
+OCR_HTTP2 = os.getenv('OCR_HTTP2', "0").lower() in ("1", "true", "yes")
+OCR_MAX_CONNECTIONS = int(os.getenv('OCR_MAX_CONNECTIONS', "20"))
+OCR_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('OCR_MAX_KEEPALIVE_CONNECTIONS', "10"))
+OCR_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv('OCR_KEEPALIVE_EXPIRY_SECONDS', "60"))
+
+# Предобработка скриншота перед OCR: длинная сторона, качество JPEG, процессы пула
+OCR_IMAGE_MAX_SIDE = int(os.getenv('OCR_IMAGE_MAX_SIDE', "1600"))
+OCR_IMAGE_JPEG_QUALITY = int(os.getenv('OCR_IMAGE_JPEG_QUALITY', "80"))
+OCR_PREPROCESS_WORKERS = int(os.getenv('OCR_PREPROCESS_WORKERS', "2"))
+
+# Очередь OCR-задач: воркеры, глубина очереди, объём скриншотов в очереди (МБ),
+# лимит задач на пользователя, время хранения результата и максимум long-poll ожидания (секунды)
+OCR_JOB_WORKERS = int(os.getenv('OCR_JOB_WORKERS', "4"))
+OCR_JOB_MAX_QUEUE = int(os.getenv('OCR_JOB_MAX_QUEUE', "100"))
+OCR_JOB_MAX_QUEUED_MB = int(os.getenv('OCR_JOB_MAX_QUEUED_MB', "200"))
+OCR_JOB_PER_USER_LIMIT = int(os.getenv('OCR_JOB_PER_USER_LIMIT', "2"))
+OCR_JOB_RESULT_TTL_SECONDS = float(os.getenv('OCR_JOB_RESULT_TTL_SECONDS', "600"))
+OCR_JOB_WAIT_MAX_SECONDS = float(os.getenv('OCR_JOB_WAIT_MAX_SECONDS', "30"))
+
+# Пакетный скан: максимум изображений в запросе (распознаёт очередь OCR)
+OCR_BATCH_MAX_IMAGES = int(os.getenv('OCR_BATCH_MAX_IMAGES', "10"))
+
+# Кэш результатов OCR по хешу скриншота (в Postgres)
+OCR_CACHE_TTL_HOURS = float(os.getenv('OCR_CACHE_TTL_HOURS', "72"))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv('OCR_CACHE_MAX_ENTRIES', "5000"))
+
+# Ёмкость кольцевого буфера последних ударов рейда (лента в памяти)
+RAID_FEED_CAPACITY = int(os.getenv('RAID_FEED_CAPACITY', "50"))
+
+# Интервал keep-alive комментариев в SSE-потоке рейда (секунды)
+RAID_STREAM_KEEPALIVE_SECONDS = float(os.getenv('RAID_STREAM_KEEPALIVE_SECONDS', "15"))
+
+# Групповая запись атак: 1 = атаки копятся в очереди и пишутся пачками
+ATTACK_PIPELINE_ENABLED = os.getenv('ATTACK_PIPELINE_ENABLED', "0").lower() in ("1", "true", "yes")
+ATTACK_BATCH_INTERVAL_MS = float(os.getenv('ATTACK_BATCH_INTERVAL_MS', "5"))
+ATTACK_BATCH_MAX_SIZE = int(os.getenv('ATTACK_BATCH_MAX_SIZE', "200"))
+# Сколько атака ждёт записи в конвейере, прежде чем вернуть ошибку (секунды)
+ATTACK_SUBMIT_TIMEOUT_SECONDS = float(os.getenv('ATTACK_SUBMIT_TIMEOUT_SECONDS', "30"))
+
+# 1 = награды за убийство босса выплачиваются фоновой задачей после ответа атакующему
+RAID_REWARDS_DEFERRED = os.getenv('RAID_REWARDS_DEFERRED', "0").lower() in ("1", "true", "yes")
+
+# Окно статистики для HP босса: активные игроки и средний урон за тренировку (дни)
+PLAYER_STATS_WINDOW_DAYS = int(os.getenv('PLAYER_STATS_WINDOW_DAYS', "28"))
+
+# Архивация raid_logs: интервал прохода (секунды), сколько последних завершённых рейдов
+# не трогать, что делать с детальными логами (drop — удалить, keep — оставить отцепленной таблицей)
+RAID_LOG_ARCHIVE_INTERVAL_SECONDS = float(os.getenv('RAID_LOG_ARCHIVE_INTERVAL_SECONDS', "3600"))
+RAID_LOG_ARCHIVE_KEEP_RAIDS = int(os.getenv('RAID_LOG_ARCHIVE_KEEP_RAIDS', "3"))
+RAID_LOG_ARCHIVE_MODE = os.getenv('RAID_LOG_ARCHIVE_MODE', "keep").lower()
+
+# Планировщик фоновых задач (работает только в процессе-лидере, см. scheduler.py):
+# интервал тика рейда (регенерация, дебаффы, таймаут) и максимальная длительность рейда (0 — без таймаута)
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', "1").lower() in ("1", "true", "yes")
+RAID_TICK_INTERVAL_SECONDS = float(os.getenv('RAID_TICK_INTERVAL_SECONDS', "60"))
+RAID_MAX_DURATION_DAYS = float(os.getenv('RAID_MAX_DURATION_DAYS', "30"))
+
+# SQL: эхо всех запросов в лог (только для отладки) и профилировщик на запрос (sql_profiler.py):
+# заголовок X-SQL-Profile, доля запросов в лог, порог N+1, бюджеты запросов по маршрутам (тесты)
+SQL_ECHO = os.getenv('SQL_ECHO', "0").lower() in ("1", "true", "yes")
+SQL_PROFILE_HEADER = os.getenv('SQL_PROFILE_HEADER', "0").lower() in ("1", "true", "yes")
+SQL_PROFILE_LOG_SAMPLE_RATE = float(os.getenv('SQL_PROFILE_LOG_SAMPLE_RATE', "0.01"))
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv('SQL_N_PLUS_ONE_THRESHOLD', "5"))
+SQL_QUERY_BUDGETS_ENFORCE = os.getenv('SQL_QUERY_BUDGETS_ENFORCE', "0").lower() in ("1", "true", "yes")
 
 # Проверка на обязательные переменные
 if not POSTGRES_USER:
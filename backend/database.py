@@ -1,23 +1,36 @@
+import logging
 import os
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from models import Base
-from config import DATABASE_URL
+from config import DATABASE_URL, SQL_ECHO
+from migrations import run_migrations
+from metrics import InstrumentedAsyncPool, instrument_pool, observe_db_query
+from sql_profiler import install_sql_profiler
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+logger = logging.getLogger(__name__)
+
+engine = create_async_engine(DATABASE_URL, echo=SQL_ECHO, poolclass=InstrumentedAsyncPool)
+install_sql_profiler(engine, on_query=observe_db_query)
+instrument_pool(engine)
 
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 
 async def init_models():
     """
-    Создаёт таблицы. Если RESET_DB=1 — сначала дропает все таблицы
-    (удобно при смене схемы; на проде включать только осознанно).
+    Приводит схему к актуальной версии (migrations.py).
+    Если RESET_DB=1 — сначала дропает все таблицы
+    (только для локальной разработки, на проде не включать).
     """
     reset = os.getenv("RESET_DB", "").lower() in ("1", "true", "yes")
     async with engine.begin() as conn:
         if reset:
             await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+        applied = await run_migrations(conn)
+    if applied:
+        logger.info(f"✅ Applied migrations: {applied}")
 
 
 async def get_db():
@@ -0,0 +1,151 @@
+# backend/image_preprocessor.py
+"""
+Предобработка скриншота перед OCR.
+
+Фото с телефона весят до 20 МБ, а в payload OpenRouter они уходят в base64
+(+33%). Для распознавания текста достаточно ~1600 px по длинной стороне,
+поэтому изображение декодируется, поворачивается по EXIF, уменьшается и
+пережимается в JPEG без метаданных. Если JPEG не вышел меньше исходника
+(уже сжатый скриншот), отправляется оригинал. Работа с пикселями — чистый
+CPU, поэтому выполняется в пуле процессов и не блокирует event loop.
+
+Процессы пула стартуют через forkserver (spawn, где его нет): fork
+работающего backend копировал бы потоки и открытые соединения asyncpg/httpx.
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from metrics import observe_image_preprocess
+
+logger = logging.getLogger(__name__)
+
+# Исход предобработки (метка метрики)
+RESULT_RESIZED = "resized"
+RESULT_ORIGINAL = "original"  # JPEG не меньше исходника
+RESULT_FAILED = "failed"  # не удалось декодировать
+
+
+@dataclass
+class PreprocessedImage:
+    data: bytes
+    mime_type: str
+    original_bytes: int
+    processed_bytes: int
+    elapsed_ms: float
+    result: str = RESULT_RESIZED
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.processed_bytes
+
+
+@dataclass
+class PreprocessStats:
+    """Накопленная статистика предобработки (для логов и метрик)."""
+    calls: int = 0
+    failures: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    total_ms: float = 0.0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+
+def _downscale_to_jpeg(image_bytes: bytes, max_side: int, quality: int) -> Tuple[bytes, str]:
+    """
+    Выполняется в дочернем процессе: decode → EXIF-поворот → resize → JPEG без метаданных.
+    Возвращает JPEG и MIME-тип исходника.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        original_mime = Image.MIME.get(img.format, "image/jpeg")
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            # Прозрачность заливаем белым, чтобы текст не оказался на чёрном фоне
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+        out = io.BytesIO()
+        # exif/icc не передаём — метаданные (в т.ч. геолокация) не сохраняются
+        img.save(out, format="JPEG", quality=quality, optimize=True)
+        return out.getvalue(), original_mime
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class ImagePreprocessor:
+    def __init__(self, max_side: int, jpeg_quality: int, workers: int):
+        self._max_side = max_side
+        self._quality = jpeg_quality
+        self._workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.stats = PreprocessStats()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._workers, mp_context=_mp_context())
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def process(self, image_bytes: bytes) -> PreprocessedImage:
+        """
+        Возвращает уменьшенный JPEG. Если он не меньше исходника или изображение
+        не удалось декодировать (экзотический формат), отдаёт исходные байты.
+        """
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            data, original_mime = await loop.run_in_executor(
+                self._get_executor(), _downscale_to_jpeg, image_bytes, self._max_side, self._quality
+            )
+            if len(data) < len(image_bytes):
+                result, mime_type = RESULT_RESIZED, "image/jpeg"
+            else:
+                data, result, mime_type = image_bytes, RESULT_ORIGINAL, original_mime
+        except Exception as e:
+            logger.warning(f"Предобработка изображения не удалась, отправляем оригинал: {e}")
+            self.stats.failures += 1
+            data, result, mime_type = image_bytes, RESULT_FAILED, "image/jpeg"
+
+        image = PreprocessedImage(
+            data=data,
+            mime_type=mime_type,
+            original_bytes=len(image_bytes),
+            processed_bytes=len(data),
+            elapsed_ms=(time.perf_counter() - started) * 1000,
+            result=result,
+        )
+
+        self.stats.calls += 1
+        self.stats.bytes_in += image.original_bytes
+        self.stats.bytes_out += image.processed_bytes
+        self.stats.total_ms += image.elapsed_ms
+        observe_image_preprocess(result, image.original_bytes, image.processed_bytes, image.elapsed_ms / 1000)
+
+        saved_pct = 100 * image.bytes_saved / image.original_bytes if image.original_bytes else 0
+        # В JSON для OpenRouter картинка уходит в base64: каждые 3 байта -> 4 символа
+        payload_saved = (image.bytes_saved * 4) // 3
+        logger.info(
+            f"Image preprocess ({result}): {image.original_bytes} → {image.processed_bytes} bytes "
+            f"(-{saved_pct:.0f}%, payload -{payload_saved} bytes), {image.elapsed_ms:.0f} ms; "
+            f"всего сэкономлено {self.stats.bytes_saved} bytes за {self.stats.calls} вызовов"
+        )
+        return image
@@ -0,0 +1,230 @@
+# backend/leaderboard.py
+"""
+Рейтинги по урону: текущий рейд, за всё время и по видам спорта.
+
+Суммы хранятся в `leaderboard_totals` (board, user_id) и обновляются upsert-ом
+в транзакции атаки — `GROUP BY` по `raid_logs` при чтении не нужен.
+Поверх таблицы в памяти держится отсортированный индекс рангов для
+недавно запрошенных рейтингов: top-N и «моё место» — bisect по списку,
+следующая страница — срез после курсора (keyset по (урон, user_id)).
+После коммита атаки новые суммы из `RETURNING` применяются к индексу.
+"""
+import asyncio
+import bisect
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import User, LeaderboardTotal
+from schemas import LeaderboardEntry, LeaderboardPage
+
+BOARD_ALL = "all"
+
+# Сколько рейтингов держать в памяти (текущий рейд, all, 4 спорта + запас)
+MAX_LOADED_BOARDS = 16
+
+# (raid_id, user_id, sport_type, урон)
+DamageEvent = Tuple[int, int, str, int]
+# (board, user_id, новая сумма урона)
+BoardTotal = Tuple[str, int, int]
+
+
+def raid_board(raid_id: int) -> str:
+    return f"raid:{raid_id}"
+
+
+def sport_board(sport_type: str) -> str:
+    return f"sport:{sport_type}"
+
+
+async def record_damage(db: AsyncSession, events: Iterable[DamageEvent]) -> List[BoardTotal]:
+    """
+    Прибавляет урон в рейтинги (без коммита — в транзакции атаки).
+    Возвращает новые суммы; их нужно передать в `leaderboards.apply` после коммита.
+    """
+    deltas: Dict[Tuple[str, int], int] = defaultdict(int)
+    for raid_id, user_id, sport_type, damage in events:
+        damage = max(int(damage), 0)
+        for board in (raid_board(raid_id), BOARD_ALL, sport_board(sport_type)):
+            deltas[(board, user_id)] += damage
+    if not deltas:
+        return []
+
+    stmt = insert(LeaderboardTotal).values([
+        dict(board=board, user_id=user_id, damage=damage, last_attack_at=func.now())
+        for (board, user_id), damage in sorted(deltas.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LeaderboardTotal.board, LeaderboardTotal.user_id],
+        set_={
+            "damage": LeaderboardTotal.damage + stmt.excluded.damage,
+            "last_attack_at": stmt.excluded.last_attack_at,
+        },
+    ).returning(LeaderboardTotal.board, LeaderboardTotal.user_id, LeaderboardTotal.damage)
+    return [tuple(row) for row in (await db.execute(stmt)).all()]
+
+
+async def revert_damage(db: AsyncSession, event: DamageEvent) -> List[BoardTotal]:
+    """
+    Вычитает урон из рейтингов, уже обновлённых в этой транзакции (переизбыток
+    добивающего удара); строки заблокированы ею, новых блокировок нет.
+    """
+    raid_id, user_id, sport_type, damage = event
+    boards = (raid_board(raid_id), BOARD_ALL, sport_board(sport_type))
+    result = await db.execute(
+        update(LeaderboardTotal)
+        .where(LeaderboardTotal.board.in_(boards), LeaderboardTotal.user_id == user_id)
+        .values(damage=LeaderboardTotal.damage - max(int(damage), 0))
+        .returning(LeaderboardTotal.board, LeaderboardTotal.user_id, LeaderboardTotal.damage)
+        .execution_options(synchronize_session=False)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+class RankIndex:
+    """Рейтинг одного board: список ключей (-урон, user_id) по возрастанию = по убыванию урона."""
+
+    def __init__(self, totals: Iterable[Tuple[int, int]] = ()):
+        self._damage: Dict[int, int] = dict(totals)
+        self._keys: List[Tuple[int, int]] = sorted((-damage, user_id) for user_id, damage in self._damage.items())
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def update(self, user_id: int, damage: int) -> None:
+        """
+        Суммы в `leaderboard_totals` только растут: строку (board, user_id)
+        транзакция держит заблокированной до коммита, а `revert_damage` вычитает
+        лишь прибавленное ею же, поэтому её итоговый `RETURNING` не меньше
+        закоммиченного раньше. Коммиты же применяются к индексу в произвольном
+        порядке — меньшая сумма значит устаревшее значение и пропускается.
+        """
+        old = self._damage.get(user_id)
+        if old is not None and old >= damage:
+            return
+        if old is not None:
+            del self._keys[bisect.bisect_left(self._keys, (-old, user_id))]
+        self._damage[user_id] = damage
+        bisect.insort(self._keys, (-damage, user_id))
+
+    def rank(self, user_id: int) -> Optional[Tuple[int, int]]:
+        """(место с 1, урон) или None, если игрок не участвовал."""
+        damage = self._damage.get(user_id)
+        if damage is None:
+            return None
+        return bisect.bisect_left(self._keys, (-damage, user_id)) + 1, damage
+
+    def page(self, after: Optional[Tuple[int, int]], limit: int) -> List[Tuple[int, int, int]]:
+        """Строки (место, user_id, урон) после курсора (урон, user_id)."""
+        start = 0 if after is None else bisect.bisect_right(self._keys, (-after[0], after[1]))
+        return [
+            (start + i + 1, user_id, -neg_damage)
+            for i, (neg_damage, user_id) in enumerate(self._keys[start:start + limit])
+        ]
+
+
+def encode_cursor(damage: int, user_id: int) -> str:
+    return f"{damage}:{user_id}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not cursor:
+        return None
+    try:
+        damage, user_id = cursor.split(":", 1)
+        return int(damage), int(user_id)
+    except ValueError:
+        raise ValueError("Некорректный курсор")
+
+
+class LeaderboardIndex:
+    def __init__(self, max_boards: int = MAX_LOADED_BOARDS):
+        self._max_boards = max_boards
+        self._boards: "OrderedDict[str, RankIndex]" = OrderedDict()
+        # Суммы, закоммиченные пока рейтинг читается из БД (иначе они бы потерялись)
+        self._loading: Dict[str, List[Tuple[int, int]]] = {}
+        # Одна загрузка на рейтинг: одновременные запросы к холодному рейтингу ждут её
+        self._load_locks: Dict[str, asyncio.Lock] = {}
+
+    async def _load(self, db: AsyncSession, board: str) -> RankIndex:
+        index = self._boards.get(board)
+        if index is None:
+            lock = self._load_locks.setdefault(board, asyncio.Lock())
+            async with lock:
+                index = self._boards.get(board)
+                if index is None:
+                    index = await self._read(db, board)
+                # Ждущие держат ссылку на замок; новые запросы найдут рейтинг в памяти
+                self._load_locks.pop(board, None)
+        self._boards.move_to_end(board)
+        return index
+
+    async def _read(self, db: AsyncSession, board: str) -> RankIndex:
+        pending = self._loading.setdefault(board, [])
+        try:
+            result = await db.execute(
+                select(LeaderboardTotal.user_id, LeaderboardTotal.damage)
+                .where(LeaderboardTotal.board == board)
+            )
+        finally:
+            self._loading.pop(board, None)
+        index = RankIndex(result.all())
+        for user_id, damage in pending:
+            index.update(user_id, damage)
+        self._boards[board] = index
+        while len(self._boards) > self._max_boards:
+            self._boards.popitem(last=False)
+        return index
+
+    async def size(self, db: AsyncSession, board: str) -> int:
+        """Число игроков в рейтинге (для raid:<id> — участники рейда)."""
+        return len(await self._load(db, board))
+
+    def apply(self, totals: Iterable[BoardTotal]) -> None:
+        """
+        Применяет суммы после коммита (в любом порядке — устаревшие отбрасывает
+        `RankIndex.update`); незагруженные рейтинги подтянутся из БД при запросе.
+        """
+        for board, user_id, damage in totals:
+            index = self._boards.get(board)
+            if index is not None:
+                index.update(user_id, damage)
+            elif board in self._loading:
+                self._loading[board].append((user_id, damage))
+
+    async def get_page(
+        self, db: AsyncSession, board: str, user_id: int, limit: int, after: Optional[str] = None
+    ) -> LeaderboardPage:
+        index = await self._load(db, board)
+        rows = index.page(decode_cursor(after), limit)
+        my_rank = index.rank(user_id)
+
+        user_ids = {row_user_id for _, row_user_id, _ in rows} | {user_id}
+        names = dict((await db.execute(
+            select(User.id, User.username).where(User.id.in_(user_ids))
+        )).all())
+
+        entries = [
+            LeaderboardEntry(rank=rank, user_id=row_user_id, username=names.get(row_user_id, "Hero"), damage=damage)
+            for rank, row_user_id, damage in rows
+        ]
+        me = None
+        if my_rank is not None:
+            me = LeaderboardEntry(
+                rank=my_rank[0], user_id=user_id, username=names.get(user_id, "Hero"), damage=my_rank[1]
+            )
+
+        next_cursor = None
+        if rows and rows[-1][0] < len(index):
+            _, last_user_id, last_damage = rows[-1]
+            next_cursor = encode_cursor(last_damage, last_user_id)
+
+        return LeaderboardPage(
+            board=board, total_players=len(index), entries=entries, me=me, next_cursor=next_cursor
+        )
+
+
+leaderboards = LeaderboardIndex()
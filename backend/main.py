@@ -1,34 +1,131 @@
 import asyncio
 import logging
 from contextlib import asynccontextmanager
-from typing import List
+from datetime import timedelta
+from typing import List, Optional, Tuple
 
 from fastapi import FastAPI, Depends, HTTPException, File, UploadFile, Form, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, func
 
-from database import init_models, get_db
-from models import User, Raid, RaidLog, UserUpgrade
+from database import init_models, get_db, engine, AsyncSessionLocal
+from models import User, Raid, RaidLog
 from schemas import (
-    WorkoutData, AttackResult, RaidState, LogDisplay,
-    UserRead, UserCreate, UserLogin, TokenResponse, RaidParticipant,
-    ShopItemRead, ShopBuyRequest
+    WorkoutData, AttackResult, RaidState,
+    UserRead, UserCreate, UserLogin, TokenResponse,
+    ShopItemRead, ShopBuyRequest, OcrJobRead, BatchScanItem, LeaderboardPage,
+    RaidParticipantsPage, LogDisplay,
 )
 from auth import (
-    hash_password, verify_password, create_access_token, get_current_user
+    hash_password_async, verify_password_async, create_access_token,
+    shutdown_password_hashing,
+    get_current_user, CurrentUser,
+    invalidate_user, invalidate_all_users,
 )
-from mechanics import get_strategy
 from boss_factory import BossFactory
 from shop_config import SHOP_REGISTRY
-from ocr_service import UniversalParser
+from mechanics import SPORT_TYPES, DamageCalculationResult
+from shop_catalog import shop_catalog
+from shop_service import purchase_upgrade, PURCHASE_CONFLICT, PURCHASE_NO_GOLD
+from ocr_service import UniversalParser, init_http_client, close_http_client
+from ocr_cache import OcrResultCache, image_digest
+from image_preprocessor import ImagePreprocessor
+from ocr_jobs import OcrJobQueue, OcrJob, OcrQueueFullError, OcrUserLimitError
+from broadcaster import raid_broadcaster, format_sse
+from raid_state import raid_state_cache
+from raid_feed import raid_feed, make_log_entry
+from raid_participants import get_participants_page, ORDER_BY_RECENT
+from raid_service import (
+    get_active_raid, apply_boss_damage, calculate_attack, xp_for_attack,
+    attack_message, reward_raid_participants, raid_reward_pool, schedule_raid_rewards,
+)
+from attack_pipeline import AttackPipeline, AttackPipelineTimeout
+from upgrade_pipeline import get_user_upgrades, invalidate_upgrades
+from player_stats import record_attacks
+from leaderboard import (
+    leaderboards, record_damage, revert_damage, raid_board, sport_board, BOARD_ALL, BoardTotal,
+)
+from raid_log_archive import run_archive_pass, ensure_partitions
+from raid_ticks import run_raid_tick
+from scheduler import LeaderScheduler
+from metrics import MetricsMiddleware, instrument_ocr_queue, observe_attack, render_metrics, METRICS_CONTENT_TYPE
+from sql_profiler import SqlProfilerMiddleware
+from config import (
+    RAID_STREAM_KEEPALIVE_SECONDS,
+    ATTACK_PIPELINE_ENABLED, ATTACK_BATCH_INTERVAL_MS, ATTACK_BATCH_MAX_SIZE,
+    ATTACK_SUBMIT_TIMEOUT_SECONDS,
+    RAID_REWARDS_DEFERRED, RAID_FEED_CAPACITY,
+    RAID_LOG_ARCHIVE_INTERVAL_SECONDS, RAID_LOG_ARCHIVE_KEEP_RAIDS, RAID_LOG_ARCHIVE_MODE,
+    SCHEDULER_ENABLED, RAID_TICK_INTERVAL_SECONDS, RAID_MAX_DURATION_DAYS,
+    OCR_CACHE_TTL_HOURS, OCR_CACHE_MAX_ENTRIES,
+    OCR_IMAGE_MAX_SIDE, OCR_IMAGE_JPEG_QUALITY, OCR_PREPROCESS_WORKERS,
+    OCR_JOB_WORKERS, OCR_JOB_MAX_QUEUE, OCR_JOB_MAX_QUEUED_MB, OCR_JOB_PER_USER_LIMIT,
+    OCR_JOB_RESULT_TTL_SECONDS, OCR_JOB_WAIT_MAX_SECONDS,
+    OCR_BATCH_MAX_IMAGES,
+)
+
+# Максимальный размер страницы участников рейда
+PARTICIPANTS_MAX_LIMIT = 100
+
+# Сколько раз атака пересчитывается, если босса добили параллельным запросом
+ATTACK_RAID_RETRIES = 3
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+async def _after_attack_batch():
+    async with AsyncSessionLocal() as db:
+        await on_raid_changed(db)
+
+
+attack_pipeline = AttackPipeline(
+    AsyncSessionLocal,
+    interval_ms=ATTACK_BATCH_INTERVAL_MS,
+    max_batch_size=ATTACK_BATCH_MAX_SIZE,
+    on_commit=_after_attack_batch,
+    defer_rewards=RAID_REWARDS_DEFERRED,
+    submit_timeout=ATTACK_SUBMIT_TIMEOUT_SECONDS,
+) if ATTACK_PIPELINE_ENABLED else None
+
+ocr_cache = OcrResultCache(
+    AsyncSessionLocal, ttl_hours=OCR_CACHE_TTL_HOURS, max_entries=OCR_CACHE_MAX_ENTRIES
+)
+image_preprocessor = ImagePreprocessor(
+    max_side=OCR_IMAGE_MAX_SIDE, jpeg_quality=OCR_IMAGE_JPEG_QUALITY, workers=OCR_PREPROCESS_WORKERS
+)
+
+
+async def raid_tick_job():
+    """Регенерация, истечение дебаффов и таймаут рейдов; при изменениях — новый снимок."""
+    max_duration = timedelta(days=RAID_MAX_DURATION_DAYS) if RAID_MAX_DURATION_DAYS > 0 else None
+    result = await run_raid_tick(AsyncSessionLocal, max_duration)
+    if result.changed:
+        async with AsyncSessionLocal() as db:
+            await on_raid_changed(db)
+
+
+async def raid_log_archive_job():
+    await run_archive_pass(AsyncSessionLocal, RAID_LOG_ARCHIVE_KEEP_RAIDS, RAID_LOG_ARCHIVE_MODE)
+
+
+scheduler = LeaderScheduler(engine)
+scheduler.add_job("raid_tick", RAID_TICK_INTERVAL_SECONDS, raid_tick_job)
+scheduler.add_job("raid_log_archive", RAID_LOG_ARCHIVE_INTERVAL_SECONDS, raid_log_archive_job)
+
+
+async def warm_raid_feed():
+    """Заполняет ленту активного рейда из БД при старте (дальше она живёт в памяти)."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Raid.id).where(Raid.is_active == True))
+        raid_id = result.scalar_one_or_none()
+        if raid_id is not None:
+            await raid_feed.load(db, raid_id)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🚀 Starting Pulse Guardian Backend...")
@@ -39,12 +136,37 @@ async def lifespan(app: FastAPI):
             logger.info("✅ Database is ready!")
             break
         except Exception as e:
-            logger.error(f"⚠️ DB Connection failed: {e}")
+            logger.error(f"⚠️ DB init failed: {e}")
             if i < max_retries - 1:
                 await asyncio.sleep(5)
             else:
-                logger.error("❌ Fatal: Could not connect to DB")
+                # Не обслуживаем запросы на недомигрированной схеме
+                logger.error("❌ Fatal: DB is not ready (connection or migrations failed)")
+                raise RuntimeError("Database initialization failed") from e
+    try:
+        # Партиции raid_logs на ближайшие рейды — до первой атаки (дальше их ведёт планировщик)
+        async with AsyncSessionLocal() as db:
+            await ensure_partitions(db)
+    except Exception as e:
+        logger.error(f"⚠️ raid_logs partitions check failed: {e}")
+    try:
+        await warm_raid_feed()
+    except Exception as e:
+        logger.error(f"⚠️ Raid feed warm-up failed: {e}")
+    init_http_client()
+    await ocr_jobs.start()
+    if attack_pipeline is not None:
+        await attack_pipeline.start()
+    if SCHEDULER_ENABLED:
+        await scheduler.start()
     yield
+    await scheduler.stop()
+    await ocr_jobs.stop()
+    await close_http_client()
+    image_preprocessor.shutdown()
+    if attack_pipeline is not None:
+        await attack_pipeline.stop()
+    shutdown_password_hashing()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -56,6 +178,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Профилировщик SQL внутри метрик: MetricsMiddleware читает его профиль из scope
+app.add_middleware(SqlProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
 
 
 @app.exception_handler(RequestValidationError)
@@ -100,7 +230,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
 
     user = User(
         username=username,
-        password_hash=hash_password(user_data.password),
+        password_hash=await hash_password_async(user_data.password),
     )
     db.add(user)
     await db.commit()
@@ -116,7 +246,7 @@ async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
         select(User).where(User.username == credentials.username.strip())
     )
     user = result.scalar_one_or_none()
-    if not user or not verify_password(credentials.password, user.password_hash):
+    if not user or not await verify_password_async(credentials.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Неверный логин или пароль")
 
     token = create_access_token(user.id, user.username)
@@ -124,17 +254,40 @@ async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
 
 
 @app.get("/api/user/me", response_model=UserRead)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: CurrentUser = Depends(get_current_user)):
     return current_user
 
 
 # --- ATTACK ---
 
+async def record_attack(
+    db: AsyncSession, raid_id: int, user_id: int, workout_data: WorkoutData,
+    calc_result: DamageCalculationResult, damage: int, xp_gain: int,
+) -> Tuple[int, List[BoardTotal]]:
+    """Лог удара, рейтинги и статистика (без коммита); возвращает id лога и суммы рейтингов."""
+    log_id = (await db.execute(
+        insert(RaidLog).values(
+            raid_id=raid_id,
+            user_id=user_id,
+            damage=damage,
+            sport_type=workout_data.sport_type,
+            gold_earned=0,
+            xp_earned=xp_gain,
+            is_critical=calc_result.is_crit,
+            is_miss=calc_result.is_miss,
+        ).returning(RaidLog.id)
+    )).scalar_one()
+    board_totals = await record_damage(db, [(raid_id, user_id, workout_data.sport_type, damage)])
+    # Строка дневной статистики спорта общая для всех — блокируется последней перед HP
+    await record_attacks(db, [(user_id, workout_data.sport_type, calc_result.damage)])
+    return log_id, board_totals
+
+
 @app.post("/api/attack", response_model=AttackResult)
 async def process_attack(
     workout_data: WorkoutData,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     try:
         if workout_data.sport_type == "run":
@@ -155,84 +308,100 @@ async def process_attack(
 
         user = current_user
 
-        raid_result = await db.execute(select(Raid).where(Raid.is_active == True))
-        raid = raid_result.scalar_one_or_none()
-        if not raid:
-            raid = await BossFactory.create_random_boss(db)
-            await db.commit()
-            await db.refresh(raid)
-
-        strategy_class = get_strategy(workout_data.sport_type)
-        upgrades_result = await db.execute(select(UserUpgrade).where(UserUpgrade.user_id == user.id))
-        upgrades = upgrades_result.scalars().all()
-        upgrade_map = {upg.upgrade_key: upg.level for upg in upgrades}
-
-        strategy = strategy_class(
-            data=workout_data,
-            user_level=user.level,
-            raid_debuffs=raid.active_debuffs or {},
-            boss_traits=raid.traits or {},
-            user_upgrades=upgrade_map
-        )
-        calc_result = strategy.calculate()
-        damage_to_deal = min(calc_result.damage, raid.current_hp)
-
-        xp_gain = 10 if calc_result.is_miss else 100
-        gold_gain = 0
-
-        raid.current_hp -= damage_to_deal
-        user.xp += xp_gain
-        user.gold += gold_gain
-
-        new_level = (user.xp // 1000) + 1
-        if new_level > user.level:
-            user.level = new_level
-
-        msg = f"Удар на {damage_to_deal}!"
-        if calc_result.is_miss:
-            msg = "💨 Босс УВЕРНУЛСЯ!"
-        elif damage_to_deal > 0:
-            if calc_result.is_crit:
-                msg = f"💥 КРИТ! Нанесено {damage_to_deal} урона!"
-            else:
-                msg = f"⚔️ Нанесено {damage_to_deal} урона."
+        upgrades = (await get_user_upgrades(db, user.id)).for_sport(workout_data.sport_type)
+
+        if attack_pipeline is not None:
+            # Соединение не держим, пока атака ждёт своей пачки
+            await db.close()
+            try:
+                result = await attack_pipeline.submit(user.id, user.username, user.level, workout_data, upgrades)
+            except AttackPipelineTimeout:
+                raise HTTPException(status_code=503, detail="Сервер перегружен, повторите атаку")
+            observe_attack(workout_data.sport_type, result.new_boss_hp, killed=result.new_boss_hp <= 0)
+            return result
+
+        # Удар записывается целиком, HP снимается последним из общих строк:
+        # блокировка строки босса держится только до коммита. Порядок блокировок
+        # одинаков у всех атак — строки игрока/рейтингов, статистика спорта, рейд,
+        # затем users (XP и награды), — поэтому взаимных блокировок нет.
+        hit = None
+        for _ in range(ATTACK_RAID_RETRIES):
+            raid = await get_active_raid(db)
+            # После rollback ORM-объект рейда истекает — нужное берём заранее
+            raid_id, reward_pool = raid.id, raid_reward_pool(raid)
+            calc_result = calculate_attack(workout_data, user.level, raid, upgrades)
+            damage = max(calc_result.damage, 0)
+
+            log_id, board_totals = await record_attack(
+                db, raid_id, user.id, workout_data, calc_result, damage, xp_for_attack(calc_result)
+            )
+            hit = await apply_boss_damage(db, raid_id, damage)
+            if hit is not None:
+                break
+            # Босса добили параллельно — заново по новому боссу
+            await db.rollback()
+        if hit is None:
+            raise HTTPException(status_code=409, detail="Босс сменился, повторите атаку")
+
+        if hit.damage_dealt < damage:
+            # Добивающий удар с запасом: в лог и рейтинги — только оставшееся HP.
+            # Итоговые суммы берутся из RETURNING вычитания — они и будут закоммичены
+            await db.execute(
+                update(RaidLog)
+                .where(RaidLog.id == log_id, RaidLog.raid_id == raid_id)
+                .values(damage=hit.damage_dealt)
+                .execution_options(synchronize_session=False)
+            )
+            board_totals = await revert_damage(
+                db, (raid_id, user.id, workout_data.sport_type, damage - hit.damage_dealt)
+            )
 
-        new_log = RaidLog(
-            raid_id=raid.id,
-            user_id=user.id,
-            damage=damage_to_deal,
-            sport_type=workout_data.sport_type,
-            gold_earned=gold_gain,
-            xp_earned=xp_gain,
-            is_critical=calc_result.is_crit,
-            is_miss=calc_result.is_miss
+        xp_gain = xp_for_attack(calc_result)
+        await db.execute(
+            update(User)
+            .where(User.id == user.id)
+            .values(
+                xp=User.xp + xp_gain,
+                level=func.greatest(User.level, (User.xp + xp_gain) // 1000 + 1),
+            )
         )
-        db.add(new_log)
-        await db.flush()
 
-        if raid.current_hp <= 0:
-            raid.current_hp = 0
-            raid.is_active = False
-            msg += " ☠️ БОСС ПОВЕРЖЕН!"
+        damage_to_deal = hit.damage_dealt
+        gold_gain = 0
 
-            participants_result = await db.execute(
-                select(User).join(RaidLog).where(RaidLog.raid_id == raid.id).distinct()
-            )
-            for p in participants_result.scalars().all():
-                p.gold += 50
-                if p.id == user.id:
-                    gold_gain += 50
+        if hit.killed:
+            if not RAID_REWARDS_DEFERRED:
+                rewards = await reward_raid_participants(db, raid_id, reward_pool)
+                gold_gain += rewards.get(user.id, 0)
 
             await BossFactory.create_random_boss(db)
 
+        msg = attack_message(damage_to_deal, calc_result.is_crit, calc_result.is_miss, hit.killed)
+
         await db.commit()
+        leaderboards.apply(board_totals)
+        raid_feed.add(raid_id, make_log_entry(
+            user.username, damage_to_deal, workout_data.sport_type,
+            calc_result.is_crit, calc_result.is_miss, hit.killed,
+        ))
+        if hit.killed and RAID_REWARDS_DEFERRED:
+            # Награды выплатит фоновая задача; кэш профилей сбросится после выплаты
+            schedule_raid_rewards(
+                AsyncSessionLocal, raid_id, reward_pool, on_paid=invalidate_all_users
+            )
+        if hit.killed:
+            invalidate_all_users()
+        else:
+            invalidate_user(user.id)
+        await on_raid_changed(db)
+        observe_attack(workout_data.sport_type, hit.new_hp, hit.killed)
 
         return AttackResult(
             damage_dealt=damage_to_deal,
             xp_earned=xp_gain,
             gold_earned=gold_gain,
             is_critical=calc_result.is_crit,
-            new_boss_hp=raid.current_hp,
+            new_boss_hp=hit.new_hp,
             message=msg
         )
 
@@ -246,92 +415,190 @@ async def process_attack(
 
 # --- RAID ---
 
-@app.get("/api/raid/state")
-async def get_raid_state(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Raid).where(Raid.is_active == True))
-    raid = result.scalar_one_or_none()
+async def on_raid_changed(db: AsyncSession) -> None:
+    """Вызывается после коммита, изменившего рейд: новая версия снимка + рассылка."""
+    raid_state_cache.bump()
+    await publish_raid_state(db)
 
-    if not raid:
-        raid = await BossFactory.create_random_boss(db)
-        await db.commit()
-        await db.refresh(raid)
-
-    logs_result = await db.execute(
-        select(RaidLog, User.username)
-        .join(User, RaidLog.user_id == User.id)
-        .where(RaidLog.raid_id == raid.id)
-        .order_by(RaidLog.created_at.desc())
-        .limit(5)
-    )
 
-    display_logs = [
-        LogDisplay(
-            username=username or "Hero",
-            damage=log.damage,
-            sport_type=log.sport_type,
-            created_at=log.created_at,
-            message=f"Удар на {log.damage}!" if log.damage > 0 else "💨 Босс УВЕРНУЛСЯ!"
-        ) for log, username in logs_result
-    ]
-
-    users_result = await db.execute(select(User).limit(12))
-    users = users_result.scalars().all()
-    participants = []
-    colors = ["#e94560", "#0f3460", "#533483", "#e62e2d", "#f2a365", "#222831", "#00adb5"]
-
-    for u in users:
-        participants.append(RaidParticipant(
-            username=u.username or "Hero",
-            level=u.level,
-            avatar_color=colors[u.id % len(colors)]
-        ))
+async def publish_raid_state(db: AsyncSession) -> None:
+    """
+    Рассылает новое состояние рейда подписчикам потока.
+    Без подписчиков состояние не собирается — просто сбрасывается кэш брокера.
+    """
+    if not raid_broadcaster.has_subscribers:
+        raid_broadcaster.reset()
+        return
+    try:
+        snapshot = await raid_state_cache.get(db)
+        raid_broadcaster.publish(snapshot.data)
+    except Exception as e:
+        logger.error(f"Raid stream publish error: {e}", exc_info=True)
+        raid_broadcaster.reset()
 
-    return RaidState(
-        boss_name=raid.boss_name,
-        boss_type=raid.boss_type,
-        traits=raid.traits,
-        max_hp=raid.max_hp,
-        current_hp=raid.current_hp,
-        active_debuffs=raid.active_debuffs or {},
-        active_players_count=len(participants),
-        recent_logs=display_logs,
-        participants=participants
-    )
+
+async def serve_raid_state(request: Request, db: AsyncSession) -> Response:
+    """
+    Отдаёт закэшированный снимок рейда с ETag.
+    Если клиент прислал актуальный If-None-Match — 304 без тела.
+    """
+    snapshot = await raid_state_cache.get(db)
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if snapshot.etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/raid/state", response_model=RaidState)
+async def get_raid_state(request: Request, db: AsyncSession = Depends(get_db)):
+    return await serve_raid_state(request, db)
 
 
 @app.get("/api/raid/current", response_model=RaidState)
-async def get_raid_current_alias(db: AsyncSession = Depends(get_db)):
-    return await get_raid_state(db)
+async def get_raid_current_alias(request: Request, db: AsyncSession = Depends(get_db)):
+    return await serve_raid_state(request, db)
+
+
+@app.get("/api/raid/participants", response_model=RaidParticipantsPage)
+async def get_raid_participants(
+    order: str = ORDER_BY_RECENT,
+    limit: int = 20,
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Участники текущего рейда: order=recent|damage, keyset-пагинация через ?after=."""
+    limit = max(1, min(limit, PARTICIPANTS_MAX_LIMIT))
+    raid = await get_active_raid(db)
+    try:
+        return await get_participants_page(db, raid.id, order, limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/raid/feed", response_model=List[LogDisplay])
+async def get_raid_feed(limit: int = 20, db: AsyncSession = Depends(get_db)):
+    """Последние удары текущего рейда (из буфера в памяти), новые первыми."""
+    raid = await get_active_raid(db)
+    return await raid_feed.recent(db, raid.id, max(1, min(limit, RAID_FEED_CAPACITY)))
+
+
+@app.get("/api/raid/stream")
+async def stream_raid_state(db: AsyncSession = Depends(get_db)):
+    """
+    SSE-поток состояния рейда: при подключении — полный снимок ("snapshot"),
+    далее — только изменившиеся поля ("patch") после каждой атаки.
+    """
+    queue = raid_broadcaster.subscribe()
+    try:
+        if raid_broadcaster.state is None:
+            # Первый подписчик: снимок уйдёт всем через publish
+            snapshot = await raid_state_cache.get(db)
+            raid_broadcaster.publish(snapshot.data)
+        else:
+            queue.put_nowait(("snapshot", raid_broadcaster.state))
+    except Exception:
+        raid_broadcaster.unsubscribe(queue)
+        raise
+
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(
+                        queue.get(), timeout=RAID_STREAM_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event, data)
+        finally:
+            raid_broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx не должен буферизовать поток
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+# --- LEADERBOARD ---
+
+LEADERBOARD_MAX_LIMIT = 100
+
+
+async def serve_leaderboard(
+    db: AsyncSession, board: str, user: CurrentUser, limit: int, after: Optional[str]
+) -> LeaderboardPage:
+    limit = max(1, min(limit, LEADERBOARD_MAX_LIMIT))
+    try:
+        return await leaderboards.get_page(db, board, user.id, limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/leaderboard/raid", response_model=LeaderboardPage)
+async def get_raid_leaderboard(
+    limit: int = 10,
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Рейтинг текущего рейда."""
+    raid = await get_active_raid(db)
+    return await serve_leaderboard(db, raid_board(raid.id), current_user, limit, after)
+
+
+@app.get("/api/leaderboard/all", response_model=LeaderboardPage)
+async def get_global_leaderboard(
+    limit: int = 10,
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Рейтинг за всё время."""
+    return await serve_leaderboard(db, BOARD_ALL, current_user, limit, after)
+
+
+@app.get("/api/leaderboard/sport/{sport_type}", response_model=LeaderboardPage)
+async def get_sport_leaderboard(
+    sport_type: str,
+    limit: int = 10,
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Рейтинг за всё время по виду спорта."""
+    if sport_type not in SPORT_TYPES:
+        raise HTTPException(status_code=400, detail="Unknown sport type")
+    return await serve_leaderboard(db, sport_board(sport_type), current_user, limit, after)
 
 
 # --- SHOP ---
 
 @app.get("/api/shop", response_model=List[ShopItemRead])
 async def get_shop(
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
+    """Каталог собран заранее; на запрос накладываются только уровни игрока (из кэша апгрейдов)."""
     try:
-        upgrades_result = await db.execute(
-            select(UserUpgrade).where(UserUpgrade.user_id == current_user.id)
-        )
-        upgrades = upgrades_result.scalars().all()
-        user_upgrades = {u.upgrade_key: u.level for u in upgrades}
-
-        shop_list = []
-        for key, item in SHOP_REGISTRY.items():
-            current_lvl = user_upgrades.get(key, 0)
-            is_maxed = current_lvl >= item.max_level
-            price = item.base_price * (current_lvl + 1) if not is_maxed else 0
-            is_locked = item.is_locked(user_upgrades)
-
-            shop_list.append(ShopItemRead(
-                key=key, name=item.name, description=item.description,
-                sport_type=item.sport_type, current_level=current_lvl,
-                max_level=item.max_level, next_price=price,
-                is_locked=is_locked, is_maxed=is_maxed
-            ))
-        return shop_list
+        levels = (await get_user_upgrades(db, current_user.id)).levels
+        etag = shop_catalog.etag(levels)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=shop_catalog.render(levels), media_type="application/json", headers=headers)
     except Exception as e:
         logger.error(f"Shop error: {e}", exc_info=True)
         raise
@@ -341,71 +608,192 @@ async def get_shop(
 async def buy_upgrade(
     request: ShopBuyRequest,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
-    user = current_user
-
-    item_cfg = SHOP_REGISTRY.get(request.item_key)
-    if not item_cfg:
+    entry = shop_catalog.entries.get(request.item_key)
+    if entry is None:
         raise HTTPException(status_code=400, detail="Invalid item")
 
-    upg_result = await db.execute(
-        select(UserUpgrade).where(
-            UserUpgrade.user_id == user.id,
-            UserUpgrade.upgrade_key == request.item_key,
-        )
-    )
-    upgrade = upg_result.scalar_one_or_none()
-    current_lvl = upgrade.level if upgrade else 0
+    levels = (await get_user_upgrades(db, current_user.id)).levels
+    current_lvl = entry.level_of(levels)
 
-    if current_lvl >= item_cfg.max_level:
+    if current_lvl >= entry.max_level:
         raise HTTPException(status_code=400, detail="Max level reached")
-
-    user_upgrades = {
-        u.upgrade_key: u.level
-        for u in (
-            await db.execute(select(UserUpgrade).where(UserUpgrade.user_id == user.id))
-        ).scalars().all()
-    }
-    if item_cfg.is_locked(user_upgrades):
+    if entry.is_locked(levels):
         raise HTTPException(status_code=400, detail="Item is locked")
 
-    price = item_cfg.base_price * (current_lvl + 1)
-    if user.gold < price:
+    outcome = await purchase_upgrade(
+        db, current_user.id, SHOP_REGISTRY[request.item_key],
+        expected_level=current_lvl, price=entry.prices[current_lvl],
+    )
+    if outcome.status == PURCHASE_CONFLICT:
+        # Кэш уровней устарел (параллельная покупка) — клиент перечитает магазин
+        invalidate_upgrades(current_user.id)
+        raise HTTPException(status_code=409, detail="Upgrade level changed, refresh the shop")
+    if outcome.status == PURCHASE_NO_GOLD:
         raise HTTPException(status_code=400, detail="Not enough gold")
 
-    user.gold -= price
-    if upgrade:
-        upgrade.level += 1
-    else:
-        db.add(UserUpgrade(user_id=user.id, upgrade_key=request.item_key, level=1))
-
-    await db.commit()
-    return {"message": "Success", "new_gold": user.gold}
+    invalidate_user(current_user.id)
+    invalidate_upgrades(current_user.id)
+    return {"message": "Success", "new_gold": outcome.new_gold}
 
 
 # --- OCR ---
 
+async def scan_image(user_id: int, sport_type: str, image_bytes: bytes) -> WorkoutData:
+    """Распознаёт скриншот; одинаковые изображения берутся из кэша OCR."""
+    digest = image_digest(image_bytes)
+    try:
+        cached = await ocr_cache.get(digest, sport_type, user_id)
+        if cached is not None:
+            return cached
+    except Exception as e:
+        logger.error(f"OCR cache read error: {e}", exc_info=True)
+
+    image = await image_preprocessor.process(image_bytes)
+    parser = UniversalParser(user_id=user_id, sport_type=sport_type)
+    workout_data = await parser.parse_image(image.data, image.mime_type)
+
+    # Пустой результат не кэшируем — повторная попытка может распознать лучше
+    if workout_data.distance_km or workout_data.duration_minutes or workout_data.calories:
+        try:
+            await ocr_cache.put(digest, sport_type, user_id, workout_data)
+        except Exception as e:
+            logger.error(f"OCR cache write error: {e}", exc_info=True)
+    return workout_data
+
+
+ocr_jobs = OcrJobQueue(
+    scan_image,
+    workers=OCR_JOB_WORKERS,
+    max_queue=OCR_JOB_MAX_QUEUE,
+    max_queued_bytes=OCR_JOB_MAX_QUEUED_MB * 1024 * 1024,
+    per_user_limit=OCR_JOB_PER_USER_LIMIT,
+    result_ttl_seconds=OCR_JOB_RESULT_TTL_SECONDS,
+)
+instrument_ocr_queue(ocr_jobs)
+
+
+async def read_image_upload(file: UploadFile) -> bytes:
+    if not file.content_type or not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Файл должен быть изображением")
+    return await file.read()
+
+
+def ocr_job_read(job: OcrJob) -> OcrJobRead:
+    return OcrJobRead(job_id=job.id, status=job.status, result=job.result, error=job.error)
+
+
 @app.post("/api/scan-workout", response_model=WorkoutData)
 async def scan_workout(
     sport_type: str = Form(...),
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     logger.info(
         f"OCR: user_id={current_user.id}, sport_type={sport_type}, file={file.filename}"
     )
 
-    if not file.content_type or not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Файл должен быть изображением")
-
+    image_bytes = await read_image_upload(file)
     try:
-        image_bytes = await file.read()
-        parser = UniversalParser(user_id=current_user.id, sport_type=sport_type)
-        workout_data = await parser.parse_image(image_bytes)
-        return workout_data
+        return await scan_image(current_user.id, sport_type, image_bytes)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"OCR Error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Ошибка OCR: {str(e)}")
+
+
+def submit_ocr_jobs(user_id: int, items: List[Tuple[str, bytes]]) -> List[OcrJob]:
+    try:
+        return ocr_jobs.submit_many(user_id, items)
+    except OcrUserLimitError:
+        raise HTTPException(
+            status_code=429,
+            detail="Дождитесь распознавания предыдущих скриншотов",
+            headers={"Retry-After": "5"},
+        )
+    except OcrQueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Очередь распознавания переполнена, попробуйте позже",
+            headers={"Retry-After": "10"},
+        )
+
+
+@app.post("/api/scan-workout/batch", response_model=List[BatchScanItem], status_code=202)
+async def scan_workout_batch(
+    files: List[UploadFile] = File(...),
+    sport_types: List[str] = Form(...),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """
+    Ставит несколько скриншотов (мультиспорт, этапы) в очередь OCR и сразу
+    возвращает id задачи для каждого — результаты забираются через
+    `/api/scan-workout/jobs/{job_id}`, запрос не ждёт вызовов LLM.
+    `sport_types` — по одному на файл или один общий для всех.
+    Файл, который не является изображением, возвращается с ошибкой и без задачи.
+    """
+    if len(files) > OCR_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=400, detail=f"Не больше {OCR_BATCH_MAX_IMAGES} скриншотов за раз"
+        )
+    if len(sport_types) == 1:
+        sport_types = sport_types * len(files)
+    if len(sport_types) != len(files):
+        raise HTTPException(
+            status_code=400, detail="Укажите вид спорта для каждого скриншота (или один для всех)"
+        )
+
+    items = []
+    accepted = []
+    for index, (file, sport_type) in enumerate(zip(files, sport_types)):
+        item = BatchScanItem(index=index, filename=file.filename, sport_type=sport_type)
+        try:
+            accepted.append((item, await read_image_upload(file)))
+        except HTTPException as e:
+            item.error = e.detail
+        items.append(item)
+
+    jobs = submit_ocr_jobs(current_user.id, [(item.sport_type, data) for item, data in accepted])
+    for (item, _), job in zip(accepted, jobs):
+        item.job_id = job.id
+
+    logger.info(f"OCR batch: user_id={current_user.id}, images={len(files)}, jobs={len(jobs)}")
+    return items
+
+
+@app.post("/api/scan-workout/jobs", response_model=OcrJobRead, status_code=202)
+async def submit_scan_job(
+    sport_type: str = Form(...),
+    file: UploadFile = File(...),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Ставит скриншот в очередь OCR и сразу возвращает id задачи."""
+    image_bytes = await read_image_upload(file)
+    job, = submit_ocr_jobs(current_user.id, [(sport_type, image_bytes)])
+
+    logger.info(
+        f"OCR job {job.id}: user_id={current_user.id}, sport_type={sport_type}, file={file.filename}"
+    )
+    return ocr_job_read(job)
+
+
+@app.get("/api/scan-workout/jobs/stats")
+async def get_scan_jobs_stats(current_user: CurrentUser = Depends(get_current_user)):
+    return ocr_jobs.stats()
+
+
+@app.get("/api/scan-workout/jobs/{job_id}", response_model=OcrJobRead)
+async def get_scan_job(
+    job_id: str,
+    wait: float = 0,
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Статус задачи; с `wait` (секунды) ждёт результата (long-poll)."""
+    job = ocr_jobs.get(job_id)
+    if job is None or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    await ocr_jobs.wait(job, timeout=min(max(wait, 0), OCR_JOB_WAIT_MAX_SECONDS))
+    return ocr_job_read(job)
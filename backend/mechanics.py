@@ -2,7 +2,7 @@
 from abc import ABC, abstractmethod
 import random
 from schemas import WorkoutData
-from shop_config import SHOP_REGISTRY
+from upgrade_effects import UpgradePipeline, EMPTY_PIPELINE
 
 class DamageCalculationResult:
     def __init__(self, damage: int, is_crit: bool = False, is_miss: bool = False, applied_debuffs: dict = None):
@@ -12,24 +12,20 @@ class DamageCalculationResult:
         self.applied_debuffs = applied_debuffs or {}
 
 class BaseWorkoutStrategy(ABC):
-    def __init__(self, data: WorkoutData, user_level: int, raid_debuffs: dict, boss_traits: dict, user_upgrades: dict):
-        self.data = data
+    def __init__(self, data: WorkoutData, user_level: int, raid_debuffs: dict, boss_traits: dict, upgrades: UpgradePipeline = EMPTY_PIPELINE, rng=random):
+        self.upgrades = upgrades # Скомпилированные апгрейды игрока для этого спорта
+        # 0. АПГРЕЙДЫ НА ВХОДНЫЕ ДАННЫЕ: прибавки уже сложены, data не изменяется
+        self.data = upgrades.apply_input(data)
         self.level = user_level
         self.raid_debuffs = raid_debuffs
         self.boss_traits = boss_traits 
-        self.user_upgrades = user_upgrades # Словарь {key: level}
+        self.rng = rng # Источник случайности (random или объект с .randint — для воспроизводимых симуляций)
 
     def calculate(self) -> DamageCalculationResult:
-        # 0. ПРИМЕНЯЕМ АПГРЕЙДЫ К ВХОДНЫМ ДАННЫМ
-        # Пробегаем по всем апгрейдам, которые есть у юзера, и даем им шанс изменить data
-        for key, level in self.user_upgrades.items():
-            if level > 0 and key in SHOP_REGISTRY:
-                SHOP_REGISTRY[key].modify_input(level, self.data)
-
         # 0.1 Проверка на Уворот (после модификации данных, но до урона)
         evasion_chance = self.boss_traits.get("evasion_chance", 0)
         if evasion_chance > 0:
-            if random.randint(1, 100) <= evasion_chance:
+            if self.rng.randint(1, 100) <= evasion_chance:
                 return DamageCalculationResult(0, is_crit=False, is_miss=True, applied_debuffs={})
 
         # 1. Расчет базовой специфики
@@ -40,9 +36,7 @@ class BaseWorkoutStrategy(ABC):
         damage *= level_multiplier
         
         # 3. АПГРЕЙДЫ НА УРОН (Супер тренировки)
-        for key, level in self.user_upgrades.items():
-            if level > 0 and key in SHOP_REGISTRY:
-                damage = SHOP_REGISTRY[key].modify_damage(level, damage)
+        damage *= self.upgrades.damage_multiplier
 
         # 4. Учет брони босса
         armor_reduction = self.boss_traits.get("armor_reduction", 0)
@@ -90,7 +84,7 @@ class SwimmingStrategy(BaseWorkoutStrategy):
         dmg = meters / 2
         
         debuffs = {}
-        if random.randint(1, 100) <= 30: debuffs["armor_break"] = True
+        if self.rng.randint(1, 100) <= 30: debuffs["armor_break"] = True
         return dmg, False, debuffs
 
 class FootballStrategy(BaseWorkoutStrategy):
@@ -99,12 +93,14 @@ class FootballStrategy(BaseWorkoutStrategy):
         calories = self.data.calories
         dmg = calories / 2
         debuffs = {}
-        if random.randint(1, 100) <= 30: debuffs["armor_break"] = True
+        if self.rng.randint(1, 100) <= 30: debuffs["armor_break"] = True
         return dmg, False, debuffs
 
+STRATEGIES = {
+    "run": RunningStrategy, "cycle": CyclingStrategy,
+    "swim": SwimmingStrategy, "football": FootballStrategy
+}
+SPORT_TYPES = tuple(STRATEGIES)
+
 def get_strategy(sport_type: str) -> type[BaseWorkoutStrategy]:
-    strategies = {
-        "run": RunningStrategy, "cycle": CyclingStrategy,
-        "swim": SwimmingStrategy, "football": FootballStrategy
-    }
-    return strategies.get(sport_type, RunningStrategy)
\ No newline at end of file
+    return STRATEGIES.get(sport_type, RunningStrategy)
\ No newline at end of file
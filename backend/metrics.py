@@ -0,0 +1,164 @@
+# backend/metrics.py
+"""
+Метрики Prometheus (`GET /metrics`).
+
+- HTTP: гистограмма длительности по (method, route, status) — route берётся из
+  шаблона FastAPI (`/api/leaderboard/sport/{sport_type}`), а не из URL, чтобы
+  число серий не росло; число запросов в работе по method.
+- БД: длительность каждого запроса, число запросов и суммарное время БД
+  на HTTP-запрос (профиль из sql_profiler.py), ожидание соединения из пула.
+- OCR: длительность вызова OpenRouter по HTTP-статусу (`error` — сбой сети);
+  глубина, объём в байтах и число выполняемых задач очереди OCR (ocr_jobs.py);
+  предобработка скриншотов (image_preprocessor.py): исходы, байты до/после
+  (экономия — разность счётчиков), длительность.
+- Игра: HP босса, атаки по видам спорта (частота — `rate()` в Prometheus), убийства.
+
+Middleware — «чистый» ASGI, без BaseHTTPMiddleware; на запрос приходится
+несколько вызовов perf_counter и observe() на уже созданных дочерних метриках.
+"""
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Бакеты под API (мс … секунды) и под отдельные SQL-запросы
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+OCR_BUCKETS = (0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+PREPROCESS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+UNMATCHED_ROUTE = "unmatched"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Длительность HTTP-запроса",
+    ["method", "route", "status"], buckets=HTTP_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP-запросы в обработке", ["method"],
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Длительность одного SQL-запроса", buckets=DB_BUCKETS,
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "Число SQL-запросов на HTTP-запрос",
+    ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds", "Суммарное время SQL на HTTP-запрос",
+    ["route"], buckets=HTTP_BUCKETS,
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Ожидание соединения из пула SQLAlchemy", buckets=DB_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Соединения пула, выданные сейчас")
+OCR_REQUEST_DURATION = Histogram(
+    "ocr_request_duration_seconds", "Длительность вызова OCR API", ["status"], buckets=OCR_BUCKETS,
+)
+OCR_QUEUE_DEPTH = Gauge("ocr_queue_depth", "Задачи OCR, ожидающие воркера")
+OCR_QUEUE_BYTES = Gauge("ocr_queue_bytes", "Байты скриншотов в очереди OCR и в работе")
+OCR_JOBS_RUNNING = Gauge("ocr_jobs_running", "Задачи OCR, которые распознаются сейчас")
+IMAGE_PREPROCESS = Counter(
+    "ocr_image_preprocess_total", "Предобработки скриншотов по исходу", ["result"],
+)
+IMAGE_PREPROCESS_BYTES_IN = Counter("ocr_image_preprocess_bytes_in_total", "Байты скриншотов до предобработки")
+IMAGE_PREPROCESS_BYTES_OUT = Counter("ocr_image_preprocess_bytes_out_total", "Байты, отправленные в OCR")
+IMAGE_PREPROCESS_DURATION = Histogram(
+    "ocr_image_preprocess_duration_seconds", "Длительность предобработки скриншота", buckets=PREPROCESS_BUCKETS,
+)
+BOSS_HP = Gauge("boss_current_hp", "Текущее HP активного босса")
+BOSS_MAX_HP = Gauge("boss_max_hp", "Максимальное HP активного босса")
+ATTACKS = Counter("raid_attacks_total", "Атаки по боссу", ["sport_type"])
+BOSS_KILLS = Counter("raid_boss_kills_total", "Убитые боссы")
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            # FastAPI кладёт найденный маршрут в scope при роутинге
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            HTTP_REQUEST_DURATION.labels(method, route, str(status)).observe(elapsed)
+            # Профиль SQL запроса — от SqlProfilerMiddleware (sql_profiler.py)
+            profile = scope.get("sql_profile")
+            if profile is not None:
+                DB_QUERIES_PER_REQUEST.labels(route).observe(profile.queries)
+                DB_TIME_PER_REQUEST.labels(route).observe(profile.seconds)
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Пул соединений, замеряющий ожидание свободного соединения."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def observe_db_query(seconds: float) -> None:
+    DB_QUERY_DURATION.observe(seconds)
+
+
+def instrument_pool(engine: AsyncEngine) -> None:
+    DB_POOL_CHECKED_OUT.set_function(lambda: engine.pool.checkedout())
+
+
+def observe_ocr(status: str, seconds: float) -> None:
+    OCR_REQUEST_DURATION.labels(status).observe(seconds)
+
+
+def observe_image_preprocess(result: str, bytes_in: int, bytes_out: int, seconds: float) -> None:
+    IMAGE_PREPROCESS.labels(result).inc()
+    IMAGE_PREPROCESS_BYTES_IN.inc(bytes_in)
+    IMAGE_PREPROCESS_BYTES_OUT.inc(bytes_out)
+    IMAGE_PREPROCESS_DURATION.observe(seconds)
+
+
+def instrument_ocr_queue(queue) -> None:
+    """Значения берутся из `OcrJobQueue.stats()` в момент сбора метрик."""
+    OCR_QUEUE_DEPTH.set_function(lambda: queue.stats()["queued"])
+    OCR_QUEUE_BYTES.set_function(lambda: queue.stats()["queued_bytes"])
+    OCR_JOBS_RUNNING.set_function(lambda: queue.stats()["running"])
+
+
+def observe_attack(sport_type: str, new_boss_hp: int, killed: bool) -> None:
+    ATTACKS.labels(sport_type).inc()
+    BOSS_HP.set(new_boss_hp)
+    if killed:
+        BOSS_KILLS.inc()
+
+
+def observe_boss(current_hp: int, max_hp: int) -> None:
+    BOSS_HP.set(current_hp)
+    BOSS_MAX_HP.set(max_hp)
+
+
+def render_metrics() -> bytes:
+    return generate_latest()
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
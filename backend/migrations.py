@@ -0,0 +1,276 @@
+# backend/migrations.py
+"""
+Версионированные миграции схемы.
+
+Применённые версии хранятся в таблице `schema_migrations`. При старте backend
+(`init_models`) выполняются только недостающие миграции — по порядку, в одной
+транзакции под advisory-lock, чтобы два процесса не мигрировали одновременно.
+
+Новая миграция — новый элемент в конце `MIGRATIONS` со следующим номером.
+Уже выпущенные миграции не редактируются.
+
+Статус: `python migrations.py`
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_xact_lock для миграций (произвольная константа)
+MIGRATIONS_LOCK_KEY = 7_240_318
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: List[str] = field(default_factory=list)
+    run_sync: Optional[Callable] = None  # fn(sync_connection) — для шагов на Python
+
+
+MIGRATIONS: List[Migration] = [
+    # Базовая схема — таблицы, которые до миграций создавал create_all (IF NOT EXISTS:
+    # на таких установках они уже есть). Схема заморожена: всё, что добавлено позже,
+    # создаётся следующими миграциями, поэтому новая и обновлённая БД совпадают.
+    Migration(1, "initial_schema", statements=[
+        "CREATE TABLE IF NOT EXISTS users ("
+        " id SERIAL NOT NULL,"
+        " username VARCHAR NOT NULL,"
+        " password_hash VARCHAR NOT NULL,"
+        " level INTEGER NOT NULL,"
+        " xp INTEGER NOT NULL,"
+        " gold INTEGER NOT NULL,"
+        " PRIMARY KEY (id),"
+        " UNIQUE (username))",
+        "CREATE TABLE IF NOT EXISTS raids ("
+        " id SERIAL NOT NULL,"
+        " boss_name VARCHAR NOT NULL,"
+        " boss_type VARCHAR NOT NULL,"
+        " max_hp INTEGER NOT NULL,"
+        " current_hp INTEGER NOT NULL,"
+        " is_active BOOLEAN NOT NULL,"
+        " active_debuffs JSON NOT NULL,"
+        " traits JSON NOT NULL,"
+        " created_at TIMESTAMPTZ NOT NULL DEFAULT now(),"
+        " PRIMARY KEY (id))",
+        "CREATE TABLE IF NOT EXISTS user_upgrades ("
+        " id SERIAL NOT NULL,"
+        " user_id INTEGER NOT NULL REFERENCES users (id),"
+        " upgrade_key VARCHAR NOT NULL,"
+        " level INTEGER NOT NULL,"
+        " PRIMARY KEY (id),"
+        " CONSTRAINT _user_upgrade_uc UNIQUE (user_id, upgrade_key))",
+        "CREATE TABLE IF NOT EXISTS raid_logs ("
+        " id SERIAL NOT NULL,"
+        " raid_id INTEGER NOT NULL REFERENCES raids (id),"
+        " user_id INTEGER NOT NULL REFERENCES users (id),"
+        " sport_type VARCHAR NOT NULL,"
+        " damage INTEGER NOT NULL,"
+        " gold_earned INTEGER NOT NULL,"
+        " xp_earned INTEGER NOT NULL,"
+        " is_critical BOOLEAN NOT NULL,"
+        " is_miss BOOLEAN NOT NULL,"
+        " created_at TIMESTAMPTZ NOT NULL DEFAULT now(),"
+        " PRIMARY KEY (id))",
+    ]),
+
+    # Индексы горячих запросов:
+    #  - последние логи рейда (raid_id = ? ORDER BY created_at DESC LIMIT n) и
+    #    агрегаты по рейду (награды, группировка по raid_id);
+    #  - логи игрока (user_id = ?);
+    #  - поиск активного рейда (is_active = true) — частичный индекс из одной строки.
+    # user_upgrades.user_id уже покрыт уникальным индексом _user_upgrade_uc (user_id, upgrade_key).
+    Migration(2, "hot_path_indexes", statements=[
+        "CREATE INDEX IF NOT EXISTS ix_raid_logs_raid_created ON raid_logs (raid_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_raid_logs_user_id ON raid_logs (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_raids_active ON raids (id) WHERE is_active",
+    ]),
+
+    # Рейтинги по урону (leaderboard.py) + заполнение из накопленных raid_logs
+    Migration(3, "leaderboard_totals", statements=[
+        "CREATE TABLE IF NOT EXISTS leaderboard_totals ("
+        " board VARCHAR NOT NULL,"
+        " user_id INTEGER NOT NULL REFERENCES users (id),"
+        " damage BIGINT NOT NULL DEFAULT 0,"
+        " PRIMARY KEY (board, user_id))",
+        "CREATE INDEX IF NOT EXISTS ix_leaderboard_board_damage ON leaderboard_totals (board, damage, user_id)",
+        "INSERT INTO leaderboard_totals (board, user_id, damage)"
+        " SELECT 'raid:' || raid_id, user_id, sum(damage) FROM raid_logs GROUP BY raid_id, user_id"
+        " UNION ALL"
+        " SELECT 'all', user_id, sum(damage) FROM raid_logs GROUP BY user_id"
+        " UNION ALL"
+        " SELECT 'sport:' || sport_type, user_id, sum(damage) FROM raid_logs GROUP BY sport_type, user_id"
+        " ON CONFLICT (board, user_id) DO NOTHING",
+    ]),
+
+    # Время последней атаки в рейтинге — для списка участников рейда по активности
+    Migration(4, "leaderboard_last_attack", statements=[
+        "ALTER TABLE leaderboard_totals"
+        " ADD COLUMN IF NOT EXISTS last_attack_at TIMESTAMPTZ NOT NULL DEFAULT now()",
+        "UPDATE leaderboard_totals AS t SET last_attack_at = l.last_at"
+        " FROM (SELECT raid_id, user_id, max(created_at) AS last_at FROM raid_logs"
+        "       GROUP BY raid_id, user_id) AS l"
+        " WHERE t.board = 'raid:' || l.raid_id AND t.user_id = l.user_id",
+        "CREATE INDEX IF NOT EXISTS ix_leaderboard_board_recent"
+        " ON leaderboard_totals (board, last_attack_at, user_id)",
+    ]),
+
+    # raid_logs -> партиционированная по RANGE (raid_id) таблица, по партиции на рейд.
+    # Партиции создаются заранее (raid_log_archive.ensure_partitions), DEFAULT-партиции
+    # нет — иначе нельзя DETACH ... CONCURRENTLY. Накопленные логи становятся партицией
+    # raid_logs_legacy для raid_id < max(raids.id) + 1; следующие рейды получают свои
+    # партиции сразу. Внешних ключей у raid_logs нет: FK на raids/users заставлял бы
+    # CREATE/DETACH/DROP партиции блокировать эти горячие таблицы.
+    # Плюс итоги архивированных рейдов.
+    Migration(5, "partition_raid_logs", statements=[
+        "ALTER TABLE raids ADD COLUMN IF NOT EXISTS archived_at TIMESTAMPTZ",
+        "CREATE TABLE IF NOT EXISTS raid_log_summaries ("
+        " raid_id INTEGER NOT NULL REFERENCES raids (id),"
+        " user_id INTEGER NOT NULL REFERENCES users (id),"
+        " attacks INTEGER NOT NULL, crits INTEGER NOT NULL, misses INTEGER NOT NULL,"
+        " damage BIGINT NOT NULL, gold_earned BIGINT NOT NULL, xp_earned BIGINT NOT NULL,"
+        " first_attack_at TIMESTAMPTZ NOT NULL, last_attack_at TIMESTAMPTZ NOT NULL,"
+        " PRIMARY KEY (raid_id, user_id))",
+
+        "ALTER TABLE raid_logs RENAME TO raid_logs_legacy",
+        # Старый PK (id) не совместим с PK партиционированной таблицы (id, raid_id):
+        # при ATTACH у партиции оказалось бы два первичных ключа
+        "ALTER TABLE raid_logs_legacy DROP CONSTRAINT raid_logs_pkey",
+        "ALTER TABLE raid_logs_legacy ALTER COLUMN id SET NOT NULL",
+        "ALTER TABLE raid_logs_legacy DROP CONSTRAINT IF EXISTS raid_logs_raid_id_fkey",
+        "ALTER TABLE raid_logs_legacy DROP CONSTRAINT IF EXISTS raid_logs_user_id_fkey",
+        "ALTER INDEX IF EXISTS ix_raid_logs_raid_created RENAME TO ix_raid_logs_legacy_raid_created",
+        "ALTER INDEX IF EXISTS ix_raid_logs_user_id RENAME TO ix_raid_logs_legacy_user_id",
+        "CREATE TABLE raid_logs ("
+        " id INTEGER NOT NULL DEFAULT nextval('raid_logs_id_seq'),"
+        " raid_id INTEGER NOT NULL,"
+        " user_id INTEGER NOT NULL,"
+        " sport_type VARCHAR NOT NULL,"
+        " damage INTEGER NOT NULL,"
+        " gold_earned INTEGER NOT NULL,"
+        " xp_earned INTEGER NOT NULL,"
+        " is_critical BOOLEAN NOT NULL,"
+        " is_miss BOOLEAN NOT NULL,"
+        " created_at TIMESTAMPTZ NOT NULL DEFAULT now(),"
+        " PRIMARY KEY (id, raid_id)"
+        ") PARTITION BY RANGE (raid_id)",
+        "ALTER SEQUENCE raid_logs_id_seq OWNED BY raid_logs.id",
+        # Уникальный индекс (id, raid_id) для PK строится при ATTACH
+        """
+        DO $$
+        DECLARE legacy_upper INTEGER;
+        BEGIN
+            SELECT coalesce(max(id), 0) + 1 INTO legacy_upper FROM raids;
+            EXECUTE format(
+                'ALTER TABLE raid_logs ATTACH PARTITION raid_logs_legacy FOR VALUES FROM (MINVALUE) TO (%s)',
+                legacy_upper
+            );
+            -- Партиции для ближайших рейдов (дальше их досоздаёт планировщик)
+            FOR rid IN legacy_upper .. legacy_upper + 31 LOOP
+                EXECUTE format(
+                    'CREATE TABLE raid_logs_r%s PARTITION OF raid_logs FOR VALUES FROM (%s) TO (%s)',
+                    rid, rid, rid + 1
+                );
+            END LOOP;
+        END $$
+        """,
+        "CREATE INDEX ix_raid_logs_raid_created ON raid_logs (raid_id, created_at)",
+        "CREATE INDEX ix_raid_logs_user_id ON raid_logs (user_id)",
+    ]),
+
+    # Регенерация боссов планировщиком (raid_ticks.py): до какого момента HP уже начислено
+    Migration(6, "raid_regen_at", statements=[
+        "ALTER TABLE raids ADD COLUMN IF NOT EXISTS regen_at TIMESTAMPTZ",
+    ]),
+
+    # Кэш распознанных скриншотов (ocr_cache.py). IF NOT EXISTS — на установках,
+    # где миграция 0001 ещё выполнялась через create_all, таблица уже создана
+    Migration(7, "ocr_cache", statements=[
+        "CREATE TABLE IF NOT EXISTS ocr_cache ("
+        " id SERIAL NOT NULL,"
+        " image_hash VARCHAR(64) NOT NULL,"
+        " sport_type VARCHAR NOT NULL,"
+        " result JSON NOT NULL,"
+        " first_user_id INTEGER NOT NULL REFERENCES users (id),"
+        " hits INTEGER NOT NULL,"
+        " created_at TIMESTAMPTZ NOT NULL DEFAULT now(),"
+        " last_used_at TIMESTAMPTZ NOT NULL DEFAULT now(),"
+        " PRIMARY KEY (id),"
+        " CONSTRAINT _ocr_cache_image_sport_uc UNIQUE (image_hash, sport_type))",
+        "CREATE INDEX IF NOT EXISTS ix_ocr_cache_last_used_at ON ocr_cache (last_used_at)",
+    ]),
+
+    # Статистика для размера боссов (player_stats.py); заполняется атаками, без бэкфилла
+    Migration(8, "player_stats", statements=[
+        "CREATE TABLE IF NOT EXISTS sport_daily_stats ("
+        " day DATE NOT NULL,"
+        " sport_type VARCHAR NOT NULL,"
+        " workouts INTEGER NOT NULL,"
+        " total_damage BIGINT NOT NULL,"
+        " PRIMARY KEY (day, sport_type))",
+        "CREATE TABLE IF NOT EXISTS player_activity ("
+        " user_id INTEGER NOT NULL REFERENCES users (id),"
+        " last_attack_at TIMESTAMPTZ NOT NULL DEFAULT now(),"
+        " workouts INTEGER NOT NULL,"
+        " PRIMARY KEY (user_id))",
+        "CREATE INDEX IF NOT EXISTS ix_player_activity_last_attack_at ON player_activity (last_attack_at)",
+    ]),
+]
+
+
+async def _ensure_table(conn: AsyncConnection) -> None:
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INTEGER PRIMARY KEY,"
+        " name VARCHAR NOT NULL,"
+        " applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+    ))
+
+
+async def applied_versions(conn: AsyncConnection) -> set:
+    await _ensure_table(conn)
+    result = await conn.execute(text("SELECT version FROM schema_migrations"))
+    return {row[0] for row in result}
+
+
+async def run_migrations(conn: AsyncConnection) -> List[int]:
+    """Применяет недостающие миграции в транзакции conn; возвращает их версии."""
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+    done = await applied_versions(conn)
+
+    applied = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in done:
+            continue
+        logger.info(f"🛠 Migration {migration.version:04d} {migration.name}...")
+        if migration.run_sync is not None:
+            await conn.run_sync(migration.run_sync)
+        for statement in migration.statements:
+            await conn.execute(text(statement))
+        await conn.execute(
+            text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+            {"version": migration.version, "name": migration.name},
+        )
+        applied.append(migration.version)
+    return applied
+
+
+async def _print_status() -> None:
+    from database import engine
+
+    async with engine.connect() as conn:
+        done = await applied_versions(conn)
+        await conn.commit()
+    for migration in MIGRATIONS:
+        mark = "✅" if migration.version in done else "⏳"
+        print(f"{mark} {migration.version:04d} {migration.name}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_print_status())
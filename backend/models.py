@@ -1,9 +1,9 @@
 # backend/models.py
-from sqlalchemy import String, Integer, Boolean, JSON, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy import String, Integer, BigInteger, Boolean, JSON, ForeignKey, DateTime, Date, UniqueConstraint, Index, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
-from datetime import datetime
-from typing import List
+from datetime import datetime, date
+from typing import List, Optional
 
 class Base(DeclarativeBase):
     pass
@@ -48,8 +48,20 @@ class Raid(Base):
     traits: Mapped[dict] = mapped_column(JSON, default={}) 
     
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # До какого момента начислена регенерация (raid_ticks.py)
+    regen_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Когда логи рейда свёрнуты в raid_log_summaries (raid_log_archive.py)
+    archived_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    # Индексы создаются миграциями (migrations.py), здесь — для полноты описания схемы
+    __table_args__ = (Index("ix_raids_active", "id", postgresql_where=text("is_active")),)
 
 class RaidLog(Base):
+    """
+    Партиционирована по RANGE (raid_id) — по партиции на рейд (миграция 0005),
+    первичный ключ в БД — (id, raid_id), внешних ключей в БД нет (ForeignKey здесь —
+    для связей ORM). Логи завершённых рейдов сворачиваются в `RaidLogSummary`.
+    """
     __tablename__ = "raid_logs"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -66,3 +78,70 @@ class RaidLog(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     
     user: Mapped["User"] = relationship(back_populates="logs")
+
+    __table_args__ = (
+        Index("ix_raid_logs_raid_created", "raid_id", "created_at"),
+        Index("ix_raid_logs_user_id", "user_id"),
+    )
+
+class OcrCacheEntry(Base):
+    """Кэш распознанных скриншотов: ключ — sha256 байтов изображения + вид спорта."""
+    __tablename__ = "ocr_cache"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    image_hash: Mapped[str] = mapped_column(String(64))
+    sport_type: Mapped[str] = mapped_column(String)
+    result: Mapped[dict] = mapped_column(JSON)
+    first_user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    last_used_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    __table_args__ = (UniqueConstraint('image_hash', 'sport_type', name='_ocr_cache_image_sport_uc'),)
+
+class SportDailyStats(Base):
+    """Счётчики тренировок и урона по дням и видам спорта (обновляются при каждой атаке)."""
+    __tablename__ = "sport_daily_stats"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    sport_type: Mapped[str] = mapped_column(String, primary_key=True)
+    workouts: Mapped[int] = mapped_column(Integer, default=0)
+    total_damage: Mapped[int] = mapped_column(BigInteger, default=0)
+
+class PlayerActivity(Base):
+    """Последняя атака игрока — по ней считаются активные игроки."""
+    __tablename__ = "player_activity"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    last_attack_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
+    workouts: Mapped[int] = mapped_column(Integer, default=0)
+
+class LeaderboardTotal(Base):
+    """Суммарный урон игрока в рейтинге: raid:<id>, all или sport:<вид спорта>."""
+    __tablename__ = "leaderboard_totals"
+
+    board: Mapped[str] = mapped_column(String, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    damage: Mapped[int] = mapped_column(BigInteger, default=0)
+    last_attack_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_leaderboard_board_damage", "board", "damage", "user_id"),
+        Index("ix_leaderboard_board_recent", "board", "last_attack_at", "user_id"),
+    )
+
+class RaidLogSummary(Base):
+    """Итоги игрока в завершённом рейде после архивации его raid_logs."""
+    __tablename__ = "raid_log_summaries"
+
+    raid_id: Mapped[int] = mapped_column(ForeignKey("raids.id"), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    attacks: Mapped[int] = mapped_column(Integer, default=0)
+    crits: Mapped[int] = mapped_column(Integer, default=0)
+    misses: Mapped[int] = mapped_column(Integer, default=0)
+    damage: Mapped[int] = mapped_column(BigInteger, default=0)
+    gold_earned: Mapped[int] = mapped_column(BigInteger, default=0)
+    xp_earned: Mapped[int] = mapped_column(BigInteger, default=0)
+    first_attack_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    last_attack_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
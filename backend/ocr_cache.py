@@ -0,0 +1,113 @@
+# backend/ocr_cache.py
+"""
+Кэш результатов OCR по содержимому скриншота.
+
+Ключ — sha256 байтов изображения + вид спорта. Повторная загрузка того же
+скриншота (ретрай, двойной тап, неудачная атака) не тратит вызов vision-LLM.
+Записи живут в Postgres (переживают рестарт), устаревают по TTL и
+вытесняются по давности использования при превышении лимита.
+Попутно ловим один и тот же скриншот от разных пользователей.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from models import OcrCacheEntry
+from schemas import WorkoutData
+
+logger = logging.getLogger(__name__)
+
+# Вытеснение лишних записей выполняем не на каждой вставке
+EVICT_EVERY_N_PUTS = 50
+
+
+def image_digest(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class OcrResultCache:
+    def __init__(self, session_factory: async_sessionmaker, ttl_hours: float, max_entries: int):
+        self._session_factory = session_factory
+        self._ttl = timedelta(hours=ttl_hours)
+        self._max_entries = max_entries
+        self._puts = 0
+
+    async def get(self, digest: str, sport_type: str, user_id: int) -> Optional[WorkoutData]:
+        async with self._session_factory() as db:
+            result = await db.execute(
+                update(OcrCacheEntry)
+                .where(
+                    OcrCacheEntry.image_hash == digest,
+                    OcrCacheEntry.sport_type == sport_type,
+                    OcrCacheEntry.created_at >= func.now() - self._ttl,
+                )
+                .values(hits=OcrCacheEntry.hits + 1, last_used_at=func.now())
+                .returning(OcrCacheEntry.result, OcrCacheEntry.first_user_id, OcrCacheEntry.hits)
+                .execution_options(synchronize_session=False)
+            )
+            row = result.one_or_none()
+            await db.commit()
+
+        if row is None:
+            return None
+
+        payload, first_user_id, hits = row
+        if first_user_id != user_id:
+            logger.warning(
+                f"OCR cache: скриншот {digest[:12]} ({sport_type}) уже присылал user {first_user_id}, "
+                f"теперь его загрузил user {user_id}"
+            )
+        logger.info(f"OCR cache hit: {digest[:12]} ({sport_type}), hits={hits}")
+        return WorkoutData(**{**payload, "user_id": user_id})
+
+    async def put(self, digest: str, sport_type: str, user_id: int, data: WorkoutData) -> None:
+        payload = data.model_dump(exclude={"user_id"})
+        stmt = insert(OcrCacheEntry).values(
+            image_hash=digest,
+            sport_type=sport_type,
+            result=payload,
+            first_user_id=user_id,
+            hits=0,
+        )
+        # Устаревшую запись (после TTL) перезаписываем свежим результатом
+        stmt = stmt.on_conflict_do_update(
+            constraint="_ocr_cache_image_sport_uc",
+            set_={
+                "result": stmt.excluded.result,
+                "first_user_id": stmt.excluded.first_user_id,
+                "hits": 0,
+                "created_at": func.now(),
+                "last_used_at": func.now(),
+            },
+        )
+        async with self._session_factory() as db:
+            await db.execute(stmt)
+            self._puts += 1
+            if self._puts % EVICT_EVERY_N_PUTS == 0:
+                await self._evict(db)
+            await db.commit()
+
+    async def _evict(self, db) -> None:
+        expired = await db.execute(
+            delete(OcrCacheEntry)
+            .where(OcrCacheEntry.created_at < func.now() - self._ttl)
+            .execution_options(synchronize_session=False)
+        )
+        overflow_ids = (
+            select(OcrCacheEntry.id)
+            .order_by(OcrCacheEntry.last_used_at.desc())
+            .offset(self._max_entries)
+        )
+        overflow = await db.execute(
+            delete(OcrCacheEntry)
+            .where(OcrCacheEntry.id.in_(overflow_ids))
+            .execution_options(synchronize_session=False)
+        )
+        logger.info(
+            f"OCR cache eviction: expired={expired.rowcount}, overflow={overflow.rowcount}"
+        )
@@ -0,0 +1,176 @@
+# backend/ocr_jobs.py
+"""
+Асинхронная очередь OCR-задач.
+
+`/api/scan-workout` держит HTTP-соединение всё время вызова LLM (до 60 с).
+Здесь скан ставится в очередь и сразу получает id задачи, а ограниченный пул
+воркеров выполняет распознавание. Клиент забирает результат по id
+(с long-poll ожиданием). Очередь ограничена по глубине, по суммарному
+объёму ещё не распознанных скриншотов (фото с телефона — до 20 МБ, глубина
+сама по себе память не ограничивает) и по числу одновременных задач одного
+пользователя.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from schemas import WorkoutData
+
+logger = logging.getLogger(__name__)
+
+ScanHandler = Callable[[int, str, bytes], Awaitable[WorkoutData]]
+
+
+class OcrQueueFullError(Exception):
+    """Очередь заполнена — клиенту стоит повторить позже."""
+
+
+class OcrUserLimitError(Exception):
+    """У пользователя уже максимум незавершённых задач."""
+
+
+@dataclass
+class OcrJob:
+    id: str
+    user_id: int
+    sport_type: str
+    image_bytes: Optional[bytes]
+    status: str = "queued"  # queued | running | done | failed
+    result: Optional[WorkoutData] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class OcrJobQueue:
+    def __init__(
+        self,
+        handler: ScanHandler,
+        workers: int,
+        max_queue: int,
+        max_queued_bytes: int,
+        per_user_limit: int,
+        result_ttl_seconds: float,
+    ):
+        self._handler = handler
+        self._workers = workers
+        self._per_user_limit = per_user_limit
+        self._result_ttl = result_ttl_seconds
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._max_queued_bytes = max_queued_bytes
+        self._queued_bytes = 0  # Байты скриншотов в очереди и в работе
+        self._jobs: Dict[str, OcrJob] = {}
+        self._active_by_user: Dict[int, int] = defaultdict(int)
+        self._tasks: List[asyncio.Task] = []
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    async def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers)]
+            logger.info(f"⚙️ OCR job queue started ({self._workers} workers)")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, user_id: int, sport_type: str, image_bytes: bytes) -> OcrJob:
+        return self.submit_many(user_id, [(sport_type, image_bytes)])[0]
+
+    def submit_many(self, user_id: int, items: List[Tuple[str, bytes]]) -> List[OcrJob]:
+        """
+        Ставит в очередь несколько скриншотов разом: либо все, либо ни одного.
+        Пакет считается одной отправкой — он принимается, если у пользователя
+        меньше per_user_limit незавершённых задач, и целиком входит в лимит.
+        """
+        self._purge_finished()
+
+        if self._active_by_user[user_id] >= self._per_user_limit:
+            self._rejected += len(items)
+            raise OcrUserLimitError()
+        size = sum(len(image_bytes) for _, image_bytes in items)
+        if (
+            self._queue.maxsize - self._queue.qsize() < len(items)
+            or self._queued_bytes + size > self._max_queued_bytes
+        ):
+            self._rejected += len(items)
+            raise OcrQueueFullError()
+
+        jobs = [
+            OcrJob(id=uuid.uuid4().hex, user_id=user_id, sport_type=sport_type, image_bytes=image_bytes)
+            for sport_type, image_bytes in items
+        ]
+        for job in jobs:
+            self._queue.put_nowait(job)
+            self._jobs[job.id] = job
+        self._active_by_user[user_id] += len(jobs)
+        self._queued_bytes += size
+        return jobs
+
+    def get(self, job_id: str) -> Optional[OcrJob]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: OcrJob, timeout: float) -> OcrJob:
+        """Long-poll: ждёт завершения задачи не дольше timeout секунд."""
+        if timeout > 0 and not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "running": self._running,
+            "workers": self._workers,
+            "max_queue": self._queue.maxsize,
+            "queued_bytes": self._queued_bytes,
+            "max_queued_bytes": self._max_queued_bytes,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job: OcrJob = await self._queue.get()
+            job.status = "running"
+            self._running += 1
+            try:
+                job.result = await self._handler(job.user_id, job.sport_type, job.image_bytes)
+                job.status = "done"
+                self._completed += 1
+            except Exception as e:
+                logger.error(f"OCR job {job.id} failed: {e}", exc_info=True)
+                job.error = str(e)
+                job.status = "failed"
+                self._failed += 1
+            finally:
+                self._running -= 1
+                self._active_by_user[job.user_id] -= 1
+                if self._active_by_user[job.user_id] <= 0:
+                    del self._active_by_user[job.user_id]
+                self._queued_bytes -= len(job.image_bytes)
+                job.image_bytes = None  # Байты скриншота больше не нужны
+                job.finished_at = time.monotonic()
+                job.done.set()
+                self._queue.task_done()
+
+    def _purge_finished(self) -> None:
+        deadline = time.monotonic() - self._result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < deadline
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
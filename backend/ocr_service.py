@@ -2,18 +2,70 @@ import re
 import logging
 import base64
 import json
+import time
 import httpx
 from abc import ABC, abstractmethod
+from typing import Optional
 from schemas import WorkoutData
+from metrics import observe_ocr
 from config import (
     OPENROUTER_API_KEY,
     OPENROUTER_MODEL,
+    OPENROUTER_BASE_URL,
+    OCR_HTTP_TIMEOUT_SECONDS,
+    OCR_HTTP2,
+    OCR_MAX_CONNECTIONS,
+    OCR_MAX_KEEPALIVE_CONNECTIONS,
+    OCR_KEEPALIVE_EXPIRY_SECONDS,
 )
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Один HTTP-клиент на приложение: keep-alive соединения к OpenRouter
+# переиспользуются между сканами, а их число ограничено пулом.
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def init_http_client() -> httpx.AsyncClient:
+    """Создаёт общий клиент (вызывается в lifespan приложения)."""
+    global _http_client
+    if _http_client is not None:
+        return _http_client
+
+    limits = httpx.Limits(
+        max_connections=OCR_MAX_CONNECTIONS,
+        max_keepalive_connections=OCR_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OCR_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    http2 = OCR_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("OCR_HTTP2=1, но пакет h2 не установлен — используется HTTP/1.1")
+            http2 = False
+
+    _http_client = httpx.AsyncClient(
+        base_url=OPENROUTER_BASE_URL,
+        timeout=OCR_HTTP_TIMEOUT_SECONDS,
+        limits=limits,
+        http2=http2,
+    )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    return _http_client or init_http_client()
+
 class BaseWorkoutParser(ABC):
     """
     Абстрактный класс для парсинга упражнений.
@@ -24,7 +76,7 @@ class BaseWorkoutParser(ABC):
         self.sport_type = sport_type
 
     @abstractmethod
-    async def parse_image(self, image_bytes: bytes) -> WorkoutData:
+    async def parse_image(self, image_bytes: bytes, mime_type: str = "image/jpeg") -> WorkoutData:
         pass
 
 class UniversalParser(BaseWorkoutParser):
@@ -32,7 +84,7 @@ class UniversalParser(BaseWorkoutParser):
     Парсер с использованием LLM (OpenRouter) для распознавания метрик.
     """
 
-    async def parse_image(self, image_bytes: bytes) -> WorkoutData:
+    async def parse_image(self, image_bytes: bytes, mime_type: str = "image/jpeg") -> WorkoutData:
         if not isinstance(image_bytes, bytes) or len(image_bytes) == 0:
             raise ValueError("image_bytes должен быть непустым объектом bytes")
 
@@ -95,7 +147,7 @@ class UniversalParser(BaseWorkoutParser):
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}",
+                                "url": f"data:{mime_type};base64,{base64_image}",
                             },
                         },
                     ],
@@ -109,28 +161,38 @@ class UniversalParser(BaseWorkoutParser):
         calories = 0
 
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
+            client = get_http_client()
+            started = time.perf_counter()
+            try:
                 response = await client.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
+                    "/chat/completions",
                     headers=headers,
                     json=payload
                 )
-                if response.status_code >= 400:
-                    raise self._http_error(response)
-
-                result = response.json()
-
-                if "choices" in result and len(result["choices"]) > 0:
-                    raw_text = result["choices"][0]["message"]["content"].strip()
-                    logger.info(f"Ответ OpenRouter для user {self.user_id}: \n{raw_text}")
-
-                    # Парсим ответ
-                    distance = self._parse_distance(raw_text)
-                    duration = self._parse_duration(raw_text)
-                    calories = self._parse_calories(raw_text)
-                else:
-                    logger.error(f"Неожиданный ответ от OpenRouter: {result}")
-                    raise ValueError(f"Неожиданный ответ OCR API: {result}")
+            except httpx.HTTPError:
+                observe_ocr("error", time.perf_counter() - started)
+                raise
+            observe_ocr(str(response.status_code), time.perf_counter() - started)
+            logger.info(
+                f"OpenRouter: status={response.status_code}, image={len(image_bytes)} bytes, "
+                f"{(time.perf_counter() - started) * 1000:.0f} ms"
+            )
+            if response.status_code >= 400:
+                raise self._http_error(response)
+
+            result = response.json()
+
+            if "choices" in result and len(result["choices"]) > 0:
+                raw_text = result["choices"][0]["message"]["content"].strip()
+                logger.info(f"Ответ OpenRouter для user {self.user_id}: \n{raw_text}")
+
+                # Парсим ответ
+                distance = self._parse_distance(raw_text)
+                duration = self._parse_duration(raw_text)
+                calories = self._parse_calories(raw_text)
+            else:
+                logger.error(f"Неожиданный ответ от OpenRouter: {result}")
+                raise ValueError(f"Неожиданный ответ OCR API: {result}")
 
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP ошибка при обращении к OpenRouter: {e.response.text}")
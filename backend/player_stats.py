@@ -0,0 +1,91 @@
+# backend/player_stats.py
+"""
+Инкрементальная статистика игроков для расчёта HP босса.
+
+Каждая атака в той же транзакции делает два upsert-а:
+  - `sport_daily_stats` (день, спорт): +1 тренировка, +урон;
+  - `player_activity` (игрок): время последней атаки.
+При появлении босса читаются только они: число игроков, атаковавших за окно
+(диапазон по индексу `last_attack_at`), и средний урон за тренировку —
+сумма по нескольким десяткам дневных строк. Полного агрегата по `users`
+или `raid_logs` нет.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import PLAYER_STATS_WINDOW_DAYS
+from models import SportDailyStats, PlayerActivity
+
+# (user_id, sport_type, урон по расчёту — до ограничения оставшимся HP)
+AttackStat = Tuple[int, str, int]
+
+
+@dataclass
+class BossSizingStats:
+    active_players: int
+    avg_damage_per_workout: float            # 0 — данных за окно ещё нет
+
+
+async def record_attacks(db: AsyncSession, attacks: Iterable[AttackStat]) -> None:
+    """Добавляет атаки в статистику (без коммита — в транзакции атаки)."""
+    by_sport: Dict[str, list] = {}
+    by_user: Dict[int, int] = {}
+    for user_id, sport_type, damage in attacks:
+        counters = by_sport.setdefault(sport_type, [0, 0])
+        counters[0] += 1
+        counters[1] += max(int(damage), 0)
+        by_user[user_id] = by_user.get(user_id, 0) + 1
+    if not by_sport:
+        return
+
+    sport_stmt = insert(SportDailyStats).values([
+        dict(day=func.current_date(), sport_type=sport, workouts=workouts, total_damage=damage)
+        for sport, (workouts, damage) in sorted(by_sport.items())
+    ])
+    sport_stmt = sport_stmt.on_conflict_do_update(
+        index_elements=[SportDailyStats.day, SportDailyStats.sport_type],
+        set_={
+            "workouts": SportDailyStats.workouts + sport_stmt.excluded.workouts,
+            "total_damage": SportDailyStats.total_damage + sport_stmt.excluded.total_damage,
+        },
+    )
+    await db.execute(sport_stmt)
+
+    # Сортировка по ключу — одинаковый порядок блокировок в параллельных транзакциях
+    activity_stmt = insert(PlayerActivity).values([
+        dict(user_id=user_id, last_attack_at=func.now(), workouts=workouts)
+        for user_id, workouts in sorted(by_user.items())
+    ])
+    activity_stmt = activity_stmt.on_conflict_do_update(
+        index_elements=[PlayerActivity.user_id],
+        set_={
+            "last_attack_at": activity_stmt.excluded.last_attack_at,
+            "workouts": PlayerActivity.workouts + activity_stmt.excluded.workouts,
+        },
+    )
+    await db.execute(activity_stmt)
+
+
+async def get_boss_sizing_stats(db: AsyncSession) -> BossSizingStats:
+    window = timedelta(days=PLAYER_STATS_WINDOW_DAYS)
+
+    active_players = (await db.execute(
+        select(func.count()).select_from(PlayerActivity)
+        .where(PlayerActivity.last_attack_at >= func.now() - window)
+    )).scalar() or 0
+
+    total_workouts, total_damage = (await db.execute(
+        select(func.sum(SportDailyStats.workouts), func.sum(SportDailyStats.total_damage))
+        .where(SportDailyStats.day > func.current_date() - PLAYER_STATS_WINDOW_DAYS)
+    )).one()
+
+    total_workouts = int(total_workouts or 0)
+    return BossSizingStats(
+        active_players=active_players,
+        avg_damage_per_workout=int(total_damage) / total_workouts if total_workouts else 0.0,
+    )
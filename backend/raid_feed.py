@@ -0,0 +1,93 @@
+# backend/raid_feed.py
+"""
+Лента последних ударов рейда в памяти процесса.
+
+Для каждого рейда — кольцевой буфер (deque с maxlen) готовых `LogDisplay`.
+Запись добавляется после коммита атаки с тем же текстом, что получил
+атакующий (`attack_message`: крит, уворот, добивание). Снимок рейда, SSE-поток
+и `/api/raid/feed` читают ленту без SQL. Из БД буфер рейда заполняется один раз:
+при старте для активного рейда или при первом обращении к неизвестному рейду;
+тексты строятся тем же `make_log_entry`, включая пометку добивания.
+"""
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import RAID_FEED_CAPACITY
+from models import User, Raid, RaidLog
+from raid_service import attack_message
+from schemas import LogDisplay
+
+# Буферы скольких рейдов держать (активный + только что убитые)
+MAX_RAIDS = 4
+
+
+def make_log_entry(
+    username: str, damage: int, sport_type: str, is_crit: bool, is_miss: bool,
+    killed: bool = False, created_at: Optional[datetime] = None,
+) -> LogDisplay:
+    return LogDisplay(
+        username=username or "Hero",
+        damage=damage,
+        sport_type=sport_type,
+        created_at=created_at or datetime.now(timezone.utc),
+        message=attack_message(damage, is_crit, is_miss, killed),
+    )
+
+
+class RecentLogBuffer:
+    def __init__(self, capacity: int, max_raids: int = MAX_RAIDS):
+        self._capacity = capacity
+        self._max_raids = max_raids
+        self._buffers: "OrderedDict[int, Deque[LogDisplay]]" = OrderedDict()
+
+    def _buffer(self, raid_id: int) -> Deque[LogDisplay]:
+        buffer = self._buffers.get(raid_id)
+        if buffer is None:
+            buffer = deque(maxlen=self._capacity)
+            self._buffers[raid_id] = buffer
+            while len(self._buffers) > self._max_raids:
+                self._buffers.popitem(last=False)
+        self._buffers.move_to_end(raid_id)
+        return buffer
+
+    def add(self, raid_id: int, entry: LogDisplay) -> None:
+        """Вызывать после коммита атаки."""
+        self._buffer(raid_id).append(entry)
+
+    async def load(self, db: AsyncSession, raid_id: int) -> None:
+        """Заполняет буфер рейда последними логами из БД."""
+        result = await db.execute(
+            select(RaidLog, User.username)
+            .join(User, RaidLog.user_id == User.id)
+            .where(RaidLog.raid_id == raid_id)
+            .order_by(RaidLog.created_at.desc())
+            .limit(self._capacity)
+        )
+        rows = result.all()
+        # Убитый босс больше не принимает ударов — последний лог его рейда и есть
+        # добивание (рейд, закрытый по таймауту, сохраняет HP и добивания не имеет)
+        defeated = bool(rows) and (await db.execute(
+            select(Raid.id).where(Raid.id == raid_id, Raid.is_active == False, Raid.current_hp <= 0)
+        )).scalar() is not None
+        if raid_id in self._buffers:
+            return  # Пока шёл запрос, буфер уже заполнили
+        buffer = self._buffer(raid_id)
+        for i, (log, username) in reversed(list(enumerate(rows))):
+            buffer.append(make_log_entry(
+                username, log.damage, log.sport_type, log.is_critical, log.is_miss,
+                killed=defeated and i == 0, created_at=log.created_at,
+            ))
+
+    async def recent(self, db: AsyncSession, raid_id: int, limit: int) -> List[LogDisplay]:
+        """Последние записи, новые первыми."""
+        if raid_id not in self._buffers:
+            await self.load(db, raid_id)
+        buffer = self._buffer(raid_id)
+        return [buffer[-i] for i in range(1, min(limit, len(buffer)) + 1)]
+
+
+raid_feed = RecentLogBuffer(capacity=RAID_FEED_CAPACITY)
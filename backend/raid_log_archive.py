@@ -0,0 +1,196 @@
+# backend/raid_log_archive.py
+"""
+Обслуживание партиций raid_logs и архивация завершённых рейдов.
+
+raid_logs партиционирована по RANGE (raid_id), по партиции `raid_logs_r<id>`
+на рейд. Запросы по рейду (`raid_id = ?`: награды, лента, статистика)
+читают только его партицию, поэтому не замедляются с ростом таблицы.
+
+Проход архивации (задача планировщика, scheduler.py):
+  1. создаёт партиции заранее — на PARTITIONS_AHEAD будущих id рейдов.
+     Партиция текущего рейда не создаётся и не трогается: DDL не должен
+     пересекаться с атаками. DEFAULT-партиции нет, поэтому запас
+     держится большим, а при старте приложения проверяется сразу;
+  2. сворачивает логи завершённых рейдов в `raid_log_summaries`
+     (игрок × рейд: удары, криты, промахи, урон, золото, XP) и отцепляет
+     партицию через `DETACH PARTITION ... CONCURRENTLY` (вне транзакции,
+     без ACCESS EXCLUSIVE на raid_logs): `keep` — переименовывает в
+     `raid_logs_archive_r<id>` (холодное хранение: pg_dump / другой tablespace),
+     `drop` — удаляет.
+Последние RAID_LOG_ARCHIVE_KEEP_RAIDS завершённых рейдов не трогаются —
+их логи ещё нужны, например, отложенной выплате наград.
+
+Все DDL выполняются с lock_timeout: если блокировку не дали быстро,
+шаг откладывается до следующего прохода, а не встаёт в очередь перед атаками.
+"""
+import logging
+from typing import List, Optional
+
+from sqlalchemy import select, update, func, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from models import Raid
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_MODES = ("keep", "drop")
+
+# Сколько будущих рейдов обеспечивать партициями заранее
+PARTITIONS_AHEAD = 32
+# Сколько рейдов архивировать за один проход
+ARCHIVE_BATCH = 10
+# Сколько DDL ждёт блокировку, прежде чем сдаться до следующего прохода
+DDL_LOCK_TIMEOUT = "2s"
+
+
+def partition_name(raid_id: int) -> str:
+    return f"raid_logs_r{int(raid_id)}"
+
+
+async def _set_lock_timeout(db: AsyncSession) -> None:
+    await db.execute(text(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT}'"))
+
+
+async def _partition_state(db: AsyncSession, name: str) -> Optional[bool]:
+    """None — не партиция raid_logs; False — прикреплена; True — незавершённый DETACH CONCURRENTLY."""
+    result = await db.execute(
+        text(
+            "SELECT i.inhdetachpending FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'raid_logs'::regclass AND c.relname = :name"
+        ),
+        {"name": name},
+    )
+    return result.scalar()
+
+
+async def _table_exists(db: AsyncSession, name: str) -> bool:
+    return (await db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name})).scalar()
+
+
+async def ensure_partitions(db: AsyncSession, ahead: int = PARTITIONS_AHEAD) -> List[int]:
+    """Создаёт недостающие партиции для id после max(raids.id); возвращает их id."""
+    top = (await db.execute(select(func.coalesce(func.max(Raid.id), 0)))).scalar()
+
+    created = []
+    for raid_id in range(top + 1, top + ahead + 1):
+        name = partition_name(raid_id)
+        if await _table_exists(db, name):
+            continue
+        try:
+            # Отдельная транзакция на партицию: короткие блокировки, lock_timeout на каждую
+            await _set_lock_timeout(db)
+            await db.execute(text(
+                f"CREATE TABLE {name} PARTITION OF raid_logs "
+                f"FOR VALUES FROM ({raid_id}) TO ({raid_id + 1})"
+            ))
+            await db.commit()
+            created.append(raid_id)
+        except Exception as e:
+            await db.rollback()
+            logger.warning(f"Partition {name} not created: {e}")
+            break
+    return created
+
+
+async def _raids_to_archive(db: AsyncSession, keep_recent: int, limit: int) -> List[int]:
+    recent = (
+        select(Raid.id)
+        .where(Raid.is_active == False)
+        .order_by(Raid.id.desc())
+        .limit(keep_recent)
+    )
+    result = await db.execute(
+        select(Raid.id)
+        .where(Raid.is_active == False, Raid.archived_at.is_(None), Raid.id.not_in(recent))
+        .order_by(Raid.id)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+async def _summarize(db: AsyncSession, raid_id: int) -> int:
+    result = await db.execute(
+        text(
+            "INSERT INTO raid_log_summaries (raid_id, user_id, attacks, crits, misses, damage,"
+            " gold_earned, xp_earned, first_attack_at, last_attack_at)"
+            " SELECT raid_id, user_id, count(*),"
+            " count(*) FILTER (WHERE is_critical), count(*) FILTER (WHERE is_miss),"
+            " sum(damage), sum(gold_earned), sum(xp_earned), min(created_at), max(created_at)"
+            " FROM raid_logs WHERE raid_id = :raid_id GROUP BY raid_id, user_id"
+            " ON CONFLICT (raid_id, user_id) DO NOTHING"
+        ),
+        {"raid_id": raid_id},
+    )
+    return result.rowcount
+
+
+async def _detach_concurrently(session_factory: async_sessionmaker, name: str, pending: bool) -> None:
+    """DETACH ... CONCURRENTLY нельзя выполнять в транзакции — отдельная сессия в autocommit."""
+    async with session_factory() as db:
+        await db.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+        await db.execute(text(f"SET lock_timeout = '{DDL_LOCK_TIMEOUT}'"))
+        try:
+            # Прерванный DETACH CONCURRENTLY оставляет партицию в состоянии «pending»
+            suffix = "FINALIZE" if pending else "CONCURRENTLY"
+            await db.execute(text(f"ALTER TABLE raid_logs DETACH PARTITION {name} {suffix}"))
+        finally:
+            # Соединение вернётся в пул — сессионная настройка не должна утечь
+            await db.execute(text("RESET lock_timeout"))
+
+
+async def archive_raid(session_factory: async_sessionmaker, raid_id: int, mode: str) -> int:
+    """
+    Сворачивает логи рейда в итоги и убирает детальные строки; возвращает число игроков.
+    Шаги идемпотентны: прерванная архивация доделывается следующим проходом.
+    """
+    name = partition_name(raid_id)
+
+    async with session_factory() as db:
+        players = await _summarize(db, raid_id)
+        state = await _partition_state(db, name)
+        await db.commit()
+
+    if state is not None:
+        await _detach_concurrently(session_factory, name, pending=state)
+
+    async with session_factory() as db:
+        await _set_lock_timeout(db)
+        if await _table_exists(db, name):
+            if mode == "drop":
+                await db.execute(text(f"DROP TABLE {name}"))
+            else:
+                await db.execute(text(f"ALTER TABLE {name} RENAME TO raid_logs_archive_r{raid_id}"))
+        elif mode == "drop":
+            # Рейд из raid_logs_legacy — строки удаляются по индексу (raid_id, created_at)
+            await db.execute(text("DELETE FROM raid_logs WHERE raid_id = :raid_id"), {"raid_id": raid_id})
+
+        await db.execute(
+            update(Raid).where(Raid.id == raid_id).values(archived_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+    return players
+
+
+async def run_archive_pass(
+    session_factory: async_sessionmaker, keep_recent_raids: int, mode: str = "keep"
+) -> None:
+    """Один проход: партиции заранее + архивация до ARCHIVE_BATCH рейдов (каждый отдельно)."""
+    if mode not in ARCHIVE_MODES:
+        raise ValueError(f"RAID_LOG_ARCHIVE_MODE must be one of {ARCHIVE_MODES}")
+
+    async with session_factory() as db:
+        created = await ensure_partitions(db)
+        if created:
+            logger.info(f"🗂 raid_logs partitions created for raids {created}")
+
+    async with session_factory() as db:
+        raid_ids = await _raids_to_archive(db, keep_recent_raids, ARCHIVE_BATCH)
+        await db.rollback()
+
+    for raid_id in raid_ids:
+        try:
+            players = await archive_raid(session_factory, raid_id, mode)
+            logger.info(f"📦 Raid {raid_id} archived: {players} player summaries ({mode})")
+        except Exception as e:
+            logger.error(f"Raid {raid_id} archive error: {e}", exc_info=True)
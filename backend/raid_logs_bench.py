@@ -0,0 +1,140 @@
+# backend/raid_logs_bench.py
+"""
+Генератор данных и бенчмарк горячих запросов к raid_logs.
+
+Создаёт рейды по очереди (предыдущий завершается), для каждого — N логов
+через generate_series на стороне Postgres, и после каждой порции рейдов
+замеряет запросы текущего рейда:
+  - feed    — последние 50 ударов (raid_id = ? ORDER BY created_at DESC);
+  - rewards — суммы урона по игрокам (как в reward_raid_participants).
+С партициями (по умолчанию) время остаётся ровным при росте таблицы
+до десятков миллионов строк; `--no-partitions` пишет логи всех рейдов
+бенчмарка в одну общую партицию — для сравнения с непартиционированной таблицей.
+
+Запускать на отдельной БД (DATABASE_URL): данные бенчмарка не удаляются.
+    python raid_logs_bench.py --raids 40 --rows-per-raid 500000 --report-every 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from config import DATABASE_URL
+from migrations import run_migrations
+from raid_log_archive import ensure_partitions, PARTITIONS_AHEAD
+
+SEED_USERS = """
+INSERT INTO users (username, password_hash, level, xp, gold)
+SELECT 'bench_' || g, 'bench', 1, 0, 0 FROM generate_series(1, :users) AS g
+ON CONFLICT (username) DO NOTHING
+"""
+
+NEW_RAID = """
+INSERT INTO raids (boss_name, boss_type, max_hp, current_hp, is_active, active_debuffs, traits)
+VALUES ('Bench Boss', 'normal', 1000000000, 1000000000, false, '{}', '{}')
+RETURNING id
+"""
+
+SEED_LOGS = """
+WITH u AS (SELECT array_agg(id) AS ids FROM users WHERE username LIKE 'bench\\_%')
+INSERT INTO raid_logs (raid_id, user_id, sport_type, damage, gold_earned, xp_earned,
+                       is_critical, is_miss, created_at)
+SELECT :raid_id,
+       u.ids[1 + g % array_length(u.ids, 1)],
+       (ARRAY['run', 'cycle', 'swim', 'football'])[1 + g % 4],
+       50 + (random() * 500)::int, (random() * 20)::int, (random() * 30)::int,
+       random() < 0.1, random() < 0.05,
+       now() - make_interval(secs => :rows - g)
+FROM u, generate_series(1, :rows) AS g
+"""
+
+HOT_QUERIES = {
+    "feed": "SELECT id, user_id, damage, created_at FROM raid_logs"
+            " WHERE raid_id = :raid_id ORDER BY created_at DESC LIMIT 50",
+    "rewards": "SELECT user_id, sum(damage) FROM raid_logs WHERE raid_id = :raid_id GROUP BY user_id",
+}
+
+
+async def _timed(db: AsyncSession, sql: str, params: dict, repeats: int) -> float:
+    """Медиана времени запроса, мс."""
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        (await db.execute(text(sql), params)).all()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def run(
+    raids: int, rows_per_raid: int, users: int, report_every: int, repeats: int, partitions: bool
+) -> None:
+    engine = create_async_engine(DATABASE_URL)
+    sessions = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with engine.begin() as conn:
+        await run_migrations(conn)
+
+    async with sessions() as db:
+        await db.execute(text(SEED_USERS), {"users": users})
+        await db.commit()
+
+        if partitions:
+            await ensure_partitions(db)
+        else:
+            # id рейдов бенчмарка — за уже созданными партициями, одна партиция на все
+            start = (await db.execute(text("SELECT coalesce(max(id), 0) FROM raids"))).scalar() + PARTITIONS_AHEAD
+            await db.execute(text("SELECT setval('raids_id_seq', :start)"), {"start": start})
+            await db.execute(text(
+                f"CREATE TABLE raid_logs_bench_flat_{start + 1} PARTITION OF raid_logs "
+                f"FOR VALUES FROM ({start + 1}) TO ({start + raids + 1})"
+            ))
+            await db.commit()
+
+        total_rows = (await db.execute(text("SELECT count(*) FROM raid_logs"))).scalar()
+        print(f"{'raids':>6} {'rows':>12} {'feed ms':>9} {'rewards ms':>11}  partition")
+        for n in range(1, raids + 1):
+            if partitions:
+                await ensure_partitions(db)
+            raid_id = (await db.execute(text(NEW_RAID))).scalar()
+            await db.execute(text(SEED_LOGS), {"raid_id": raid_id, "rows": rows_per_raid})
+            table = (await db.execute(
+                text("SELECT tableoid::regclass::text FROM raid_logs WHERE raid_id = :raid_id LIMIT 1"),
+                {"raid_id": raid_id},
+            )).scalar()
+            await db.commit()
+            total_rows += rows_per_raid
+
+            if n % report_every and n != raids:
+                continue
+            await db.execute(text(f"ANALYZE {table}"))
+            await db.commit()
+            timings = [
+                await _timed(db, sql, {"raid_id": raid_id}, repeats) for sql in HOT_QUERIES.values()
+            ]
+            print(f"{n:>6} {total_rows:>12,} {timings[0]:>9.2f} {timings[1]:>11.2f}  {table}")
+
+    await engine.dispose()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк raid_logs при росте числа логов")
+    parser.add_argument("--raids", type=int, default=40, help="сколько рейдов сгенерировать")
+    parser.add_argument("--rows-per-raid", type=int, default=500_000, help="логов на рейд")
+    parser.add_argument("--users", type=int, default=5_000, help="игроков-участников")
+    parser.add_argument("--report-every", type=int, default=5, help="замер после каждых N рейдов")
+    parser.add_argument("--repeats", type=int, default=7, help="повторов запроса (берётся медиана)")
+    parser.add_argument("--no-partitions", action="store_true",
+                        help="без партиций на рейд — все логи в одной общей партиции")
+    args = parser.parse_args(argv)
+
+    asyncio.run(run(
+        args.raids, args.rows_per_raid, args.users, args.report_every, args.repeats,
+        partitions=not args.no_partitions,
+    ))
+
+
+if __name__ == "__main__":
+    main()
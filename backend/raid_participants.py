@@ -0,0 +1,98 @@
+# backend/raid_participants.py
+"""
+Участники рейда.
+
+Участник — игрок, у которого есть строка в рейтинге рейда `raid:<id>`
+(`leaderboard_totals`, обновляется при каждой атаке). Число участников
+берётся из индекса рангов в памяти, списки — keyset-запросами по индексам
+(board, damage, user_id) и (board, last_attack_at, user_id) с подтягиванием
+профилей по первичному ключу. Таблица `users` целиком не сканируется.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from leaderboard import leaderboards, raid_board
+from models import User, LeaderboardTotal
+from schemas import RaidParticipant, RaidParticipantsPage
+
+AVATAR_COLORS = ["#e94560", "#0f3460", "#533483", "#e62e2d", "#f2a365", "#222831", "#00adb5"]
+
+ORDER_BY_DAMAGE = "damage"
+ORDER_BY_RECENT = "recent"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _encode_cursor(order: str, row: RaidParticipant) -> str:
+    if order == ORDER_BY_DAMAGE:
+        return f"{row.damage}:{row.user_id}"
+    micros = (row.last_attack_at - _EPOCH) // timedelta(microseconds=1)
+    return f"{micros}:{row.user_id}"
+
+
+def _decode_cursor(order: str, cursor: Optional[str]) -> Optional[Tuple[object, int]]:
+    if not cursor:
+        return None
+    try:
+        value, user_id = (int(part) for part in cursor.split(":", 1))
+    except ValueError:
+        raise ValueError("Некорректный курсор")
+    if order == ORDER_BY_RECENT:
+        return _EPOCH + timedelta(microseconds=value), user_id
+    return value, user_id
+
+
+async def list_participants(
+    db: AsyncSession, raid_id: int, order: str = ORDER_BY_RECENT, limit: int = 12,
+    after: Optional[str] = None,
+) -> List[RaidParticipant]:
+    """Участники рейда по убыванию урона или последней активности, после курсора."""
+    if order not in (ORDER_BY_DAMAGE, ORDER_BY_RECENT):
+        raise ValueError(f"Неизвестный порядок: {order}")
+    sort_column = LeaderboardTotal.damage if order == ORDER_BY_DAMAGE else LeaderboardTotal.last_attack_at
+
+    page = (
+        select(LeaderboardTotal.user_id, LeaderboardTotal.damage, LeaderboardTotal.last_attack_at)
+        .where(LeaderboardTotal.board == raid_board(raid_id))
+        .order_by(sort_column.desc(), LeaderboardTotal.user_id.desc())
+        .limit(limit)
+    )
+    cursor = _decode_cursor(order, after)
+    if cursor is not None:
+        page = page.where(tuple_(sort_column, LeaderboardTotal.user_id) < tuple_(*cursor))
+    page = page.subquery("page")
+
+    result = await db.execute(
+        select(User.id, User.username, User.level, page.c.damage, page.c.last_attack_at)
+        .join(page, page.c.user_id == User.id)
+        .order_by(page.c[sort_column.key].desc(), page.c.user_id.desc())
+    )
+    return [
+        RaidParticipant(
+            username=username or "Hero",
+            level=level,
+            avatar_color=AVATAR_COLORS[user_id % len(AVATAR_COLORS)],
+            user_id=user_id,
+            damage=damage,
+            last_attack_at=last_attack_at,
+        )
+        for user_id, username, level, damage, last_attack_at in result
+    ]
+
+
+async def count_participants(db: AsyncSession, raid_id: int) -> int:
+    return await leaderboards.size(db, raid_board(raid_id))
+
+
+async def get_participants_page(
+    db: AsyncSession, raid_id: int, order: str, limit: int, after: Optional[str]
+) -> RaidParticipantsPage:
+    rows = await list_participants(db, raid_id, order, limit, after)
+    return RaidParticipantsPage(
+        total=await count_participants(db, raid_id),
+        participants=rows,
+        next_cursor=_encode_cursor(order, rows[-1]) if len(rows) == limit else None,
+    )
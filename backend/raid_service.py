@@ -0,0 +1,193 @@
+# backend/raid_service.py
+"""
+Игровые операции над рейдом: расчёт удара, списание HP, награды за убийство.
+
+HP активного босса меняется на стороне БД одним запросом — горячая строка
+рейда не читается в ORM для изменения, иначе параллельные атаки
+перезаписывают друг друга.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Set
+
+from sqlalchemy import select, update, func, literal, BigInteger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from boss_factory import BossFactory
+from mechanics import get_strategy, DamageCalculationResult
+from models import User, Raid, RaidLog
+from schemas import WorkoutData
+from upgrade_effects import UpgradePipeline
+
+logger = logging.getLogger(__name__)
+
+XP_PER_HIT = 100
+XP_PER_MISS = 10
+KILL_BONUS_GOLD = 50
+
+
+@dataclass
+class BossHit:
+    damage_dealt: int  # Фактический урон (не больше оставшегося HP)
+    new_hp: int
+    killed: bool       # Именно этот удар добил босса
+
+
+async def get_active_raid(db: AsyncSession) -> Raid:
+    """Возвращает активный рейд; если его нет — создаёт нового босса и коммитит."""
+    result = await db.execute(select(Raid).where(Raid.is_active == True))
+    raid = result.scalar_one_or_none()
+    if not raid:
+        raid = await BossFactory.create_random_boss(db)
+        await db.commit()
+        await db.refresh(raid)
+    return raid
+
+
+async def apply_boss_damage(db: AsyncSession, raid_id: int, damage: int) -> Optional[BossHit]:
+    """
+    Атомарно снимает HP у активного босса одним запросом:
+
+        UPDATE raids SET current_hp = current_hp - :damage,
+                         is_active  = current_hp > :damage
+        WHERE id = :raid_id AND is_active
+        RETURNING current_hp
+
+    Блокировка строки рейда держится до коммита, поэтому запрос выполняется
+    последним из общих строк атаки. HP до удара — `current_hp + :damage`:
+    отрицательный остаток значит, что удар добил босса с запасом — урон
+    урезается до оставшегося HP, а HP выставляется в 0 (строка уже заблокирована).
+    Возвращает None, если рейд уже неактивен (босса добили параллельным запросом).
+    """
+    damage = max(int(damage), 0)
+    stmt = (
+        update(Raid)
+        .where(Raid.id == raid_id, Raid.is_active == True)
+        .values(current_hp=Raid.current_hp - damage, is_active=Raid.current_hp > damage)
+        .returning(Raid.current_hp)
+        .execution_options(synchronize_session=False)
+    )
+    new_hp = (await db.execute(stmt)).scalar_one_or_none()
+    if new_hp is None:
+        return None
+
+    if new_hp < 0:
+        await db.execute(
+            update(Raid).where(Raid.id == raid_id).values(current_hp=0)
+            .execution_options(synchronize_session=False)
+        )
+    return BossHit(
+        damage_dealt=damage + min(new_hp, 0),
+        new_hp=max(new_hp, 0),
+        killed=new_hp <= 0,
+    )
+
+
+def calculate_attack(
+    workout_data: WorkoutData, user_level: int, raid: Raid, upgrades: UpgradePipeline
+) -> DamageCalculationResult:
+    """Считает урон по стратегии вида спорта (входные данные не изменяются)."""
+    strategy_class = get_strategy(workout_data.sport_type)
+    strategy = strategy_class(
+        data=workout_data,
+        user_level=user_level,
+        raid_debuffs=raid.active_debuffs or {},
+        boss_traits=raid.traits or {},
+        upgrades=upgrades
+    )
+    return strategy.calculate()
+
+
+def xp_for_attack(calc_result: DamageCalculationResult) -> int:
+    return XP_PER_MISS if calc_result.is_miss else XP_PER_HIT
+
+
+def attack_message(damage: int, is_crit: bool, is_miss: bool, killed: bool = False) -> str:
+    """Текст результата удара (тот же, что видит атакующий)."""
+    msg = f"Удар на {damage}!"
+    if is_miss:
+        msg = "💨 Босс УВЕРНУЛСЯ!"
+    elif damage > 0:
+        if is_crit:
+            msg = f"💥 КРИТ! Нанесено {damage} урона!"
+        else:
+            msg = f"⚔️ Нанесено {damage} урона."
+    if killed:
+        msg += " ☠️ БОСС ПОВЕРЖЕН!"
+    return msg
+
+
+def raid_reward_pool(raid: Raid) -> int:
+    """Банк монет убитого босса, делится между участниками по урону."""
+    return BossFactory.calculate_reward_pool(raid.max_hp, raid.traits or {})
+
+
+async def reward_raid_participants(db: AsyncSession, raid_id: int, reward_pool: int) -> Dict[int, int]:
+    """
+    Начисляет награды за убийство одним запросом (без коммита):
+
+        UPDATE users SET gold = gold + :bonus + :pool * per_user.damage // total
+        FROM (SELECT user_id, sum(damage) AS damage FROM raid_logs
+              WHERE raid_id = :raid_id GROUP BY user_id) AS per_user
+        WHERE users.id = per_user.user_id
+        RETURNING users.id, <награда>
+
+    Каждый участник получает KILL_BONUS_GOLD и долю банка
+    (`BossFactory.calculate_reward_pool`) пропорционально своему урону.
+    Возвращает {user_id: начислено}.
+    """
+    per_user = (
+        select(RaidLog.user_id, func.sum(RaidLog.damage).label("damage"))
+        .where(RaidLog.raid_id == raid_id)
+        .group_by(RaidLog.user_id)
+        .subquery("per_user")
+    )
+    total_damage = (
+        select(func.greatest(func.coalesce(func.sum(RaidLog.damage), 0), 1))
+        .where(RaidLog.raid_id == raid_id)
+        .scalar_subquery()
+    )
+    reward = KILL_BONUS_GOLD + literal(int(reward_pool), BigInteger) * per_user.c.damage // total_damage
+
+    result = await db.execute(
+        update(User)
+        .where(User.id == per_user.c.user_id)
+        .values(gold=User.gold + reward)
+        .returning(User.id, reward)
+        .execution_options(synchronize_session=False)
+    )
+    return {user_id: int(gold) for user_id, gold in result.all()}
+
+
+async def pay_raid_rewards(session_factory: async_sessionmaker, raid_id: int, reward_pool: int) -> Dict[int, int]:
+    """Начисляет награды в отдельной транзакции (для отложенной выплаты)."""
+    async with session_factory() as db:
+        rewards = await reward_raid_participants(db, raid_id, reward_pool)
+        await db.commit()
+    return rewards
+
+
+# Ссылки на фоновые задачи, чтобы их не собрал GC до завершения
+_reward_tasks: Set[asyncio.Task] = set()
+
+
+def schedule_raid_rewards(
+    session_factory: async_sessionmaker,
+    raid_id: int,
+    reward_pool: int,
+    on_paid: Optional[Callable[[], None]] = None,
+) -> None:
+    """Откладывает выплату наград в фоновую задачу (вызывать после коммита убийства)."""
+    async def _run():
+        try:
+            rewards = await pay_raid_rewards(session_factory, raid_id, reward_pool)
+            logger.info(f"💰 Raid {raid_id}: награды выплачены {len(rewards)} участникам (банк {reward_pool})")
+            if on_paid is not None:
+                on_paid()
+        except Exception as e:
+            logger.error(f"❌ Raid {raid_id} rewards error: {e}", exc_info=True)
+
+    task = asyncio.create_task(_run())
+    _reward_tasks.add(task)
+    task.add_done_callback(_reward_tasks.discard)
@@ -0,0 +1,107 @@
+# backend/raid_state.py
+"""
+Снимок состояния рейда в памяти процесса.
+
+Рейд меняется только при атаке (а вместе с ней — при убийстве и появлении босса),
+поэтому `RaidState` собирается из БД один раз на версию и затем отдаётся
+всем запросам с ETag. В спокойные периоды запросы к БД не выполняются.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from raid_service import get_active_raid
+from raid_participants import list_participants, count_participants, ORDER_BY_RECENT
+from raid_feed import raid_feed
+from metrics import observe_boss
+from schemas import RaidState
+
+# Сколько участников и последних ударов показывать в снимке рейда
+PARTICIPANTS_PREVIEW_SIZE = 12
+RECENT_LOGS_SIZE = 5
+
+
+async def build_raid_state(db: AsyncSession) -> RaidState:
+    """Собирает состояние активного рейда из БД (при отсутствии — создаёт босса)."""
+    raid = await get_active_raid(db)
+
+    # Лента ударов — из кольцевого буфера в памяти, без SQL
+    display_logs = await raid_feed.recent(db, raid.id, RECENT_LOGS_SIZE)
+
+    # Превью: последние атаковавшие этого босса; счётчик — все участники рейда
+    participants = await list_participants(db, raid.id, ORDER_BY_RECENT, PARTICIPANTS_PREVIEW_SIZE)
+    participants_count = await count_participants(db, raid.id)
+    observe_boss(raid.current_hp, raid.max_hp)
+
+    return RaidState(
+        boss_name=raid.boss_name,
+        boss_type=raid.boss_type,
+        traits=raid.traits,
+        max_hp=raid.max_hp,
+        current_hp=raid.current_hp,
+        active_debuffs=raid.active_debuffs or {},
+        active_players_count=participants_count,
+        recent_logs=display_logs,
+        participants=participants
+    )
+
+
+@dataclass(frozen=True)
+class RaidSnapshot:
+    version: int
+    etag: str
+    state: RaidState
+    data: dict    # JSON-совместимый dict (для SSE-патчей)
+    body: bytes   # Готовое тело HTTP-ответа
+
+
+class RaidStateCache:
+    """
+    Версионированный снимок рейда.
+    `bump()` вызывается после каждого изменения рейда (атака, убийство, новый босс);
+    следующий `get()` пересобирает снимок, остальные получают его из памяти.
+    """
+
+    def __init__(self):
+        # Эпоха процесса в ETag: после рестарта версии начинаются заново
+        self._epoch = format(int(time.time()), "x")
+        self._version = 1
+        self._snapshot: Optional[RaidSnapshot] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def bump(self) -> None:
+        """Отмечает снимок устаревшим."""
+        self._version += 1
+
+    async def get(self, db: AsyncSession) -> RaidSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self._version:
+            return snapshot
+
+        # Одна пересборка на версию, даже если запросов пришло много одновременно
+        async with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == self._version:
+                return snapshot
+
+            version = self._version
+            state = await build_raid_state(db)
+            snapshot = RaidSnapshot(
+                version=version,
+                etag=f'"raid-{self._epoch}-{version}"',
+                state=state,
+                data=state.model_dump(mode="json"),
+                body=state.model_dump_json().encode("utf-8"),
+            )
+            self._snapshot = snapshot
+            return snapshot
+
+
+raid_state_cache = RaidStateCache()
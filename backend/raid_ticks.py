@@ -0,0 +1,123 @@
+# backend/raid_ticks.py
+"""
+Изменения рейда по времени (задача планировщика, scheduler.py).
+
+Каждый проход — несколько set-based UPDATE по всем активным рейдам:
+  - регенерация: трейт `regen_daily_percent` (доля max_hp в сутки).
+    HP прибавляется за время с `raids.regen_at`, целыми единицами;
+    `regen_at` сдвигается ровно на «оплаченное» время, дробный остаток
+    не теряется при частых тиках и догоняется после простоя;
+  - истечение дебаффов: в `active_debuffs` значение-число — unix-время
+    окончания дебаффа, такие ключи удаляются после срока
+    (`true` — дебафф до смерти босса, не истекает);
+  - таймаут: рейд старше RAID_MAX_DURATION_DAYS закрывается без наград
+    (босс уходит, `current_hp > 0`), и сразу создаётся следующий босс.
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import List, Optional
+
+from sqlalchemy import select, update, func, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from boss_factory import BossFactory
+from models import Raid
+
+logger = logging.getLogger(__name__)
+
+# У босса на полном HP регенерация не копится
+SYNC_FULL_HP_REGEN = text(
+    "UPDATE raids SET regen_at = now()"
+    " WHERE is_active AND current_hp >= max_hp"
+    " AND (traits->>'regen_daily_percent')::float8 > 0"
+)
+
+APPLY_REGEN = text("""
+UPDATE raids AS r SET
+    current_hp = LEAST(r.max_hp, r.current_hp + g.gain),
+    regen_at = CASE WHEN r.current_hp + g.gain >= r.max_hp THEN now()
+                    ELSE g.since + make_interval(secs => g.gain / g.rate) END
+FROM (
+    SELECT id, since, rate, floor(rate * extract(epoch FROM now() - since))::bigint AS gain
+    FROM (
+        SELECT id, coalesce(regen_at, created_at) AS since,
+               max_hp * (traits->>'regen_daily_percent')::float8 / 86400 AS rate
+        FROM raids
+        WHERE is_active AND current_hp > 0 AND current_hp < max_hp
+          AND (traits->>'regen_daily_percent')::float8 > 0
+    ) AS s
+) AS g
+WHERE r.id = g.id AND r.is_active AND g.gain > 0
+RETURNING r.id
+""")
+
+EXPIRE_DEBUFFS = text("""
+UPDATE raids SET active_debuffs = (
+    SELECT coalesce(json_object_agg(d.key, d.value), '{}'::json)
+    FROM json_each(raids.active_debuffs) AS d
+    WHERE json_typeof(d.value) <> 'number' OR d.value::text::float8 > extract(epoch FROM now())
+)
+WHERE is_active AND EXISTS (
+    SELECT 1 FROM json_each(raids.active_debuffs) AS d
+    WHERE json_typeof(d.value) = 'number' AND d.value::text::float8 <= extract(epoch FROM now())
+)
+RETURNING id
+""")
+
+
+@dataclass
+class RaidTickResult:
+    regenerated: List[int] = field(default_factory=list)
+    debuffs_expired: List[int] = field(default_factory=list)
+    timed_out: List[int] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.regenerated or self.debuffs_expired or self.timed_out)
+
+
+async def apply_regen(db: AsyncSession) -> List[int]:
+    """Регенерация всех активных рейдов за прошедшее время; возвращает изменённые id."""
+    await db.execute(SYNC_FULL_HP_REGEN)
+    return list((await db.execute(APPLY_REGEN)).scalars().all())
+
+
+async def expire_debuffs(db: AsyncSession) -> List[int]:
+    return list((await db.execute(EXPIRE_DEBUFFS)).scalars().all())
+
+
+async def expire_timed_out_raids(db: AsyncSession, max_duration: timedelta) -> List[int]:
+    """Закрывает рейды старше max_duration (без наград) и создаёт нового босса."""
+    result = await db.execute(
+        update(Raid)
+        .where(Raid.is_active == True, Raid.created_at < func.now() - max_duration)
+        .values(is_active=False)
+        .returning(Raid.id)
+        .execution_options(synchronize_session=False)
+    )
+    raid_ids = list(result.scalars().all())
+    if raid_ids:
+        still_active = (await db.execute(select(Raid.id).where(Raid.is_active == True).limit(1))).scalar()
+        if still_active is None:
+            await BossFactory.create_random_boss(db)
+    return raid_ids
+
+
+async def run_raid_tick(
+    session_factory: async_sessionmaker, max_duration: Optional[timedelta]
+) -> RaidTickResult:
+    """Один проход планировщика в одной транзакции."""
+    result = RaidTickResult()
+    async with session_factory() as db:
+        if max_duration is not None:
+            result.timed_out = await expire_timed_out_raids(db, max_duration)
+        result.regenerated = await apply_regen(db)
+        result.debuffs_expired = await expire_debuffs(db)
+        await db.commit()
+
+    for raid_id in result.timed_out:
+        logger.info(f"⌛ Raid {raid_id}: время вышло, босс ушёл")
+    if result.regenerated:
+        logger.info(f"☢️ Регенерация боссов: {result.regenerated}")
+    return result
@@ -0,0 +1,140 @@
+# backend/scheduler.py
+"""
+Планировщик фоновых задач внутри приложения.
+
+Задачи выполняет только лидер — процесс, который держит сессионный
+`pg_advisory_lock(SCHEDULER_LOCK_KEY)` на отдельном соединении. Остальные
+воркеры (и реплики) раз в LEADER_RETRY_SECONDS пробуют захватить блокировку;
+если соединение лидера обрывается, Postgres снимает её сам.
+
+Задачи считают работу по прошедшему времени (а не «один шаг за тик»),
+поэтому пропущенные запуски не накапливаются: следующий проход догоняет всё сразу.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_lock лидера планировщика (рядом с MIGRATIONS_LOCK_KEY)
+SCHEDULER_LOCK_KEY = 7_240_319
+
+# Как часто не-лидер пробует стать лидером (секунды)
+LEADER_RETRY_SECONDS = 30.0
+# Максимальный сон между проверками (чтобы вовремя заметить потерю соединения)
+MAX_SLEEP_SECONDS = 30.0
+
+
+@dataclass
+class ScheduledJob:
+    name: str
+    interval: float
+    fn: Callable[[], Awaitable[None]]
+    next_run: float = 0.0
+
+
+class LeaderScheduler:
+    def __init__(self, engine: AsyncEngine, lock_key: int = SCHEDULER_LOCK_KEY):
+        self._engine = engine
+        self._lock_key = lock_key
+        self._jobs: List[ScheduledJob] = []
+        self._lock_conn: Optional[AsyncConnection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_conn is not None
+
+    def add_job(self, name: str, interval_seconds: float, fn: Callable[[], Awaitable[None]]) -> None:
+        """Регистрирует задачу; первый запуск — сразу после получения лидерства."""
+        self._jobs.append(ScheduledJob(name, interval_seconds, fn))
+
+    async def start(self) -> None:
+        if self._task is None and self._jobs:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"⏱ Scheduler started: {', '.join(job.name for job in self._jobs)}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._release()
+
+    async def _ensure_leader(self) -> bool:
+        """Проверяет, что лидерство ещё за нами, или пытается его получить."""
+        if self._lock_conn is not None:
+            try:
+                await self._lock_conn.execute(text("SELECT 1"))
+                await self._lock_conn.commit()
+                return True
+            except Exception as e:
+                logger.warning(f"⏱ Scheduler lost leader connection: {e}")
+                await self._drop_connection()
+
+        conn = await self._engine.connect()
+        try:
+            acquired = (await conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self._lock_key}
+            )).scalar()
+            # Сессионная блокировка переживает коммит; соединение не остаётся в транзакции
+            await conn.commit()
+        except Exception:
+            await conn.close()
+            raise
+        if not acquired:
+            await conn.close()
+            return False
+
+        self._lock_conn = conn
+        for job in self._jobs:
+            job.next_run = 0.0
+        logger.info("⏱ Scheduler: this process is the leader")
+        return True
+
+    async def _drop_connection(self) -> None:
+        conn, self._lock_conn = self._lock_conn, None
+        if conn is not None:
+            try:
+                await conn.invalidate()
+            except Exception:
+                pass
+
+    async def _release(self) -> None:
+        if self._lock_conn is None:
+            return
+        try:
+            await self._lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self._lock_key})
+            await self._lock_conn.commit()
+            await self._lock_conn.close()
+            self._lock_conn = None
+        except Exception:
+            await self._drop_connection()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                leader = await self._ensure_leader()
+            except Exception as e:
+                logger.error(f"Scheduler leader check error: {e}")
+                leader = False
+            if not leader:
+                await asyncio.sleep(LEADER_RETRY_SECONDS)
+                continue
+
+            for job in self._jobs:
+                if time.monotonic() < job.next_run:
+                    continue
+                try:
+                    await job.fn()
+                except Exception as e:
+                    logger.error(f"Scheduled job {job.name} error: {e}", exc_info=True)
+                job.next_run = time.monotonic() + job.interval
+
+            next_run = min(job.next_run for job in self._jobs)
+            await asyncio.sleep(min(max(next_run - time.monotonic(), 0.0), MAX_SLEEP_SECONDS))
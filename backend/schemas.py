@@ -50,6 +50,14 @@ class RaidParticipant(BaseModel):
     username: str
     level: int
     avatar_color: str 
+    user_id: Optional[int] = None
+    damage: int = 0
+    last_attack_at: Optional[datetime] = None
+
+class RaidParticipantsPage(BaseModel):
+    total: int
+    participants: List[RaidParticipant]
+    next_cursor: Optional[str] = None  # Передать в ?after= для следующей страницы
 
 class LogDisplay(BaseModel):
     username: str
@@ -69,6 +77,21 @@ class RaidState(BaseModel):
     recent_logs: List[LogDisplay]
     participants: List[RaidParticipant]
 
+# --- LEADERBOARD ---
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    username: str
+    damage: int
+
+class LeaderboardPage(BaseModel):
+    board: str               # raid:<id> | all | sport:<sport>
+    total_players: int
+    entries: List[LeaderboardEntry]
+    me: Optional[LeaderboardEntry] = None
+    next_cursor: Optional[str] = None  # Передать в ?after= для следующей страницы
+
 class WorkoutData(BaseModel):
     user_id: Optional[int] = None
     sport_type: str = Field(..., description="run, cycle, swim, football")
@@ -88,3 +111,19 @@ class AttackResult(BaseModel):
     is_critical: bool
     new_boss_hp: int
     message: str 
+
+# --- OCR JOBS ---
+
+class OcrJobRead(BaseModel):
+    job_id: str
+    status: str  # queued | running | done | failed
+    result: Optional[WorkoutData] = None
+    error: Optional[str] = None
+
+
+class BatchScanItem(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    sport_type: str
+    job_id: Optional[str] = None  # None — скриншот не принят (см. error)
+    error: Optional[str] = None
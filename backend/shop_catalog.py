@@ -0,0 +1,84 @@
+# backend/shop_catalog.py
+"""
+Каталог магазина, собранный один раз при старте.
+
+Всё статичное (названия, описания, цены по уровням, зависимости разблокировки)
+заранее сериализуется: для каждого апгрейда хранится готовый JSON-фрагмент
+на каждую пару (уровень, заблокирован). Ответ `/api/shop` — это склейка
+фрагментов по уровням игрока, без Pydantic и без пересчёта цен.
+
+ETag ответа зависит только от версии каталога и уровней игрока.
+"""
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from schemas import ShopItemRead
+from shop_config import SHOP_ITEMS, BaseUpgrade
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    key: str
+    max_level: int
+    requirements: Tuple[Tuple[str, int], ...]  # ((key, min_level), ...)
+    fragments: Tuple[Tuple[bytes, bytes], ...]  # [level] -> (открыт, заблокирован)
+    prices: Tuple[int, ...]                     # [level] -> цена следующего уровня (0 на максимуме)
+
+    def is_locked(self, levels: Dict[str, int]) -> bool:
+        return any(levels.get(key, 0) < min_level for key, min_level in self.requirements)
+
+    def level_of(self, levels: Dict[str, int]) -> int:
+        return min(max(levels.get(self.key, 0), 0), self.max_level)
+
+
+def _build_entry(item: BaseUpgrade) -> CatalogEntry:
+    fragments = []
+    prices = []
+    for level in range(item.max_level + 1):
+        is_maxed = level >= item.max_level
+        price = 0 if is_maxed else item.get_price(level)
+        prices.append(price)
+        fragments.append(tuple(
+            ShopItemRead(
+                key=item.key, name=item.name, description=item.description,
+                sport_type=item.sport_type, current_level=level,
+                max_level=item.max_level, next_price=price,
+                is_locked=is_locked, is_maxed=is_maxed,
+            ).model_dump_json().encode("utf-8")
+            for is_locked in (False, True)
+        ))
+    return CatalogEntry(
+        key=item.key,
+        max_level=item.max_level,
+        requirements=tuple(item.lock_requirements().items()),
+        fragments=tuple(fragments),
+        prices=tuple(prices),
+    )
+
+
+class ShopCatalog:
+    def __init__(self, items: List[BaseUpgrade]):
+        self.entries: Dict[str, CatalogEntry] = {item.key: _build_entry(item) for item in items}
+
+        hasher = hashlib.sha256()
+        for entry in self.entries.values():
+            for pair in entry.fragments:
+                for fragment in pair:
+                    hasher.update(fragment)
+        self.version = hasher.hexdigest()[:12]
+
+    def etag(self, levels: Dict[str, int]) -> str:
+        state = ",".join(f"{key}:{entry.level_of(levels)}" for key, entry in self.entries.items())
+        digest = hashlib.blake2b(state.encode("utf-8"), digest_size=8).hexdigest()
+        return f'"shop-{self.version}-{digest}"'
+
+    def render(self, levels: Dict[str, int]) -> bytes:
+        """JSON-массив `ShopItemRead` с уровнями игрока."""
+        return b"[" + b",".join(
+            entry.fragments[entry.level_of(levels)][entry.is_locked(levels)]
+            for entry in self.entries.values()
+        ) + b"]"
+
+
+shop_catalog = ShopCatalog(SHOP_ITEMS)
@@ -1,7 +1,6 @@
 # backend/shop_config.py
 from abc import ABC, abstractmethod
 from typing import Dict, List, Optional
-from schemas import WorkoutData
 
 # Базовый класс апгрейда
 class BaseUpgrade(ABC):
@@ -19,16 +18,20 @@ class BaseUpgrade(ABC):
             return 999999
         return self.base_price * (current_level + 1)
         
+    # Какие уровни других апгрейдов нужны для разблокировки {key: min_level}
+    def lock_requirements(self) -> Dict[str, int]:
+        return {}
+        
     def is_locked(self, user_upgrades: Dict[str, int]) -> bool:
-        return False
+        return any(user_upgrades.get(key, 0) < level for key, level in self.lock_requirements().items())
 
-    # Хук 1: Модификация входных данных (дистанция, время)
-    def modify_input(self, level: int, data: WorkoutData):
-        pass
+    # Хук 1: Прибавка к входным данным (поле WorkoutData -> величина) для своего спорта
+    def input_bonus(self, level: int) -> Dict[str, float]:
+        return {}
         
-    # Хук 2: Модификация итогового урона
-    def modify_damage(self, level: int, damage: float) -> float:
-        return damage
+    # Хук 2: Множитель итогового урона для своего спорта
+    def damage_multiplier(self, level: int) -> float:
+        return 1.0
 
 # --- Конкретные реализации ---
 
@@ -37,27 +40,24 @@ class DurationUpgrade(BaseUpgrade):
         super().__init__(key, name, desc, sport)
         self.minutes_per_level = minutes_per_level
         
-    def modify_input(self, level: int, data: WorkoutData):
-        if data.sport_type == self.sport_type and data.duration_minutes is not None:
-            data.duration_minutes += (level * self.minutes_per_level)
+    def input_bonus(self, level: int) -> Dict[str, float]:
+        return {"duration_minutes": level * self.minutes_per_level}
 
 class DistanceUpgrade(BaseUpgrade):
     def __init__(self, key, name, desc, sport, km_per_level):
         super().__init__(key, name, desc, sport)
         self.km_per_level = km_per_level
         
-    def modify_input(self, level: int, data: WorkoutData):
-        if data.sport_type == self.sport_type and data.distance_km is not None:
-            data.distance_km += (level * self.km_per_level)
+    def input_bonus(self, level: int) -> Dict[str, float]:
+        return {"distance_km": level * self.km_per_level}
 
 class CaloriesUpgrade(BaseUpgrade):
     def __init__(self, key, name, desc, sport, kcal_per_level):
         super().__init__(key, name, desc, sport)
         self.kcal_per_level = kcal_per_level
         
-    def modify_input(self, level: int, data: WorkoutData):
-        if data.sport_type == self.sport_type and data.calories is not None:
-            data.calories += (level * self.kcal_per_level)
+    def input_bonus(self, level: int) -> Dict[str, float]:
+        return {"calories": level * self.kcal_per_level}
 
 class SuperUpgrade(BaseUpgrade):
     """Супер-апгрейд: x2 урон. Доступен только если куплены все остальные апгрейды этого спорта на макс."""
@@ -65,17 +65,12 @@ class SuperUpgrade(BaseUpgrade):
         super().__init__(key, name, desc, sport, max_level=1, base_price=2000)
         self.required_keys = required_keys
         
-    def is_locked(self, user_upgrades: Dict[str, int]) -> bool:
-        # Проверяем, что все пререквизиты 10 уровня
-        for req_key in self.required_keys:
-            if user_upgrades.get(req_key, 0) < 10:
-                return True
-        return False
+    def lock_requirements(self) -> Dict[str, int]:
+        # Все пререквизиты должны быть 10 уровня
+        return {req_key: 10 for req_key in self.required_keys}
         
-    def modify_damage(self, level: int, damage: float) -> float:
-        if level > 0 and damage > 0:
-            return damage * 2.0
-        return damage
+    def damage_multiplier(self, level: int) -> float:
+        return 2.0 if level > 0 else 1.0
 
 # --- Реестр Магазина ---
 
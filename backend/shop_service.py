@@ -0,0 +1,71 @@
+# backend/shop_service.py
+"""
+Покупка апгрейда одной транзакцией без read-modify-write в Python.
+
+    INSERT INTO user_upgrades (user_id, upgrade_key, level) VALUES (:uid, :key, 1)
+    ON CONFLICT ON CONSTRAINT _user_upgrade_uc
+        DO UPDATE SET level = user_upgrades.level + 1
+        WHERE user_upgrades.level = :expected_level
+    RETURNING level;
+
+    UPDATE users SET gold = gold - :price
+    WHERE id = :uid AND gold >= :price
+    RETURNING gold;
+
+Upsert берёт блокировку строки апгрейда, поэтому два быстрых тапа по одному
+товару выполняются по очереди: второй видит уже новый уровень и не проходит
+условие `level = :expected_level`. Списание золота условное — параллельные
+покупки разных товаров не уводят баланс в минус. Если любой из запросов не
+вернул строку, транзакция откатывается.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import User, UserUpgrade
+from shop_config import BaseUpgrade
+
+PURCHASE_OK = "ok"
+PURCHASE_NO_GOLD = "no_gold"
+PURCHASE_CONFLICT = "conflict"  # Уровень изменился параллельной покупкой
+
+
+@dataclass
+class PurchaseOutcome:
+    status: str
+    new_level: Optional[int] = None
+    new_gold: Optional[int] = None
+
+
+async def purchase_upgrade(
+    db: AsyncSession, user_id: int, item: BaseUpgrade, expected_level: int, price: int
+) -> PurchaseOutcome:
+    """Повышает апгрейд с expected_level на +1 и списывает price; коммитит или откатывает."""
+    upsert = insert(UserUpgrade).values(user_id=user_id, upgrade_key=item.key, level=1)
+    upsert = upsert.on_conflict_do_update(
+        constraint="_user_upgrade_uc",
+        set_={"level": UserUpgrade.level + 1},
+        where=(UserUpgrade.level == expected_level) & (UserUpgrade.level < item.max_level),
+    ).returning(UserUpgrade.level)
+
+    new_level = (await db.execute(upsert)).scalar_one_or_none()
+    if new_level is None or new_level != expected_level + 1:
+        await db.rollback()
+        return PurchaseOutcome(PURCHASE_CONFLICT)
+
+    new_gold = (await db.execute(
+        update(User)
+        .where(User.id == user_id, User.gold >= price)
+        .values(gold=User.gold - price)
+        .returning(User.gold)
+        .execution_options(synchronize_session=False)
+    )).scalar_one_or_none()
+    if new_gold is None:
+        await db.rollback()
+        return PurchaseOutcome(PURCHASE_NO_GOLD)
+
+    await db.commit()
+    return PurchaseOutcome(PURCHASE_OK, new_level=new_level, new_gold=new_gold)
@@ -0,0 +1,426 @@
+# backend/simulator.py
+"""
+Монте-Карло симулятор баланса: урон, время убийства боссов, награды.
+
+`batch_damage` — векторная (NumPy) версия `BaseWorkoutStrategy.calculate`:
+считает урон сразу для массивов тренировок, уровней, апгрейдов и трейтов
+босса. При одинаковых бросках кубика результат совпадает со скалярным кодом
+бит в бит — это проверяет `verify_against_scalar` (ключ `--verify`).
+
+Запуск:
+    python simulator.py --players 50 --raids 2000 --seed 42
+    python simulator.py --verify 100000
+"""
+import argparse
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from boss_factory import BossFactory
+from mechanics import get_strategy
+from raid_service import KILL_BONUS_GOLD
+from schemas import WorkoutData
+from upgrade_effects import compile_upgrades
+from shop_config import (
+    SHOP_REGISTRY, DurationUpgrade, DistanceUpgrade, CaloriesUpgrade, SuperUpgrade,
+)
+
+SPORTS = ["run", "cycle", "swim", "football"]
+SPORT_CODES = {sport: code for code, sport in enumerate(SPORTS)}
+RUN, CYCLE, SWIM, FOOTBALL = range(len(SPORTS))
+
+# Шанс пробития брони у плавания и футбола (см. _specific_calculation)
+ARMOR_BREAK_CHANCE = 30
+
+
+@dataclass
+class WorkoutBatch:
+    """Массивы одинаковой длины N: одна строка — одна атака."""
+    sport: np.ndarray             # int, коды из SPORT_CODES
+    distance_km: np.ndarray       # float
+    duration_minutes: np.ndarray  # int
+    calories: np.ndarray          # int
+    level: np.ndarray             # int
+    upgrades: Dict[str, np.ndarray]  # ключ апгрейда -> уровни (int)
+    evasion_chance: np.ndarray    # int, трейт босса
+    armor_reduction: np.ndarray   # float, трейт босса
+    armor_broken: np.ndarray      # bool, активный дебафф рейда armor_break
+
+    def __len__(self) -> int:
+        return len(self.sport)
+
+
+@dataclass
+class Rolls:
+    """Броски randint(1, 100): уворот босса и пробитие брони."""
+    evasion: np.ndarray
+    armor: np.ndarray
+
+
+def draw_rolls(rng: np.random.Generator, n: int) -> Rolls:
+    return Rolls(evasion=rng.integers(1, 101, size=n), armor=rng.integers(1, 101, size=n))
+
+
+def batch_damage(batch: WorkoutBatch, rolls: Rolls):
+    """
+    Возвращает (damage: int64[N], is_miss: bool[N], armor_break: bool[N]).
+    Порядок операций повторяет BaseWorkoutStrategy.calculate, чтобы
+    совпадали и округления float.
+    """
+    sport = batch.sport
+    distance = batch.distance_km.astype(np.float64).copy()
+    duration = batch.duration_minutes.astype(np.int64).copy()
+    calories = batch.calories.astype(np.int64).copy()
+
+    # 0. Апгрейды на входные данные (только своего вида спорта)
+    for key, levels in batch.upgrades.items():
+        item = SHOP_REGISTRY[key]
+        mask = (levels > 0) & (sport == SPORT_CODES[item.sport_type])
+        if isinstance(item, DurationUpgrade):
+            duration = np.where(mask, duration + levels * item.minutes_per_level, duration)
+        elif isinstance(item, DistanceUpgrade):
+            distance = np.where(mask, distance + levels * item.km_per_level, distance)
+        elif isinstance(item, CaloriesUpgrade):
+            calories = np.where(mask, calories + levels * item.kcal_per_level, calories)
+
+    # 0.1 Уворот
+    is_miss = (batch.evasion_chance > 0) & (rolls.evasion <= batch.evasion_chance)
+
+    # 1. База по виду спорта
+    run_dmg = distance * 75 + duration
+    run_dmg = np.where(duration < 30, run_dmg * 0.8, run_dmg)
+    run_dmg = np.where(distance > 5.0, run_dmg * 1.1, run_dmg)
+    damage = np.select(
+        [sport == RUN, sport == CYCLE, sport == SWIM, sport == FOOTBALL],
+        [run_dmg, 30 * distance + duration, distance * 1000 / 2, calories / 2],
+        default=run_dmg,
+    )
+    new_break = ((sport == SWIM) | (sport == FOOTBALL)) & (rolls.armor <= ARMOR_BREAK_CHANCE)
+
+    # 2. Уровень героя
+    damage = damage * (1 + batch.level * 0.01)
+
+    # 3. Апгрейды на урон (супер-апгрейд — только своего вида спорта)
+    for key, levels in batch.upgrades.items():
+        item = SHOP_REGISTRY[key]
+        if isinstance(item, SuperUpgrade):
+            mask = (levels > 0) & (sport == SPORT_CODES[item.sport_type])
+            damage = np.where(mask, damage * 2.0, damage)
+
+    # 4-5. Броня и её пробитие
+    is_broken = batch.armor_broken | new_break
+    damage = np.where((batch.armor_reduction > 0) & ~is_broken, damage * (1.0 - batch.armor_reduction), damage)
+    damage = np.where(is_broken, damage * 1.15, damage)
+
+    damage = np.where(is_miss, 0, np.trunc(damage)).astype(np.int64)
+    return damage, is_miss, new_break & ~is_miss
+
+
+class _ReplayRandom:
+    """Подменяет модуль random в стратегиях: отдаёт заранее заданные броски."""
+
+    def __init__(self, values: List[int]):
+        self._values = iter(values)
+
+    def randint(self, a: int, b: int) -> int:
+        return next(self._values)
+
+
+def scalar_damage(batch: WorkoutBatch, rolls: Rolls, i: int):
+    """Урон i-й атаки через настоящую стратегию из mechanics.py."""
+    sport = SPORTS[batch.sport[i]]
+    data = WorkoutData(
+        sport_type=sport,
+        distance_km=float(batch.distance_km[i]),
+        duration_minutes=int(batch.duration_minutes[i]),
+        calories=int(batch.calories[i]),
+    )
+    traits = {}
+    if batch.evasion_chance[i] > 0:
+        traits["evasion_chance"] = int(batch.evasion_chance[i])
+    if batch.armor_reduction[i] > 0:
+        traits["armor_reduction"] = float(batch.armor_reduction[i])
+    debuffs = {"armor_break": True} if batch.armor_broken[i] else {}
+
+    replay = ([int(rolls.evasion[i])] if batch.evasion_chance[i] > 0 else []) + [int(rolls.armor[i])]
+    strategy = get_strategy(sport)(
+        data=data,
+        user_level=int(batch.level[i]),
+        raid_debuffs=debuffs,
+        boss_traits=traits,
+        upgrades=compile_upgrades(
+            {key: int(levels[i]) for key, levels in batch.upgrades.items()}
+        ).for_sport(sport),
+        rng=_ReplayRandom(replay),
+    )
+    result = strategy.calculate()
+    return result.damage, result.is_miss, bool(result.applied_debuffs.get("armor_break", False))
+
+
+# --- Генерация игроков, тренировок и боссов ---
+
+@dataclass
+class Population:
+    sport: np.ndarray
+    level: np.ndarray
+    upgrades: Dict[str, np.ndarray]
+
+
+def make_population(
+    rng: np.random.Generator, n_players: int, mean_level: float, upgrade_share: float
+) -> Population:
+    """Случайные игроки: вид спорта, уровень и купленные апгрейды своего спорта."""
+    sport = rng.integers(0, len(SPORTS), size=n_players)
+    level = 1 + rng.poisson(max(mean_level - 1, 0), size=n_players)
+
+    upgrades: Dict[str, np.ndarray] = {}
+    for key, item in SHOP_REGISTRY.items():
+        if isinstance(item, SuperUpgrade):
+            continue
+        owns = (sport == SPORT_CODES[item.sport_type]) & (rng.random(n_players) < upgrade_share)
+        upgrades[key] = np.where(owns, rng.integers(1, item.max_level + 1, size=n_players), 0)
+    for key, item in SHOP_REGISTRY.items():
+        if isinstance(item, SuperUpgrade):
+            unlocked = np.ones(n_players, dtype=bool)
+            for req in item.required_keys:
+                unlocked &= upgrades[req] >= 10
+            upgrades[key] = (unlocked & (rng.random(n_players) < upgrade_share)).astype(np.int64)
+    return Population(sport=sport, level=level, upgrades=upgrades)
+
+
+def random_workouts(rng: np.random.Generator, sport: np.ndarray):
+    """Правдоподобные метрики тренировок (как после OCR: км до десятых, минуты целые)."""
+    n = len(sport)
+    run_km = np.clip(rng.normal(5, 2, n), 0.5, None)
+    cycle_km = np.clip(rng.normal(20, 8, n), 2, None)
+    swim_km = np.clip(rng.normal(1.5, 0.5, n), 0.2, None)
+
+    distance = np.select([sport == RUN, sport == CYCLE, sport == SWIM], [run_km, cycle_km, swim_km], 0.0)
+    distance = np.floor(distance * 10) / 10
+
+    pace = np.select(
+        [sport == RUN, sport == CYCLE, sport == SWIM],
+        [np.clip(rng.normal(6, 0.8, n), 3.5, None), np.clip(rng.normal(2.7, 0.5, n), 1.5, None), 30.0],
+        0.0,
+    )
+    duration = np.where(sport == FOOTBALL, np.clip(rng.normal(80, 20, n), 20, None), distance * pace)
+    calories = np.where(sport == FOOTBALL, np.clip(rng.normal(600, 200, n), 100, None), 0)
+    return distance, duration.astype(np.int64), calories.astype(np.int64)
+
+
+@dataclass
+class Bosses:
+    boss_type: List[str]
+    max_hp: np.ndarray
+    evasion_chance: np.ndarray
+    armor_reduction: np.ndarray
+    regen_daily_percent: np.ndarray
+    reward_pool: np.ndarray
+
+
+def make_bosses(rng: np.random.Generator, n_raids: int, n_players: int) -> Bosses:
+    boss_types, max_hp, evasion, armor, regen, pool = [], [], [], [], [], []
+    base_hp = BossFactory.calculate_hp(n_players)
+    for roll in rng.random(n_raids):
+        boss_type, traits, _, hp_multiplier = BossFactory.roll_boss_type(roll)
+        hp = int(base_hp * hp_multiplier)
+        boss_types.append(boss_type)
+        max_hp.append(hp)
+        evasion.append(traits.get("evasion_chance", 0))
+        armor.append(traits.get("armor_reduction", 0.0))
+        regen.append(traits.get("regen_daily_percent", 0.0))
+        pool.append(BossFactory.calculate_reward_pool(hp, traits))
+    return Bosses(
+        boss_type=boss_types,
+        max_hp=np.array(max_hp, dtype=np.int64),
+        evasion_chance=np.array(evasion, dtype=np.int64),
+        armor_reduction=np.array(armor, dtype=np.float64),
+        regen_daily_percent=np.array(regen, dtype=np.float64),
+        reward_pool=np.array(pool, dtype=np.int64),
+    )
+
+
+# --- Симуляция рейдов ---
+
+@dataclass
+class RaidSimulation:
+    bosses: Bosses
+    kill_day: np.ndarray       # День убийства (1..max_days), -1 — не убит
+    participants: np.ndarray   # Число участников рейда
+    pool_shares: np.ndarray    # Доли банка участников убитых рейдов (по урону)
+    attacks: int
+    elapsed: float
+
+
+def simulate_raids(
+    rng: np.random.Generator,
+    population: Population,
+    n_raids: int,
+    max_days: int,
+    workouts_per_week: float,
+    regen: bool = True,
+) -> RaidSimulation:
+    """
+    R независимых рейдов против одной и той же популяции из P игроков.
+    Каждый день игрок тренируется с вероятностью workouts_per_week / 7;
+    все атаки дня считаются одним векторным вызовом batch_damage.
+    """
+    started = time.perf_counter()
+    n_players = len(population.sport)
+    bosses = make_bosses(rng, n_raids, n_players)
+
+    hp = bosses.max_hp.astype(np.float64)
+    alive = np.ones(n_raids, dtype=bool)
+    kill_day = np.full(n_raids, -1, dtype=np.int64)
+    damage_by_player = np.zeros((n_raids, n_players), dtype=np.int64)
+    attacked = np.zeros((n_raids, n_players), dtype=bool)
+    attacks = 0
+
+    for day in range(1, max_days + 1):
+        active = (rng.random((n_raids, n_players)) < workouts_per_week / 7) & alive[:, None]
+        raid_idx, player_idx = np.nonzero(active)
+        if len(raid_idx):
+            sport = population.sport[player_idx]
+            distance, duration, calories = random_workouts(rng, sport)
+            batch = WorkoutBatch(
+                sport=sport,
+                distance_km=distance,
+                duration_minutes=duration,
+                calories=calories,
+                level=population.level[player_idx],
+                upgrades={key: levels[player_idx] for key, levels in population.upgrades.items()},
+                evasion_chance=bosses.evasion_chance[raid_idx],
+                armor_reduction=bosses.armor_reduction[raid_idx],
+                armor_broken=np.zeros(len(raid_idx), dtype=bool),
+            )
+            damage, _, _ = batch_damage(batch, draw_rolls(rng, len(raid_idx)))
+            np.add.at(damage_by_player, (raid_idx, player_idx), damage)
+            attacked[raid_idx, player_idx] = True
+            hp -= np.bincount(raid_idx, weights=damage, minlength=n_raids)
+            attacks += len(raid_idx)
+
+        killed_today = alive & (hp <= 0)
+        kill_day[killed_today] = day
+        alive &= ~killed_today
+        if regen:
+            hp = np.where(alive, np.minimum(hp + bosses.max_hp * bosses.regen_daily_percent, bosses.max_hp), hp)
+        if not alive.any():
+            break
+
+    killed = kill_day > 0
+    total_damage = damage_by_player.sum(axis=1, keepdims=True)
+    shares = np.floor(
+        bosses.reward_pool[:, None] * damage_by_player / np.maximum(total_damage, 1)
+    )
+    pool_shares = shares[killed[:, None] & attacked]
+
+    return RaidSimulation(
+        bosses=bosses,
+        kill_day=kill_day,
+        participants=attacked.sum(axis=1),
+        pool_shares=pool_shares,
+        attacks=attacks,
+        elapsed=time.perf_counter() - started,
+    )
+
+
+def verify_against_scalar(rng: np.random.Generator, n: int) -> int:
+    """Сравнивает batch_damage со скалярными стратегиями; возвращает число расхождений."""
+    population = make_population(rng, n, mean_level=10, upgrade_share=0.5)
+    distance, duration, calories = random_workouts(rng, population.sport)
+    bosses = make_bosses(rng, n, n_players=100)
+    batch = WorkoutBatch(
+        sport=population.sport,
+        distance_km=distance,
+        duration_minutes=duration,
+        calories=calories,
+        level=population.level,
+        upgrades=population.upgrades,
+        evasion_chance=bosses.evasion_chance,
+        armor_reduction=bosses.armor_reduction,
+        armor_broken=rng.random(n) < 0.1,
+    )
+    rolls = draw_rolls(rng, n)
+    damage, is_miss, armor_break = batch_damage(batch, rolls)
+
+    mismatches = 0
+    for i in range(n):
+        expected = scalar_damage(batch, rolls, i)
+        if expected != (int(damage[i]), bool(is_miss[i]), bool(armor_break[i])):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  #{i}: scalar={expected} batch={(damage[i], is_miss[i], armor_break[i])}")
+    return mismatches
+
+
+def _pct(values: np.ndarray, q: float) -> float:
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+
+def print_report(sim: RaidSimulation, n_players: int, max_days: int) -> None:
+    n_raids = len(sim.kill_day)
+    killed = sim.kill_day > 0
+    days = sim.kill_day[killed]
+
+    print(f"Рейдов: {n_raids}, игроков: {n_players}, HP босса (база): {BossFactory.calculate_hp(n_players)}")
+    print(f"Ударов: {sim.attacks} за {sim.elapsed:.2f} с ({sim.attacks / max(sim.elapsed, 1e-9):,.0f} ударов/с)")
+    print()
+    print("Время убийства (дни):")
+    print(f"  всего: убито {killed.mean():.1%}, не убито за {max_days} дн.: {(~killed).mean():.1%}")
+    if len(days):
+        print(f"  mean {days.mean():.1f}, p50 {_pct(days, 50):.0f}, p90 {_pct(days, 90):.0f}, max {days.max()}")
+    for boss_type in dict.fromkeys(sim.bosses.boss_type):
+        mask = np.array([t == boss_type for t in sim.bosses.boss_type])
+        type_days = sim.kill_day[mask & killed]
+        mean_days = f"{type_days.mean():.1f}" if len(type_days) else "—"
+        print(
+            f"  {boss_type:<12} {mask.mean():6.1%} рейдов, убито {killed[mask].mean():6.1%}, "
+            f"дней в среднем {mean_days}"
+        )
+    print()
+    print("Награды за убитого босса на участника:")
+    print(f"  участников на рейд: mean {sim.participants.mean():.1f}")
+    print(f"  бонус за участие: {KILL_BONUS_GOLD}")
+    shares = sim.pool_shares
+    print(
+        f"  доля банка (по урону): mean {shares.mean() if len(shares) else 0:.1f}, "
+        f"p10 {_pct(shares, 10):.0f}, p50 {_pct(shares, 50):.0f}, "
+        f"p90 {_pct(shares, 90):.0f}, max {shares.max() if len(shares) else 0:.0f}"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Монте-Карло симулятор баланса Cardio Marathon")
+    parser.add_argument("--players", type=int, default=50, help="размер популяции игроков")
+    parser.add_argument("--raids", type=int, default=1000, help="число симулируемых рейдов")
+    parser.add_argument("--days", type=int, default=30, help="максимальная длительность рейда (дни)")
+    parser.add_argument("--workouts-per-week", type=float, default=3.0)
+    parser.add_argument("--mean-level", type=float, default=5.0)
+    parser.add_argument("--upgrade-share", type=float, default=0.3,
+                        help="доля игроков, купивших каждый апгрейд своего спорта")
+    parser.add_argument("--no-regen", action="store_true", help="не применять регенерацию босса")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verify", type=int, default=0, metavar="N",
+                        help="сверить векторный расчёт со скалярным на N атаках и выйти")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+
+    if args.verify:
+        started = time.perf_counter()
+        mismatches = verify_against_scalar(rng, args.verify)
+        print(f"Сверка со скалярным кодом: {args.verify} атак, расхождений: {mismatches} "
+              f"({time.perf_counter() - started:.1f} с)")
+        raise SystemExit(1 if mismatches else 0)
+
+    population = make_population(rng, args.players, args.mean_level, args.upgrade_share)
+    sim = simulate_raids(
+        rng, population, args.raids, args.days, args.workouts_per_week, regen=not args.no_regen
+    )
+    print_report(sim, args.players, args.days)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# backend/sql_profiler.py
+"""
+Профилировщик SQL на HTTP-запрос и детектор N+1.
+
+События SQLAlchemy (`before/after_cursor_execute`) пишут в `QueryProfile`
+текущего запроса (ContextVar): число запросов, суммарное время БД и «формы»
+запросов — текст с плейсхолдерами, где списки `$1, $2, …` (IN, VALUES)
+свёрнуты в `?`, чтобы `IN` разной длины считался одной формой.
+
+`SqlProfilerMiddleware` для каждого запроса:
+  - при SQL_PROFILE_HEADER=1 добавляет в ответ `X-SQL-Profile`
+    (`queries=3; db_ms=4.20; max_repeat=1`);
+  - логирует долю SQL_PROFILE_LOG_SAMPLE_RATE запросов с самой частой формой;
+  - предупреждает о N+1, если одна форма выполнена SQL_N_PLUS_ONE_THRESHOLD раз и больше;
+  - при SQL_QUERY_BUDGETS_ENFORCE=1 (тесты) бросает `QueryBudgetExceeded`
+    после ответа, если маршрут превысил бюджет из `QUERY_BUDGETS`.
+
+В тестах бюджет можно проверить и напрямую:
+
+    with query_budget(2):
+        await client.get("/api/raid/state")
+"""
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import (
+    SQL_PROFILE_HEADER, SQL_PROFILE_LOG_SAMPLE_RATE,
+    SQL_N_PLUS_ONE_THRESHOLD, SQL_QUERY_BUDGETS_ENFORCE,
+)
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-sql-profile"
+
+# Максимум SQL-запросов на маршрут ("METHOD шаблон пути") — для тестового режима.
+# Считается при холодных кэшах процесса (профиль и апгрейды игрока, снимок рейда,
+# рейтинг участников); лента рейда прогревается при старте (warm_raid_feed).
+# Снимок рейда: активный рейд + превью участников + загрузка рейтинга для счётчика.
+QUERY_BUDGETS: Dict[str, int] = {
+    "GET /api/raid/state": 3,
+    "GET /api/raid/current": 3,
+    "GET /api/raid/feed": 1,
+    "GET /api/user/me": 1,
+    "GET /api/shop": 2,
+}
+
+_PLACEHOLDER_LIST = re.compile(r"\$\d+(?:\s*,\s*\$\d+)*")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def statement_shape(statement: str) -> str:
+    """Нормализованный текст запроса: списки плейсхолдеров → `?`, пробелы схлопнуты."""
+    return _SPACES.sub(" ", _PLACEHOLDER_LIST.sub("?", statement)).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass
+class QueryProfile:
+    queries: int = 0
+    seconds: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    def most_repeated(self) -> Optional[Tuple[str, int]]:
+        top = self.shapes.most_common(1)
+        return top[0] if top else None
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def header_value(self) -> str:
+        top = self.most_repeated()
+        return f"queries={self.queries}; db_ms={self.seconds * 1000:.2f}; max_repeat={top[1] if top else 0}"
+
+
+# Профиль текущего запроса (None — вне запроса: фоновые задачи, старт)
+_profile: ContextVar[Optional[QueryProfile]] = ContextVar("sql_profile", default=None)
+
+
+def current_profile() -> Optional[QueryProfile]:
+    return _profile.get()
+
+
+@contextmanager
+def profile_queries() -> Iterator[QueryProfile]:
+    """Собирает SQL, выполненный внутри блока (вложенный блок пишет в тот же профиль)."""
+    profile = _profile.get()
+    if profile is not None:
+        yield profile
+        return
+    profile = QueryProfile()
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries: int) -> Iterator[QueryProfile]:
+    """Для тестов: QueryBudgetExceeded, если внутри блока выполнено больше max_queries запросов."""
+    with profile_queries() as profile:
+        yield profile
+    if profile.queries > max_queries:
+        raise QueryBudgetExceeded(
+            f"{profile.queries} SQL queries > budget {max_queries}: {dict(profile.shapes)}"
+        )
+
+
+def install_sql_profiler(engine: AsyncEngine, on_query: Optional[Callable[[float], None]] = None) -> None:
+    """Подписывается на события движка; on_query(секунды) вызывается для каждого запроса."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        if on_query is not None:
+            on_query(elapsed)
+        profile = _profile.get()
+        if profile is not None:
+            profile.queries += 1
+            profile.seconds += elapsed
+            profile.shapes[statement_shape(statement)] += 1
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        conn = context.connection
+        started = conn.info.get("query_started") if conn is not None else None
+        if started:
+            started.pop()
+
+
+def route_key(scope) -> str:
+    """Ключ `METHOD шаблон пути`; FastAPI кладёт найденный маршрут в scope при роутинге."""
+    route = getattr(scope.get("route"), "path", None) or "unmatched"
+    return f"{scope['method']} {route}"
+
+
+class SqlProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile_queries() as profile:
+            # Внешние middleware (метрики) читают профиль из scope после ответа
+            scope["sql_profile"] = profile
+
+            async def send_wrapper(message):
+                if SQL_PROFILE_HEADER and message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (PROFILE_HEADER, profile.header_value().encode("latin-1"))
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        self._report(scope, profile)
+
+    @staticmethod
+    def _report(scope, profile: QueryProfile) -> None:
+        if not profile.queries:
+            return
+        key = route_key(scope)
+
+        for shape, count in profile.repeated(SQL_N_PLUS_ONE_THRESHOLD):
+            logger.warning(f"⚠️ Possible N+1 in {key}: {count}× {shape[:200]}")
+
+        if SQL_PROFILE_LOG_SAMPLE_RATE > 0 and random.random() < SQL_PROFILE_LOG_SAMPLE_RATE:
+            shape, count = profile.most_repeated()
+            logger.info(
+                f"🧮 SQL {key}: {profile.queries} queries, {profile.seconds * 1000:.1f} ms; "
+                f"top {count}× {shape[:120]}"
+            )
+
+        if SQL_QUERY_BUDGETS_ENFORCE:
+            budget = QUERY_BUDGETS.get(key)
+            if budget is not None and profile.queries > budget:
+                raise QueryBudgetExceeded(
+                    f"{key}: {profile.queries} SQL queries > budget {budget}: {dict(profile.shapes)}"
+                )
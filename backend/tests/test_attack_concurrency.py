@@ -0,0 +1,104 @@
+# backend/tests/test_attack_concurrency.py
+"""
+Сотни одновременных атак по одному боссу: снятое HP должно точно совпасть
+с суммой урона в raid_logs (ни одной потерянной или задвоенной атаки).
+Проверяются оба пути записи — по атаке на запрос и групповой конвейер.
+"""
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import event, func, select
+
+import main
+from attack_pipeline import AttackPipeline
+from database import AsyncSessionLocal
+from leaderboard import raid_board
+from models import LeaderboardTotal, Raid, RaidLog
+
+PLAYERS = 50
+ATTACKS = 400
+WORKOUT = {"sport_type": "run", "distance_km": 5.0, "duration_minutes": 30, "calories": 300}
+
+
+@pytest.fixture(params=["direct", "pipeline"])
+async def attack_mode(request, monkeypatch):
+    if request.param == "direct":
+        yield request.param
+        return
+    pipeline = AttackPipeline(AsyncSessionLocal, on_commit=main._after_attack_batch)
+    monkeypatch.setattr(main, "attack_pipeline", pipeline)
+    await pipeline.start()
+    yield request.param
+    await pipeline.stop()
+
+
+async def test_concurrent_attacks_match_raid_logs(client, make_raid, make_user, attack_mode):
+    # HP с запасом: босс не должен умереть посреди теста
+    raid_id = await make_raid(max_hp=2_000_000_000)
+    players = [await make_user() for _ in range(PLAYERS)]
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(
+        client.post("/api/attack", json=WORKOUT, headers=players[i % PLAYERS][1])
+        for i in range(ATTACKS)
+    ))
+    elapsed = time.perf_counter() - started
+
+    assert [r.status_code for r in responses] == [200] * ATTACKS
+    dealt = sum(r.json()["damage_dealt"] for r in responses)
+
+    async with AsyncSessionLocal() as db:
+        raid = await db.get(Raid, raid_id)
+        logged, count = (await db.execute(
+            select(func.coalesce(func.sum(RaidLog.damage), 0), func.count())
+            .where(RaidLog.raid_id == raid_id)
+        )).one()
+
+    assert count == ATTACKS
+    assert raid.max_hp - raid.current_hp == logged == dealt
+    print(f"\n{attack_mode}: {ATTACKS} attacks in {elapsed:.2f}s — {ATTACKS / elapsed:.0f} attacks/sec")
+
+
+async def test_killing_blow_counts_only_remaining_hp(client, make_raid, make_user):
+    """Одновременные атаки по боссу с малым HP: один добивающий удар, урон в логах = max_hp."""
+    raid_id = await make_raid(max_hp=1_000)
+    players = [await make_user() for _ in range(PLAYERS)]
+
+    responses = await asyncio.gather(*(
+        client.post("/api/attack", json=WORKOUT, headers=headers) for _, headers in players
+    ))
+    assert {r.status_code for r in responses} <= {200, 409}
+    kills = [r.json() for r in responses if r.status_code == 200 and "ПОВЕРЖЕН" in r.json()["message"]]
+    assert len(kills) == 1
+
+    async with AsyncSessionLocal() as db:
+        raid = await db.get(Raid, raid_id)
+        logged = (await db.execute(
+            select(func.sum(RaidLog.damage)).where(RaidLog.raid_id == raid_id)
+        )).scalar()
+        board = (await db.execute(
+            select(func.sum(LeaderboardTotal.damage)).where(LeaderboardTotal.board == raid_board(raid_id))
+        )).scalar()
+    assert not raid.is_active and raid.current_hp == 0
+    assert logged == board == raid.max_hp
+
+
+async def test_boss_row_is_updated_last(client, make_raid, make_user, database):
+    """Строку босса (горячую блокировку) атака берёт последним запросом перед обновлением игрока."""
+    await make_raid(max_hp=2_000_000_000)
+    _, headers = await make_user()
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0:3])
+
+    event.listen(database.sync_engine, "before_cursor_execute", record)
+    try:
+        assert (await client.post("/api/attack", json=WORKOUT, headers=headers)).status_code == 200
+    finally:
+        event.remove(database.sync_engine, "before_cursor_execute", record)
+
+    writes = [words for words in statements if words[0] in ("INSERT", "UPDATE")]
+    assert writes[-2][:2] == ["UPDATE", "raids"]
+    assert writes[-1][:2] == ["UPDATE", "users"]
@@ -0,0 +1,61 @@
+# backend/tests/test_attack_pipeline.py
+"""AttackPipeline: сбой пачки не оставляет вызывающих ждать вечно, а конвейер живёт дальше."""
+import asyncio
+
+import pytest
+
+import attack_pipeline
+from attack_pipeline import AttackPipeline
+from database import AsyncSessionLocal
+from schemas import WorkoutData
+from upgrade_effects import compile_upgrades
+
+WORKOUT = WorkoutData(sport_type="run", distance_km=3.0, duration_minutes=20)
+UPGRADES = compile_upgrades({}).for_sport("run")
+
+
+@pytest.fixture
+async def pipeline():
+    pipeline = AttackPipeline(AsyncSessionLocal, submit_timeout=10)
+    await pipeline.start()
+    yield pipeline
+    await pipeline.stop()
+
+
+async def test_post_commit_error_still_returns_result(pipeline, make_raid, make_user, monkeypatch):
+    await make_raid()
+    user_id, _ = await make_user()
+
+    def broken_apply(totals):
+        raise RuntimeError("leaderboard is broken")
+
+    monkeypatch.setattr(attack_pipeline.leaderboards, "apply", broken_apply)
+    result = await pipeline.submit(user_id, "hero", 1, WORKOUT, UPGRADES)
+    assert result.new_boss_hp > 0
+
+
+async def test_failed_batch_raises_and_pipeline_survives(pipeline, make_raid, make_user, monkeypatch):
+    await make_raid()
+    user_id, _ = await make_user()
+
+    async def broken_write(db, batch):
+        raise RuntimeError("write failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(pipeline, "_apply", broken_write)
+        with pytest.raises(RuntimeError, match="write failed"):
+            await pipeline.submit(user_id, "hero", 1, WORKOUT, UPGRADES)
+
+    result = await pipeline.submit(user_id, "hero", 1, WORKOUT, UPGRADES)
+    assert result.new_boss_hp > 0
+
+
+async def test_dead_writer_task_is_restarted(pipeline, make_raid, make_user):
+    await make_raid()
+    user_id, _ = await make_user()
+
+    pipeline._task.cancel()
+    await asyncio.sleep(0)
+
+    result = await pipeline.submit(user_id, "hero", 1, WORKOUT, UPGRADES)
+    assert result.new_boss_hp > 0
@@ -0,0 +1,129 @@
+# backend/tests/test_explain_indexes.py
+"""
+Регрессия планов горячих запросов: на заполненной БД каждый из них должен
+идти по своему индексу (migrations.py), а не последовательным сканированием.
+Запросы повторяют те, что выполняет приложение; значения подставлены литералами,
+чтобы план строился так же, как для конкретного рейда/игрока.
+"""
+import json
+import re
+
+import pytest
+from sqlalchemy import text
+
+from database import AsyncSessionLocal
+
+USERS = 5_000
+OLD_RAIDS = 3_000
+RAID_LOGS = 30_000
+BOARD_RAIDS = 200
+
+SEED = [
+    "INSERT INTO users (username, password_hash, level, xp, gold)"
+    f" SELECT 'explain_' || g, 'x', 1, 0, 0 FROM generate_series(1, {USERS}) AS g",
+    "INSERT INTO raids (boss_name, boss_type, max_hp, current_hp, is_active, active_debuffs, traits)"
+    f" SELECT 'Old Boss', 'normal', 1000, 0, false, '{{}}', '{{}}' FROM generate_series(1, {OLD_RAIDS})",
+    "INSERT INTO user_upgrades (user_id, upgrade_key, level)"
+    " SELECT u.id, k.key, 1 FROM users AS u"
+    " CROSS JOIN (VALUES ('run_watch'), ('run_roulette'), ('cycle_watch')) AS k (key)"
+    " WHERE u.username LIKE 'explain\\_%'",
+    "INSERT INTO leaderboard_totals (board, user_id, damage, last_attack_at)"
+    " SELECT 'raid:' || (r.id % :board_raids), u.id, (random() * 10000)::int,"
+    "        now() - make_interval(secs => (random() * 86400)::int)"
+    " FROM (SELECT id FROM users WHERE username LIKE 'explain\\_%' ORDER BY id LIMIT 100) AS u"
+    " CROSS JOIN (SELECT generate_series(1, :board_raids) AS id) AS r"
+    " ON CONFLICT (board, user_id) DO NOTHING",
+    "INSERT INTO leaderboard_totals (board, user_id, damage)"
+    " SELECT 'all', id, (random() * 100000)::int FROM users WHERE username LIKE 'explain\\_%'"
+    " ON CONFLICT (board, user_id) DO NOTHING",
+]
+
+SEED_RAID_LOGS = (
+    "INSERT INTO raid_logs (raid_id, user_id, sport_type, damage, gold_earned, xp_earned,"
+    "                       is_critical, is_miss, created_at)"
+    " SELECT :raid_id, u.ids[1 + g % array_length(u.ids, 1)], 'run', 100, 1, 1, false, false,"
+    "        now() - make_interval(secs => :rows - g)"
+    " FROM (SELECT array_agg(id) AS ids FROM users WHERE username LIKE 'explain\\_%') AS u,"
+    "      generate_series(1, :rows) AS g"
+)
+
+
+@pytest.fixture(scope="module")
+async def seeded(database):
+    """Заполненная БД: старые рейды, активный рейд с логами, рейтинги, апгрейды."""
+    async with AsyncSessionLocal() as db:
+        for statement in SEED:
+            await db.execute(text(statement), {"board_raids": BOARD_RAIDS})
+        await db.commit()
+    return None
+
+
+@pytest.fixture(scope="module")
+async def hot_ids(seeded, make_raid):
+    raid_id = await make_raid()
+    async with AsyncSessionLocal() as db:
+        await db.execute(text(SEED_RAID_LOGS), {"raid_id": raid_id, "rows": RAID_LOGS})
+        user_id = (await db.execute(
+            text("SELECT id FROM users WHERE username LIKE 'explain\\_%' ORDER BY id LIMIT 1")
+        )).scalar()
+        await db.commit()
+        for table in ("users", "raids", "raid_logs", "user_upgrades", "leaderboard_totals"):
+            await db.execute(text(f"ANALYZE {table}"))
+        await db.commit()
+    return {"raid_id": raid_id, "user_id": user_id}
+
+
+# (запрос, шаблон имени индекса, который должен использоваться)
+HOT_QUERIES = {
+    "active_raid": (
+        "SELECT * FROM raids WHERE is_active = true",
+        r"^ix_raids_active$",
+    ),
+    "raid_feed": (
+        "SELECT raid_logs.*, users.username FROM raid_logs JOIN users ON raid_logs.user_id = users.id"
+        " WHERE raid_logs.raid_id = {raid_id} ORDER BY raid_logs.created_at DESC LIMIT 50",
+        r"^raid_logs_r{raid_id}_raid_id_created_at_idx$",
+    ),
+    "user_upgrades": (
+        "SELECT upgrade_key, level FROM user_upgrades WHERE user_id = {user_id}",
+        r"^_user_upgrade_uc$",
+    ),
+    "leaderboard_load": (
+        "SELECT user_id, damage FROM leaderboard_totals WHERE board = 'raid:{raid_id}'",
+        r"^(leaderboard_totals_pkey|ix_leaderboard_board_\w+)$",
+    ),
+    "raid_participants_recent": (
+        "SELECT user_id, damage, last_attack_at FROM leaderboard_totals WHERE board = 'raid:1'"
+        " ORDER BY last_attack_at DESC, user_id DESC LIMIT 12",
+        r"^ix_leaderboard_board_recent$",
+    ),
+    "raid_participants_damage": (
+        "SELECT user_id, damage, last_attack_at FROM leaderboard_totals WHERE board = 'raid:1'"
+        " ORDER BY damage DESC, user_id DESC LIMIT 12",
+        r"^ix_leaderboard_board_damage$",
+    ),
+}
+
+
+def _plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+async def test_hot_query_uses_index(hot_ids, name):
+    sql, index_pattern = HOT_QUERIES[name]
+    sql, index_pattern = sql.format(**hot_ids), index_pattern.format(**hot_ids)
+
+    async with AsyncSessionLocal() as db:
+        raw = (await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar()
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    nodes = list(_plan_nodes(plan))
+
+    seq_scans = [n["Relation Name"] for n in nodes if n["Node Type"] == "Seq Scan"]
+    assert not seq_scans, f"{name}: Seq Scan on {seq_scans}\n{json.dumps(plan, indent=1)}"
+    indexes = [n["Index Name"] for n in nodes if "Index Name" in n]
+    assert any(re.match(index_pattern, index) for index in indexes), (
+        f"{name}: expected index {index_pattern}, plan uses {indexes}\n{json.dumps(plan, indent=1)}"
+    )
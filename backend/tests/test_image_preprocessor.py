@@ -0,0 +1,74 @@
+# backend/tests/test_image_preprocessor.py
+"""
+ImagePreprocessor: большой скриншот уменьшается в JPEG, уже сжатый маленький
+уходит в OCR как есть (со своим MIME-типом), исходы и байты попадают в метрики.
+Пул процессов стартует через forkserver/spawn. БД не нужна.
+"""
+import io
+import os
+
+import pytest
+from PIL import Image
+from prometheus_client import REGISTRY
+
+from image_preprocessor import RESULT_FAILED, RESULT_ORIGINAL, RESULT_RESIZED, ImagePreprocessor
+
+
+def encode(size: tuple, fmt: str, noise: bool = False) -> bytes:
+    if noise:
+        img = Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+    else:
+        img = Image.new("RGB", size, "white")
+    out = io.BytesIO()
+    img.save(out, format=fmt)
+    return out.getvalue()
+
+
+def sample(name: str, labels: dict = None) -> float:
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+@pytest.fixture
+async def preprocessor():
+    preprocessor = ImagePreprocessor(max_side=400, jpeg_quality=80, workers=1)
+    yield preprocessor
+    preprocessor.shutdown()
+
+
+async def test_large_screenshot_is_downscaled(preprocessor):
+    original = encode((1200, 900), "PNG", noise=True)
+    resized_before = sample("ocr_image_preprocess_total", {"result": RESULT_RESIZED})
+    bytes_in_before = sample("ocr_image_preprocess_bytes_in_total")
+    bytes_out_before = sample("ocr_image_preprocess_bytes_out_total")
+
+    image = await preprocessor.process(original)
+
+    assert image.result == RESULT_RESIZED
+    assert image.mime_type == "image/jpeg"
+    assert image.processed_bytes < image.original_bytes
+    with Image.open(io.BytesIO(image.data)) as img:
+        assert max(img.size) == 400
+
+    assert sample("ocr_image_preprocess_total", {"result": RESULT_RESIZED}) == resized_before + 1
+    assert sample("ocr_image_preprocess_bytes_in_total") == bytes_in_before + len(original)
+    assert sample("ocr_image_preprocess_bytes_out_total") == bytes_out_before + len(image.data)
+
+
+async def test_original_sent_when_jpeg_not_smaller(preprocessor):
+    original = encode((64, 64), "PNG")  # Однотонный PNG меньше любого JPEG
+    image = await preprocessor.process(original)
+
+    assert image.result == RESULT_ORIGINAL
+    assert image.data == original
+    assert image.mime_type == "image/png"
+
+
+async def test_undecodable_bytes_sent_as_is(preprocessor):
+    image = await preprocessor.process(b"not an image")
+    assert image.result == RESULT_FAILED
+    assert image.data == b"not an image"
+
+
+async def test_pool_does_not_fork(preprocessor):
+    await preprocessor.process(encode((8, 8), "PNG"))
+    assert preprocessor._get_executor()._mp_context.get_start_method() in ("forkserver", "spawn")
@@ -0,0 +1,45 @@
+# backend/tests/test_leaderboard.py
+"""
+LeaderboardIndex: одновременные запросы к холодному рейтингу читают его из БД
+один раз; суммы, применённые не в порядке коммитов, не откатывают рейтинг назад.
+"""
+import asyncio
+
+from database import AsyncSessionLocal
+from leaderboard import LeaderboardIndex, RankIndex, raid_board
+from sql_profiler import profile_queries
+
+WORKOUT = {"sport_type": "swim", "distance_km": 1.0, "duration_minutes": 30}
+READERS = 20
+
+
+async def test_cold_board_loaded_once(client, make_raid, make_user):
+    raid_id = await make_raid()
+    for _ in range(3):
+        _, headers = await make_user()
+        assert (await client.post("/api/attack", json=WORKOUT, headers=headers)).status_code == 200
+
+    index = LeaderboardIndex()
+
+    async def read_size() -> int:
+        async with AsyncSessionLocal() as db:
+            return await index.size(db, raid_board(raid_id))
+
+    with profile_queries() as profile:
+        sizes = await asyncio.gather(*(read_size() for _ in range(READERS)))
+
+    assert sizes == [3] * READERS
+    assert profile.queries == 1
+
+
+def test_out_of_order_totals_keep_latest():
+    """Коммиты двух атак применяются в обратном порядке: меньшая (старая) сумма не затирает новую."""
+    index = LeaderboardIndex()
+    index._boards["all"] = RankIndex([(1, 100), (2, 150)])
+
+    index.apply([("all", 1, 300)])
+    index.apply([("all", 1, 200)])  # Опоздавший результат более ранней транзакции
+
+    rank = index._boards["all"].rank(1)
+    assert rank == (1, 300)
+    assert index._boards["all"].page(None, 10) == [(1, 1, 300), (2, 2, 150)]
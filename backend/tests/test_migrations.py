@@ -0,0 +1,45 @@
+# backend/tests/test_migrations.py
+"""
+Схема, собранная миграциями с нуля, совпадает с models.py: каждая таблица
+и колонка моделей создана явной миграцией, с тем же типом и NOT NULL.
+"""
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from database import engine
+from models import Base
+
+# Имена типов в information_schema для типов SQLAlchemy
+PG_TYPES = {
+    "INTEGER": "integer",
+    "BIGINT": "bigint",
+    "VARCHAR": "character varying",
+    "BOOLEAN": "boolean",
+    "JSON": "json",
+    "DATE": "date",
+    "TIMESTAMP WITH TIME ZONE": "timestamp with time zone",
+}
+
+
+def model_columns(table) -> dict:
+    dialect = postgresql.dialect()
+    return {
+        column.name: (PG_TYPES[column.type.compile(dialect=dialect).split("(")[0]], column.nullable)
+        for column in table.columns
+    }
+
+
+async def test_migrated_schema_matches_models(database):
+    async with engine.connect() as conn:
+        rows = (await conn.execute(text(
+            "SELECT table_name, column_name, data_type, is_nullable = 'YES'"
+            " FROM information_schema.columns WHERE table_schema = 'public'"
+        ))).all()
+
+    db_tables: dict = {}
+    for table_name, column_name, data_type, nullable in rows:
+        db_tables.setdefault(table_name, {})[column_name] = (data_type, nullable)
+
+    for table in Base.metadata.sorted_tables:
+        assert table.name in db_tables, f"нет миграции для таблицы {table.name}"
+        assert db_tables[table.name] == model_columns(table), table.name
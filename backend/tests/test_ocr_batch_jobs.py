@@ -0,0 +1,91 @@
+# backend/tests/test_ocr_batch_jobs.py
+"""
+Пакетный скан не ждёт LLM: запрос сразу возвращает id задач очереди OCR,
+результаты забираются long-poll'ом. LLM заменена заглушкой: один вид спорта
+«падает», не-изображение отклоняется ещё до очереди — остальные распознаются.
+"""
+import io
+
+import pytest
+from PIL import Image
+
+import main
+from ocr_jobs import OcrJobQueue
+from schemas import WorkoutData
+
+
+class StubParser:
+    """Заглушка UniversalParser: плавание «не распознаётся»."""
+
+    def __init__(self, user_id: int, sport_type: str):
+        self.user_id = user_id
+        self.sport_type = sport_type
+
+    async def parse_image(self, image_bytes: bytes, mime_type: str = "image/jpeg") -> WorkoutData:
+        if self.sport_type == "swim":
+            raise RuntimeError("LLM timeout")
+        return WorkoutData(user_id=self.user_id, sport_type=self.sport_type, distance_km=5.0)
+
+
+def png(color: str) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (32, 32), color).save(out, format="PNG")
+    return out.getvalue()
+
+
+@pytest.fixture
+async def ocr_queue(monkeypatch):
+    queue = OcrJobQueue(
+        main.scan_image, workers=2, max_queue=20, max_queued_bytes=1 << 20, per_user_limit=2, result_ttl_seconds=60
+    )
+    monkeypatch.setattr(main, "ocr_jobs", queue)
+    monkeypatch.setattr(main, "UniversalParser", StubParser)
+    await queue.start()
+    yield queue
+    await queue.stop()
+
+
+async def test_batch_returns_job_ids_with_partial_failures(client, make_user, ocr_queue):
+    _, headers = await make_user()
+    files = [
+        ("files", ("run.png", png("red"), "image/png")),
+        ("files", ("notes.txt", b"not an image", "text/plain")),
+        ("files", ("swim.png", png("blue"), "image/png")),
+    ]
+    response = await client.post(
+        "/api/scan-workout/batch",
+        files=files,
+        data={"sport_types": ["run", "cycle", "swim"]},
+        headers=headers,
+    )
+    assert response.status_code == 202
+    run, notes, swim = response.json()
+
+    assert notes["job_id"] is None and notes["error"]
+    assert run["job_id"] and swim["job_id"]
+
+    done = await client.get(f"/api/scan-workout/jobs/{run['job_id']}?wait=10", headers=headers)
+    assert done.json()["status"] == "done"
+    assert done.json()["result"]["distance_km"] == 5.0
+
+    failed = await client.get(f"/api/scan-workout/jobs/{swim['job_id']}?wait=10", headers=headers)
+    assert failed.json()["status"] == "failed"
+    assert "LLM timeout" in failed.json()["error"]
+
+    assert ocr_queue.stats()["completed"] == 1
+    assert ocr_queue.stats()["failed"] == 1
+
+
+async def test_batch_rejected_while_previous_jobs_pending(client, make_user, ocr_queue):
+    user_id, headers = await make_user()
+    await ocr_queue.stop()  # Воркеры не разбирают очередь — задачи остаются незавершёнными
+    ocr_queue.submit_many(user_id, [("run", b"a"), ("run", b"b")])
+
+    response = await client.post(
+        "/api/scan-workout/batch",
+        files=[("files", ("run.png", png("red"), "image/png"))],
+        data={"sport_types": ["run"]},
+        headers=headers,
+    )
+    assert response.status_code == 429
+    assert response.headers["Retry-After"]
@@ -0,0 +1,101 @@
+# backend/tests/test_ocr_client_reuse.py
+"""
+Общий HTTP-клиент OCR (ocr_service.get_http_client): все сканы идут через
+один httpx.AsyncClient и его пул keep-alive соединений, а не через новый
+клиент и новое TCP/TLS-соединение на каждый скан. БД не нужна.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import ocr_service
+from ocr_service import UniversalParser, close_http_client, get_http_client
+
+SCANS = 10
+OCR_ANSWER = {"choices": [{"message": {"content": "Дистанция 5.2 км\nВремя 31 мин\nКаллории 300"}}]}
+
+
+@pytest.fixture
+async def fresh_client(monkeypatch):
+    """Пустой глобальный клиент до и после теста."""
+    monkeypatch.setattr(ocr_service, "OPENROUTER_API_KEY", "test-key")
+    await close_http_client()
+    yield
+    await close_http_client()
+
+
+async def _scan_many(concurrent: bool) -> list:
+    scans = [UniversalParser(user_id=1, sport_type="run").parse_image(b"png") for _ in range(SCANS)]
+    if concurrent:
+        return await asyncio.gather(*scans)
+    return [await scan for scan in scans]
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+async def test_scans_share_one_client(fresh_client, monkeypatch, concurrent):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=OCR_ANSWER)
+
+    created = []
+    real_client = httpx.AsyncClient
+
+    def client_factory(*args, **kwargs):
+        client = real_client(*args, transport=httpx.MockTransport(handler), **kwargs)
+        created.append(client)
+        return client
+
+    monkeypatch.setattr(httpx, "AsyncClient", client_factory)
+
+    results = await _scan_many(concurrent)
+
+    assert [r.distance_km for r in results] == [5.2] * SCANS
+    assert len(requests) == SCANS
+    assert {str(r.url) for r in requests} == {f"{ocr_service.OPENROUTER_BASE_URL}/chat/completions"}
+    # Один клиент на все сканы, и он по-прежнему открыт для следующих
+    assert len(created) == 1
+    assert get_http_client() is created[0]
+    assert not created[0].is_closed
+
+
+async def test_sequential_scans_reuse_tcp_connection(fresh_client, monkeypatch):
+    """Настоящий сокет: локальный HTTP/1.1-сервер считает принятые соединения."""
+    connections = 0
+
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        nonlocal connections
+        connections += 1
+        body = json.dumps(OCR_ANSWER).encode("utf-8")
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.decode("latin-1").split("\r\n"):
+                    name, _, value = line.partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(ocr_service, "OPENROUTER_BASE_URL", f"http://127.0.0.1:{port}")
+    try:
+        results = await _scan_many(concurrent=False)
+    finally:
+        server.close()
+
+    assert [r.calories for r in results] == [300] * SCANS
+    assert connections == 1
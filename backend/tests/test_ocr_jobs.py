@@ -0,0 +1,154 @@
+# backend/tests/test_ocr_jobs.py
+"""
+Очередь OCR через HTTP: постановка → long-poll → результат, 429 при лимите
+задач пользователя, 503 при заполненной очереди (по числу задач и по байтам),
+метрики глубины очереди. LLM заменена обработчиком, которого тест отпускает сам.
+"""
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+import main
+from metrics import instrument_ocr_queue
+from ocr_jobs import OcrJobQueue
+from schemas import WorkoutData
+
+IMAGE = b"\x89PNG" + b"\0" * 1020  # 1 КБ «скриншота»
+
+
+class StandInLlm:
+    """Обработчик задач: распознаёт, только когда тест откроет `release`."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.calls = 0
+
+    async def __call__(self, user_id: int, sport_type: str, image_bytes: bytes) -> WorkoutData:
+        self.calls += 1
+        await self.release.wait()
+        return WorkoutData(user_id=user_id, sport_type=sport_type, distance_km=len(image_bytes) / 1024)
+
+
+@pytest.fixture
+def llm():
+    return StandInLlm()
+
+
+@pytest.fixture
+async def make_queue(monkeypatch, llm):
+    queues = []
+
+    async def make(workers=1, max_queue=10, max_queued_bytes=1 << 20, per_user_limit=2, start=True):
+        queue = OcrJobQueue(
+            llm, workers=workers, max_queue=max_queue, max_queued_bytes=max_queued_bytes,
+            per_user_limit=per_user_limit, result_ttl_seconds=60,
+        )
+        monkeypatch.setattr(main, "ocr_jobs", queue)
+        if start:
+            await queue.start()
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        await queue.stop()
+
+
+async def submit(client, headers, sport_type="run", image=IMAGE):
+    return await client.post(
+        "/api/scan-workout/jobs",
+        data={"sport_type": sport_type},
+        files={"file": ("scan.png", image, "image/png")},
+        headers=headers,
+    )
+
+
+async def test_submit_long_poll_result(client, make_user, make_queue, llm):
+    await make_queue()
+    _, headers = await make_user()
+
+    submitted = await submit(client, headers)
+    assert submitted.status_code == 202
+    job_id = submitted.json()["job_id"]
+    assert submitted.json()["status"] in ("queued", "running")
+
+    # Пока LLM не ответила, long-poll возвращается по таймауту с незавершённой задачей
+    pending = await client.get(f"/api/scan-workout/jobs/{job_id}?wait=0.1", headers=headers)
+    assert pending.json()["status"] == "running"
+
+    poll = asyncio.create_task(client.get(f"/api/scan-workout/jobs/{job_id}?wait=10", headers=headers))
+    await asyncio.sleep(0.05)
+    assert not poll.done()  # Ждёт результата, а не отвечает сразу
+    llm.release.set()
+    done = (await poll).json()
+    assert done["status"] == "done"
+    assert done["result"]["distance_km"] == 1.0
+    assert llm.calls == 1
+
+    # Чужая задача не видна
+    _, other = await make_user()
+    assert (await client.get(f"/api/scan-workout/jobs/{job_id}", headers=other)).status_code == 404
+
+
+async def test_per_user_limit_returns_429(client, make_user, make_queue):
+    await make_queue(workers=2, per_user_limit=1)
+    _, headers = await make_user()
+
+    assert (await submit(client, headers)).status_code == 202
+    limited = await submit(client, headers)
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"]
+
+    # Лимит на пользователя, а не на всю очередь
+    _, other = await make_user()
+    assert (await submit(client, other)).status_code == 202
+
+
+async def test_full_queue_returns_503(client, make_user, make_queue):
+    queue = await make_queue(max_queue=2, start=False)  # Воркеров нет — очередь не разбирается
+    _, first = await make_user()
+    _, second = await make_user()
+
+    assert (await submit(client, first)).status_code == 202
+    assert (await submit(client, first)).status_code == 202
+    full = await submit(client, second)
+    assert full.status_code == 503
+    assert full.headers["Retry-After"]
+    assert queue.stats()["rejected"] == 1
+
+
+async def test_queued_bytes_bound_returns_503(client, make_user, make_queue, llm):
+    queue = await make_queue(max_queued_bytes=3 * len(IMAGE), start=False)
+    _, first = await make_user()
+    _, second = await make_user()
+
+    assert (await submit(client, first)).status_code == 202
+    assert (await submit(client, first)).status_code == 202
+    # По глубине место есть, по объёму — нет
+    assert (await submit(client, second, image=IMAGE * 2)).status_code == 503
+    assert (await submit(client, second)).status_code == 202
+    assert queue.stats()["queued_bytes"] == 3 * len(IMAGE)
+
+    # Распознанные задачи освобождают объём
+    llm.release.set()
+    await queue.start()
+    await asyncio.wait_for(queue._queue.join(), timeout=10)
+    assert queue.stats()["queued_bytes"] == 0
+
+
+async def test_queue_gauges(make_queue, llm):
+    app_queue = main.ocr_jobs
+    queue = await make_queue(workers=1)
+    instrument_ocr_queue(queue)
+    try:
+        queue.submit(1, "run", IMAGE)
+        queue.submit(2, "run", IMAGE)
+        await asyncio.sleep(0.05)  # Первая задача взята воркером
+
+        assert REGISTRY.get_sample_value("ocr_queue_depth") == 1
+        assert REGISTRY.get_sample_value("ocr_jobs_running") == 1
+        assert REGISTRY.get_sample_value("ocr_queue_bytes") == 2 * len(IMAGE)
+    finally:
+        llm.release.set()
+        instrument_ocr_queue(app_queue)
@@ -0,0 +1,50 @@
+# backend/tests/test_query_budgets.py
+"""
+Бюджеты SQL-запросов (sql_profiler.QUERY_BUDGETS) на собственном трафике
+приложения: каждый маршрут вызывается при холодных кэшах процесса и затем
+повторно — из кэша. Для GET /api/raid/feed бюджет считается при прогретой
+ленте, как после старта (warm_raid_feed).
+"""
+import pytest
+
+from auth import invalidate_user
+from database import AsyncSessionLocal
+from raid_feed import raid_feed
+from raid_state import raid_state_cache
+from sql_profiler import QUERY_BUDGETS, query_budget
+from upgrade_pipeline import invalidate_upgrades
+
+WORKOUT = {"sport_type": "run", "distance_km": 3.0, "duration_minutes": 20}
+
+
+@pytest.fixture
+async def player(client, make_raid, make_user):
+    """Активный рейд с участниками и прогретой лентой; возвращает (user_id, заголовки)."""
+    raid_id = await make_raid()
+    for _ in range(3):
+        _, headers = await make_user()
+        assert (await client.post("/api/attack", json=WORKOUT, headers=headers)).status_code == 200
+    async with AsyncSessionLocal() as db:
+        await raid_feed.load(db, raid_id)
+    return await make_user()
+
+
+@pytest.mark.parametrize("route", sorted(QUERY_BUDGETS))
+async def test_route_within_query_budget(client, player, route):
+    method, path = route.split(" ", 1)
+    user_id, headers = player
+
+    # Холодные кэши: снимок рейда пересобирается, рейтинг участников ещё не загружен
+    raid_state_cache.bump()
+    invalidate_user(user_id)
+    invalidate_upgrades(user_id)
+
+    with query_budget(QUERY_BUDGETS[route]) as profile:
+        response = await client.request(method, path, headers=headers)
+    assert response.status_code == 200, response.text
+    cold = profile.queries
+
+    with query_budget(QUERY_BUDGETS[route]) as profile:
+        response = await client.request(method, path, headers=headers)
+    assert response.status_code == 200
+    assert profile.queries <= cold
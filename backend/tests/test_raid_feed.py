@@ -0,0 +1,53 @@
+# backend/tests/test_raid_feed.py
+"""
+Лента рейда, заново прочитанная из БД, совпадает с живой: у добивающего удара
+та же пометка «БОСС ПОВЕРЖЕН», у рейда, закрытого без убийства, её нет.
+"""
+from sqlalchemy import update
+
+from database import AsyncSessionLocal
+from models import Raid
+from raid_feed import RecentLogBuffer, raid_feed
+
+WORKOUT = {"sport_type": "run", "distance_km": 5.0, "duration_minutes": 30}
+
+
+async def attack_until_killed(client, raid_id: int, headers: dict) -> None:
+    for _ in range(20):
+        response = await client.post("/api/attack", json=WORKOUT, headers=headers)
+        assert response.status_code == 200
+        async with AsyncSessionLocal() as db:
+            if not (await db.get(Raid, raid_id)).is_active:
+                return
+    raise AssertionError("босс не убит")
+
+
+async def reloaded_messages(raid_id: int) -> list:
+    async with AsyncSessionLocal() as db:
+        return [entry.message for entry in await RecentLogBuffer(capacity=50).recent(db, raid_id, 50)]
+
+
+async def test_reloaded_feed_keeps_kill_message(client, make_raid, make_user):
+    raid_id = await make_raid(max_hp=300)
+    _, headers = await make_user()
+    await attack_until_killed(client, raid_id, headers)
+
+    async with AsyncSessionLocal() as db:
+        live = [entry.message for entry in await raid_feed.recent(db, raid_id, 50)]
+    assert live[0].endswith("БОСС ПОВЕРЖЕН!")
+
+    assert await reloaded_messages(raid_id) == live
+
+
+async def test_timed_out_raid_has_no_kill_message(client, make_raid, make_user):
+    raid_id = await make_raid()
+    _, headers = await make_user()
+    assert (await client.post("/api/attack", json=WORKOUT, headers=headers)).status_code == 200
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Raid).where(Raid.id == raid_id).values(is_active=False))
+        await db.commit()
+
+    messages = await reloaded_messages(raid_id)
+    assert len(messages) == 1
+    assert "ПОВЕРЖЕН" not in messages[0]
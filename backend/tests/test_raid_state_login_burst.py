@@ -0,0 +1,68 @@
+# backend/tests/test_raid_state_login_burst.py
+"""
+bcrypt в пуле потоков (auth._run_bcrypt): пока идёт всплеск логинов с
+настоящей стоимостью хеша, GET /api/raid/state продолжает отвечать быстро —
+event loop не блокируется на ~200 мс хеширования.
+"""
+import asyncio
+import gc
+import statistics
+import time
+
+import auth
+from auth import verify_password
+from config import BCRYPT_MAX_PENDING
+
+PROD_ROUNDS = 12
+# Больше, чем потоков bcrypt, но в пределах очереди (без 503)
+LOGINS = min(16, BCRYPT_MAX_PENDING)
+
+
+async def test_raid_state_latency_during_login_burst(client, make_raid, make_user, monkeypatch):
+    await make_raid()
+    monkeypatch.setattr(auth, "BCRYPT_ROUNDS", PROD_ROUNDS)
+    users = [await make_user(password=f"secret-{i}") for i in range(LOGINS)]
+    usernames = [
+        (await client.get("/api/user/me", headers=headers)).json()["username"] for _, headers in users
+    ]
+
+    # Стоимость одной проверки пароля — ориентир, сколько блокировался бы loop
+    stored = auth.hash_password("probe")
+    started = time.perf_counter()
+    verify_password("probe", stored)
+    bcrypt_seconds = time.perf_counter() - started
+
+    assert (await client.get("/api/raid/state")).status_code == 200
+
+    # Полная сборка мусора по накопленной за сессию тестов куче сама останавливает
+    # loop на сотни мс; замеряется bcrypt, поэтому кучу замораживаем до всплеска
+    gc.collect()
+    gc.freeze()
+    try:
+        burst = asyncio.gather(*(
+            client.post("/api/auth/login", json={"username": name, "password": f"secret-{i}"})
+            for i, name in enumerate(usernames)
+        ))
+        burst = asyncio.ensure_future(burst)
+
+        latencies = []
+        while not burst.done():
+            started = time.perf_counter()
+            response = await client.get("/api/raid/state")
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200
+            await asyncio.sleep(0.005)
+
+        logins = await burst
+    finally:
+        gc.unfreeze()
+    assert [r.status_code for r in logins] == [200] * LOGINS
+
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 20 else max(latencies)
+    print(
+        f"\nraid/state during {LOGINS} logins: {len(latencies)} requests, "
+        f"median {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+        f"max {max(latencies) * 1000:.1f} ms (one bcrypt check {bcrypt_seconds * 1000:.0f} ms)"
+    )
+    assert len(latencies) >= 5
+    assert max(latencies) < bcrypt_seconds / 2
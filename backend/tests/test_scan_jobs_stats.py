@@ -0,0 +1,10 @@
+# backend/tests/test_scan_jobs_stats.py
+"""Статистика очереди OCR доступна только с JWT."""
+
+
+async def test_scan_jobs_stats_requires_auth(client, make_user):
+    assert (await client.get("/api/scan-workout/jobs/stats")).status_code == 401
+
+    _, headers = await make_user()
+    response = await client.get("/api/scan-workout/jobs/stats", headers=headers)
+    assert response.status_code == 200
@@ -0,0 +1,79 @@
+# backend/tests/test_shop_double_spend.py
+"""
+Двойное списание в магазине: N одновременных покупок при золоте ровно на одну —
+проходит ровно одна, баланс не уходит в минус, уровень растёт на 1.
+Отдельно замеряется пропускная способность покупок (purchases/sec).
+"""
+import asyncio
+import time
+
+from sqlalchemy import func, select
+
+from database import AsyncSessionLocal
+from models import User, UserUpgrade
+from shop_catalog import shop_catalog
+
+ATTEMPTS = 50
+BUYERS = 200
+
+# Товары, открытые с нуля (без требований)
+OPEN_ITEMS = [key for key, entry in shop_catalog.entries.items() if not entry.is_locked({})]
+
+
+async def _gold_and_levels(user_id: int) -> tuple:
+    async with AsyncSessionLocal() as db:
+        gold = (await db.execute(select(User.gold).where(User.id == user_id))).scalar_one()
+        levels = (await db.execute(
+            select(func.coalesce(func.sum(UserUpgrade.level), 0)).where(UserUpgrade.user_id == user_id)
+        )).scalar_one()
+    return gold, levels
+
+
+async def _buy_concurrently(client, headers: dict, item_keys: list) -> list:
+    responses = await asyncio.gather(*(
+        client.post("/api/shop/buy", json={"item_key": key}, headers=headers) for key in item_keys
+    ))
+    return [r.status_code for r in responses]
+
+
+async def test_same_item_bought_once(client, make_user):
+    key = OPEN_ITEMS[0]
+    price = shop_catalog.entries[key].prices[0]
+    user_id, headers = await make_user(gold=price)
+
+    statuses = await _buy_concurrently(client, headers, [key] * ATTEMPTS)
+
+    assert statuses.count(200) == 1
+    assert set(statuses) <= {200, 400, 409}
+    assert await _gold_and_levels(user_id) == (0, 1)
+
+
+async def test_gold_for_one_of_many_items(client, make_user):
+    prices = sorted(shop_catalog.entries[key].prices[0] for key in OPEN_ITEMS)
+    gold = prices[-1]
+    assert prices[0] + prices[1] > gold, "золота должно хватать только на одну покупку"
+    user_id, headers = await make_user(gold=gold)
+
+    statuses = await _buy_concurrently(client, headers, [OPEN_ITEMS[i % len(OPEN_ITEMS)] for i in range(ATTEMPTS)])
+
+    assert statuses.count(200) == 1
+    assert set(statuses) <= {200, 400, 409}
+    left, levels = await _gold_and_levels(user_id)
+    assert levels == 1
+    assert 0 <= left < prices[0]
+
+
+async def test_purchase_throughput(client, make_user):
+    key = OPEN_ITEMS[0]
+    price = shop_catalog.entries[key].prices[0]
+    buyers = [await make_user(gold=price) for _ in range(BUYERS)]
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(
+        client.post("/api/shop/buy", json={"item_key": key}, headers=headers) for _, headers in buyers
+    ))
+    elapsed = time.perf_counter() - started
+
+    assert [r.status_code for r in responses] == [200] * BUYERS
+    assert {r.json()["new_gold"] for r in responses} == {0}
+    print(f"\nshop: {BUYERS} purchases in {elapsed:.2f}s — {BUYERS / elapsed:.0f} purchases/sec")
@@ -0,0 +1,31 @@
+# backend/tests/test_simulator.py
+"""
+Векторный урон симулятора (batch_damage) совпадает со скалярными стратегиями
+бит в бит, а CLI работает без настроек БД (POSTGRES_* не заданы).
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from simulator import verify_against_scalar
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+@pytest.mark.parametrize("seed", [1, 42, 2024])
+def test_batch_damage_matches_scalar(seed):
+    assert verify_against_scalar(np.random.default_rng(seed), 5_000) == 0
+
+
+def test_cli_verify_runs_without_db_env():
+    env = {key: value for key, value in os.environ.items() if not key.startswith("POSTGRES_")}
+    result = subprocess.run(
+        [sys.executable, "simulator.py", "--verify", "1000", "--seed", "7"],
+        cwd=BACKEND, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "расхождений: 0" in result.stdout
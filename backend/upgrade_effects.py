@@ -0,0 +1,64 @@
+# backend/upgrade_effects.py
+"""
+Эффект апгрейдов игрока без обращения к БД.
+
+Уровни `{upgrade_key: level}` сворачиваются в `UpgradePipeline` по видам
+спорта: суммарные прибавки к входным данным и общий множитель урона.
+Модуль нужен механике (mechanics.py) и симулятору, поэтому зависит только
+от схем и `SHOP_REGISTRY`; чтение уровней и кэш — в upgrade_pipeline.py.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict
+
+from schemas import WorkoutData
+from shop_config import SHOP_REGISTRY
+
+
+@dataclass(frozen=True)
+class UpgradePipeline:
+    """Эффект всех апгрейдов игрока для одного вида спорта."""
+    input_bonus: Dict[str, float] = field(default_factory=dict)  # поле WorkoutData -> прибавка
+    damage_multiplier: float = 1.0
+
+    def apply_input(self, data: WorkoutData) -> WorkoutData:
+        """Возвращает копию данных с прибавками; исходный объект не меняется."""
+        if not self.input_bonus:
+            return data
+        updates = {
+            name: getattr(data, name) + bonus
+            for name, bonus in self.input_bonus.items()
+            if getattr(data, name) is not None
+        }
+        return data.model_copy(update=updates)
+
+
+EMPTY_PIPELINE = UpgradePipeline()
+
+
+@dataclass(frozen=True)
+class CompiledUpgrades:
+    levels: Dict[str, int]                  # Исходные уровни {key: level}
+    by_sport: Dict[str, UpgradePipeline]
+
+    def for_sport(self, sport_type: str) -> UpgradePipeline:
+        return self.by_sport.get(sport_type, EMPTY_PIPELINE)
+
+
+def compile_upgrades(levels: Dict[str, int]) -> CompiledUpgrades:
+    bonuses: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    multipliers: Dict[str, float] = defaultdict(lambda: 1.0)
+
+    for key, level in levels.items():
+        item = SHOP_REGISTRY.get(key)
+        if item is None or level <= 0:
+            continue
+        for name, bonus in item.input_bonus(level).items():
+            bonuses[item.sport_type][name] += bonus
+        multipliers[item.sport_type] *= item.damage_multiplier(level)
+
+    by_sport = {
+        sport: UpgradePipeline(input_bonus=dict(bonuses[sport]), damage_multiplier=multipliers[sport])
+        for sport in set(bonuses) | set(multipliers)
+    }
+    return CompiledUpgrades(levels=dict(levels), by_sport=by_sport)
@@ -0,0 +1,37 @@
+# backend/upgrade_pipeline.py
+"""
+Скомпилированные апгрейды игрока.
+
+Уровни из `user_upgrades` один раз сворачиваются в набор `UpgradePipeline`
+по видам спорта (upgrade_effects.py). При атаке стратегия берёт готовый
+пайплайн своего спорта — без обхода `SHOP_REGISTRY` и без чтения
+`UserUpgrade`. Набор кэшируется в памяти процесса и сбрасывается
+`invalidate_upgrades` после покупки.
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import TTLCache
+from config import UPGRADE_CACHE_TTL_SECONDS, UPGRADE_CACHE_MAX_SIZE
+from models import UserUpgrade
+from upgrade_effects import CompiledUpgrades, compile_upgrades
+
+
+# user_id -> CompiledUpgrades
+_upgrades_cache = TTLCache(max_size=UPGRADE_CACHE_MAX_SIZE, ttl=UPGRADE_CACHE_TTL_SECONDS)
+
+
+def invalidate_upgrades(user_id: int) -> None:
+    """Сбрасывает скомпилированные апгрейды после покупки."""
+    _upgrades_cache.pop(user_id)
+
+
+async def get_user_upgrades(db: AsyncSession, user_id: int) -> CompiledUpgrades:
+    compiled = _upgrades_cache.get(user_id)
+    if compiled is None:
+        result = await db.execute(
+            select(UserUpgrade.upgrade_key, UserUpgrade.level).where(UserUpgrade.user_id == user_id)
+        )
+        compiled = compile_upgrades({key: level for key, level in result.all()})
+        _upgrades_cache.set(user_id, compiled)
+    return compiled
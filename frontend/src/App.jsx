@@ -4,7 +4,7 @@
 
 import { useState, useEffect } from 'react';
 import {
-  fetchRaidState,
+  subscribeRaidState,
   sendAttack,
   getMe,
   register,
@@ -307,17 +307,10 @@ function App() {
 
   useEffect(() => {
     if (screen === 'main') {
-      loadRaidData();
-      const interval = setInterval(loadRaidData, 3000);
-      return () => clearInterval(interval);
+      return subscribeRaidState(setRaid);
     }
   }, [screen]);
 
-  const loadRaidData = async () => {
-    const data = await fetchRaidState();
-    if (data) setRaid(data);
-  };
-
   const handleAuthSubmit = async (e) => {
     e.preventDefault();
     setAuthError('');
@@ -434,7 +427,6 @@ function App() {
         gold: prev.gold + result.gold_earned,
       }));
       setMessage(`✅ ${result.message}`);
-      await loadRaidData();
     } catch (e) {
       const errorText = e.message || 'Ошибка';
       const parts = errorText.split('\n\n📄 Распознанный текст:\n');
@@ -77,10 +77,29 @@ export const fetchRaidState = async () => {
   }
 };
 
-export const scanWorkout = (formData) => {
+// Поток состояния рейда (SSE): snapshot — полное состояние, patch — изменённые поля
+export const subscribeRaidState = (onState) => {
+  const source = new EventSource(`${API_URL}/raid/stream`);
+
+  source.addEventListener('snapshot', (e) => {
+    onState(() => JSON.parse(e.data));
+  });
+  source.addEventListener('patch', (e) => {
+    const patch = JSON.parse(e.data);
+    onState((prev) => (prev ? { ...prev, ...patch } : prev));
+  });
+  source.onerror = (e) => {
+    // EventSource переподключается сам и получит свежий snapshot
+    console.error('Raid stream error', e);
+  };
+
+  return () => source.close();
+};
+
+const submitScanJob = (formData) => {
   return new Promise((resolve, reject) => {
     const xhr = new XMLHttpRequest();
-    xhr.open('POST', `${API_URL}/scan-workout`, true);
+    xhr.open('POST', `${API_URL}/scan-workout/jobs`, true);
     const token = getToken();
     if (token) xhr.setRequestHeader('Authorization', `Bearer ${token}`);
 
@@ -111,6 +130,20 @@ export const scanWorkout = (formData) => {
   });
 };
 
+// OCR выполняется в очереди на сервере: отправляем задачу и ждём результат long-poll'ом
+export const scanWorkout = async (formData) => {
+  let job = await submitScanJob(formData);
+  while (job.status === 'queued' || job.status === 'running') {
+    const res = await fetch(`${API_URL}/scan-workout/jobs/${job.job_id}?wait=25`, {
+      headers: authHeaders(),
+    });
+    if (!res.ok) throw new Error(await parseError(res, 'OCR failed'));
+    job = await res.json();
+  }
+  if (job.status === 'failed') throw new Error(`Ошибка OCR: ${job.error || 'неизвестная ошибка'}`);
+  return job.result;
+};
+
 export const sendAttack = async (data) => {
   const res = await fetch(`${API_URL}/attack`, {
     method: 'POST',